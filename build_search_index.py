@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Índice invertido de texto completo para contratos
+Tokeniza `titulo`, `descripcion` y `etiquetas` (plegado de acentos, stopwords y
+lematización ligera en español) y arma, por organización, listas de postings
+término -> IDs de contrato. El índice se guarda en `indice_busqueda` repartido en
+shards por hash del término: documento `<organizacionId>_<shard>` con el mapa
+`terminos`. Una consulta lee un documento por término, sin tocar `contratos`. Como los
+shards sólo se leen por ID, `terminos` no se indexa (fieldOverrides en
+firestore.indexes.json): así no cuenta para el límite de entradas de índice por
+documento ni encarece cada escritura.
+
+La actualización es incremental por los campos de cambio (fechaModificacion,
+fechaUltimaModificacion y fechaCreacion, que escribe la app al crear): sólo se leen los
+contratos cambiados desde la última ejecución y sólo se reescriben los shards afectados.
+Las ediciones de la app que no escriben ninguno de esos campos (actualizarContrato) sólo
+se recogen con --full, que reconstruye todo y además limpia los contratos eliminados. El
+estado (marca de agua y términos por contrato) se guarda en --state.
+
+Uso:
+    python build_search_index.py             # incremental
+    python build_search_index.py --full
+    python build_search_index.py --org ORG_ID --query "mantención ascensores"
+"""
+
+import argparse
+import datetime
+import json
+import re
+import time
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from firestore_utils import (CHANGE_FIELDS, ThroughputReporter, commit_writes, initialize_firebase, latest_change,
+                             load_state, save_state, stream_changed_since)
+
+INDEX_COLLECTION = "indice_busqueda"
+DEFAULT_SHARDS = 16
+DEFAULT_STATE = ".search_index_state.json.gz"
+# Documento con la configuración vigente del índice (número de shards)
+CONFIG_DOC = "_config"
+TEXT_FIELDS = ["titulo", "descripcion", "etiquetas"]
+# Margen bajo el límite de 1 MiB por documento de Firestore
+MAX_SHARD_BYTES = 900 * 1024
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "al", "ante", "con", "contra", "de", "del", "desde", "e", "el", "en", "entre", "es",
+    "esta", "este", "esto", "la", "las", "le", "les", "lo", "los", "mas", "o", "para", "por",
+    "que", "se", "sin", "sobre", "su", "sus", "u", "un", "una", "unas", "unos", "y",
+}
+
+# Sufijos de la lematización ligera, del más largo al más corto; se quita sólo el primero
+SUFFIXES = [
+    "amientos", "imientos", "aciones", "uciones", "amiento", "imiento", "idades", "mente",
+    "acion", "ucion", "istas", "ables", "ibles", "idad", "ista", "able", "ible",
+    "osos", "osas", "oso", "osa", "es", "os", "as", "s", "a", "o", "e",
+]
+MIN_STEM = 3
+
+# Estado por contrato: (organizacionId, términos)
+Entry = Tuple[str, List[str]]
+
+
+def fold(text: str) -> str:
+    """Minúsculas sin acentos ni diacríticos (ñ -> n)"""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    """Lematización ligera: plurales, género y sufijos derivativos frecuentes"""
+    if word.isdigit():
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos indexables de un texto, en orden de aparición"""
+    return [stem(token) for token in TOKEN.findall(fold(text))
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def contract_terms(data: Dict[str, Any]) -> List[str]:
+    """Conjunto ordenado de términos de un contrato"""
+    parts = [data.get("titulo") or "", data.get("descripcion") or ""]
+    tags = data.get("etiquetas") or []
+    if isinstance(tags, list):
+        parts.extend(str(tag) for tag in tags)
+    return sorted(set(tokenize(" ".join(parts))))
+
+
+def shard_of(term: str, shards: int) -> int:
+    """Shard estable de un término (crc32, igual en cualquier proceso)"""
+    return zlib.crc32(term.encode("utf-8")) % shards
+
+
+def shard_doc_id(organizacion_id: str, shard: int) -> str:
+    return f"{organizacion_id}_{shard:02d}"
+
+
+def build_postings(contracts: Dict[str, Entry], shards: int,
+                   only: Optional[Set[Tuple[str, int]]] = None) -> Dict[Tuple[str, int], Dict[str, List[str]]]:
+    """Arma las listas de postings por (organización, shard); sólo las de `only` si se indica"""
+    postings: Dict[Tuple[str, int], Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+    for contract_id in sorted(contracts):
+        organizacion_id, terms = contracts[contract_id]
+        for term in terms:
+            key = (organizacion_id, shard_of(term, shards))
+            if only is None or key in only:
+                postings[key][term].append(contract_id)
+    return postings
+
+
+def update_index(db, state: Dict[str, Any], shards: int = DEFAULT_SHARDS, full: bool = False,
+                 dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Aplica los cambios de `contratos` al índice y actualiza `state` en memoria.
+    Devuelve contadores de la ejecución.
+    """
+    full = full or state.get("shards") != shards or state.get("marca") is None
+    previous: Dict[str, Entry] = {cid: (org, terms) for cid, (org, terms) in state["contratos"].items()}
+    contracts: Dict[str, Entry] = {} if full else dict(previous)
+    since = None if full else datetime.datetime.fromisoformat(state["marca"])
+    stats = {"modo": "completo" if full else "incremental", "leidos": 0, "cambiados": 0,
+             "eliminados": 0, "shards_escritos": 0, "shards_borrados": 0, "errores": []}
+
+    touched: Set[Tuple[str, int]] = set()
+    watermark = since
+    reporter = ThroughputReporter("contratos", every=5000)
+    fields = TEXT_FIELDS + ["organizacionId"] + list(CHANGE_FIELDS)
+    for doc in stream_changed_since(db, "contratos", since, fields):
+        data = doc.to_dict() or {}
+        stats["leidos"] += 1
+        reporter.add()
+        modified = latest_change(data)
+        if modified is not None and (watermark is None or modified > watermark):
+            watermark = modified
+
+        entry = (data.get("organizacionId") or "sin_organizacion", contract_terms(data))
+        old = previous.get(doc.id)
+        contracts[doc.id] = entry
+        if not full and old == entry:
+            continue
+        stats["cambiados"] += 1
+        for organizacion_id, terms in filter(None, [old, entry]):
+            touched.update((organizacion_id, shard_of(term, shards)) for term in terms)
+
+    if full:
+        # Contratos eliminados: estaban en el estado anterior y ya no existen
+        for contract_id in set(previous) - set(contracts):
+            organizacion_id, terms = previous[contract_id]
+            stats["eliminados"] += 1
+            touched.update((organizacion_id, shard_of(term, shards)) for term in terms)
+        if state.get("shards") != shards:
+            touched.update((org, shard) for org, _ in previous.values() for shard in range(state["shards"] or 0))
+
+    postings = build_postings(contracts, shards, only=None if full else touched)
+    targets = set(postings) | touched
+
+    writes = []
+    collection_ref = db.collection(INDEX_COLLECTION)
+    for organizacion_id, shard in sorted(targets):
+        ref = collection_ref.document(shard_doc_id(organizacion_id, shard))
+        terms = postings.get((organizacion_id, shard))
+        if not terms:
+            writes.append(("delete", ref, None))
+            stats["shards_borrados"] += 1
+            continue
+        size = len(json.dumps(terms, ensure_ascii=False).encode("utf-8"))
+        if size > MAX_SHARD_BYTES:
+            stats["errores"].append(f"{ref.id}: {size} bytes, aumenta --shards")
+            continue
+        writes.append(("set", ref, {
+            "organizacionId": organizacion_id,
+            "shard": shard,
+            "shards": shards,
+            "terminos": dict(terms),
+            "fechaActualizacion": SERVER_TIMESTAMP,
+        }))
+        stats["shards_escritos"] += 1
+
+    print(f"   ⏱️ {reporter.summary()}")
+    if dry_run:
+        return stats
+
+    writes.append(("set", collection_ref.document(CONFIG_DOC), {"shards": shards}))
+    committed, errors = commit_writes(db, writes)
+    stats["errores"].extend(errors)
+    if not errors:
+        state["contratos"] = {cid: [org, terms] for cid, (org, terms) in contracts.items()}
+        state["shards"] = shards
+        state["marca"] = watermark.isoformat() if watermark else datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return stats
+
+
+def search(db, organizacion_id: str, text: str, shards: Optional[int] = None) -> List[str]:
+    """
+    IDs de contratos de la organización que contienen todos los términos de `text`.
+    Lee a lo más un documento del índice por término, en una sola llamada. Si no se
+    indica `shards`, se toma del documento de configuración del índice.
+    """
+    terms = sorted(set(tokenize(text)))
+    if not terms:
+        return []
+    collection_ref = db.collection(INDEX_COLLECTION)
+    if shards is None:
+        config = collection_ref.document(CONFIG_DOC).get()
+        shards = (config.to_dict() or {}).get("shards", DEFAULT_SHARDS) if config.exists else DEFAULT_SHARDS
+    refs = {shard: collection_ref.document(shard_doc_id(organizacion_id, shard))
+            for shard in {shard_of(term, shards) for term in terms}}
+    docs = {snapshot.id: snapshot.to_dict() or {} for snapshot in db.get_all(list(refs.values()))
+            if snapshot.exists}
+
+    result: Optional[Set[str]] = None
+    for term in terms:
+        shard_doc = docs.get(refs[shard_of(term, shards)].id, {})
+        ids = set(shard_doc.get("terminos", {}).get(term, []))
+        result = ids if result is None else result & ids
+        if not result:
+            return []
+    return sorted(result)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Construye el índice de búsqueda de contratos")
+    parser.add_argument("--full", action="store_true", help="Reconstruye todo el índice")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    parser.add_argument("--state", default=DEFAULT_STATE)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--org", help="Organización para --query")
+    parser.add_argument("--query", help="Consulta de prueba sobre el índice")
+    args = parser.parse_args()
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    if args.query:
+        if not args.org:
+            print("❌ --query requiere --org")
+            return
+        start = time.time()
+        ids = search(db, args.org, args.query)
+        print(f"🔎 {len(ids)} contratos en {(time.time() - start) * 1000:.0f} ms")
+        for contract_id in ids[:50]:
+            print(f"   • {contract_id}")
+        return
+
+    print("🔎 Índice de búsqueda de contratos")
+    print("=" * 50)
+
+    state = load_state(args.state, {"marca": None, "shards": None, "contratos": {}})
+    stats = update_index(db, state, args.shards, args.full, args.dry_run)
+
+    print(f"\n📊 Resumen ({stats['modo']}):")
+    print(f"   📥 Contratos leídos: {stats['leidos']}")
+    print(f"   ✏️ Contratos con cambios: {stats['cambiados']}")
+    if stats["eliminados"]:
+        print(f"   🗑️ Contratos eliminados: {stats['eliminados']}")
+    print(f"   💾 Shards escritos: {stats['shards_escritos']}, borrados: {stats['shards_borrados']}")
+    for error in stats["errores"][:10]:
+        print(f"   ❌ {error}")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se escribió el índice ni el estado")
+    elif not stats["errores"]:
+        save_state(args.state, state)
+        print(f"\n✅ Estado guardado en {args.state}")
+
+
+if __name__ == "__main__":
+    main()
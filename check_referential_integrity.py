@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Verificador de integridad referencial entre colecciones
+Recorre una sola vez organizaciones, usuarios, proyectos, contrapartes y contratos leyendo
+sólo los campos de referencia (proyección), arma conjuntos de IDs en memoria y reporta
+cada referencia colgante:
+- organizacionId (proyectos, contrapartes, contratos, usuarios)
+- contraparteOrganizacionId (contratos)
+- responsableId (proyectos, contratos)
+- proyecto / proyectoId (contratos)
+
+Lecturas: O(total de documentos). Memoria: los conjuntos de IDs más las referencias rotas.
+Con --snapshot se recorre un almacén local (snapshot_store.py), sin lecturas de Firestore.
+
+Uso:
+    python check_referential_integrity.py
+    python check_referential_integrity.py --json integridad.json
+    python check_referential_integrity.py --snapshot store/
+"""
+
+import argparse
+import json
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Set
+
+from firestore_utils import DocumentSource, ThroughputReporter, firestore_source, initialize_firebase
+from snapshot_store import SnapshotStore
+
+# Por colección: campo de referencia -> conjunto de IDs al que debe apuntar
+REFERENCE_RULES: Dict[str, Dict[str, str]] = {
+    "usuarios": {"organizacionId": "organizaciones"},
+    "proyectos": {"organizacionId": "organizaciones", "responsableId": "usuarios"},
+    "contrapartes": {"organizacionId": "organizaciones"},
+    "contratos": {
+        "organizacionId": "organizaciones",
+        "contraparteOrganizacionId": "organizaciones",
+        "responsableId": "usuarios",
+        "proyectoId": "proyectos",
+        "proyecto": "proyectos.nombre",
+    },
+}
+
+# Orden de recorrido: cada colección sólo referencia conjuntos ya construidos
+SCAN_ORDER = ["organizaciones", "usuarios", "proyectos", "contrapartes", "contratos"]
+
+
+def check_integrity(source: DocumentSource, max_examples: int = 20) -> Dict[str, Any]:
+    """
+    Recorre las colecciones y devuelve el reporte de referencias colgantes.
+    Un valor vacío o ausente no se considera una referencia rota.
+    """
+    id_sets: Dict[str, Set[str]] = defaultdict(set)
+    dangling: Counter = Counter()
+    examples: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    totals: Counter = Counter()
+
+    for collection_name in SCAN_ORDER:
+        rules = REFERENCE_RULES.get(collection_name, {})
+        fields = sorted(rules)
+        if collection_name == "proyectos":
+            fields.append("nombre")
+
+        reporter = ThroughputReporter(collection_name, every=5000)
+        for doc in source(collection_name, fields):
+            id_sets[collection_name].add(doc.id)
+            data = doc.to_dict() or {}
+            if collection_name == "proyectos" and data.get("nombre"):
+                id_sets["proyectos.nombre"].add(data["nombre"])
+
+            for field, target in rules.items():
+                value = data.get(field)
+                if not value or not isinstance(value, str):
+                    continue
+                totals[f"{collection_name}.{field}"] += 1
+                if value in id_sets[target]:
+                    continue
+                key = f"{collection_name}.{field}"
+                dangling[key] += 1
+                if len(examples[key]) < max_examples:
+                    examples[key].append({"id": doc.id, "valor": value})
+            reporter.add()
+
+        print(f"   📁 {reporter.summary()}")
+
+    return {
+        "documentos": {name: len(id_sets[name]) for name in SCAN_ORDER},
+        "referencias": dict(totals),
+        "colgantes": dict(dangling),
+        "ejemplos": dict(examples),
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Imprime el reporte de integridad"""
+    print("\n📊 Documentos:")
+    for name, count in report["documentos"].items():
+        print(f"   • {name}: {count}")
+
+    if not report["colgantes"]:
+        print("\n✅ Sin referencias colgantes")
+        return
+
+    print("\n⚠️ Referencias colgantes:")
+    for key, count in sorted(report["colgantes"].items()):
+        total = report["referencias"].get(key, 0)
+        print(f"\n   ❌ {key}: {count} de {total}")
+        for example in report["ejemplos"].get(key, []):
+            print(f"      - {example['id']} -> {example['valor']}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Verifica la integridad referencial de Firestore")
+    parser.add_argument("--json", help="Guarda el reporte completo en este archivo")
+    parser.add_argument("--snapshot", help="Directorio de un almacén local (snapshot_store.py)")
+    args = parser.parse_args()
+
+    print("🔍 Verificación de integridad referencial")
+    print("=" * 50)
+
+    if args.snapshot:
+        source = SnapshotStore(args.snapshot).source()
+    else:
+        db = initialize_firebase()
+        if not db:
+            print("❌ No se pudo inicializar Firebase")
+            return
+        source = firestore_source(db)
+
+    report = check_integrity(source)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
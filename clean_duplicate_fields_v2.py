@@ -1,139 +1,219 @@
 #!/usr/bin/env python3
 """
-Script to clean up duplicate fields in user documents.
-This script will:
-1. Remove 'role' field and keep 'rol'
-2. Remove 'organizationId' field and keep 'organizacionId'
-3. Keep both 'id' and 'uid' as they serve different purposes
+Script to clean up duplicate and inconsistent fields with declarative rules.
+Each collection declares:
+1. renames:   legacy field -> canonical field (value copied only if the canonical field is missing)
+2. defaults:  fields set when missing
+3. coercions: fields converted to a type ('bool', 'int', 'float', 'str')
+4. deletions: fields removed outright
+
+The collection is processed in a single partitioned pass: updates are computed per
+document and applied in batches with DELETE_FIELD. Instead of a second scan of the
+collection, a sample of each committed batch (VERIFY_SAMPLE documents) is re-read from
+Firestore, projected on the rule fields, and checked against the rules.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import random
+import sys
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
 from google.cloud.firestore_v1 import DELETE_FIELD
 
-def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        # Use the service account key
-        cred = credentials.Certificate("pullmai-e0bb0-firebase-adminsdk-6nr9p-f6c7ab0040.json")
-        firebase_admin.initialize_app(cred)
-    
-    return firestore.client()
-
-def clean_user_duplicate_fields():
-    """Clean up duplicate fields in user documents"""
-    print("🧹 Iniciando limpieza de campos duplicados en usuarios...")
-    
-    db = initialize_firebase()
-    users_ref = db.collection('usuarios')
-    
-    try:
-        # Get all users
-        users = users_ref.stream()
-        
-        update_count = 0
-        for user_doc in users:
-            user_id = user_doc.id
-            user_data = user_doc.to_dict()
-            
-            # Check if user has duplicate fields
-            has_duplicates = False
-            updates = {}
-            
-            # Check for 'role' field (should be 'rol')
-            if 'role' in user_data:
-                print(f"👤 Usuario {user_id}: Encontrado campo 'role' duplicado")
-                # If 'rol' doesn't exist, copy 'role' to 'rol'
-                if 'rol' not in user_data:
-                    updates['rol'] = user_data['role']
-                    print(f"   ✅ Copiando 'role' -> 'rol': {user_data['role']}")
-                # Remove 'role' field using DELETE_FIELD
-                updates['role'] = DELETE_FIELD
-                has_duplicates = True
-                print("   🗑️ Eliminando campo 'role'")
-            
-            # Check for 'organizationId' field (should be 'organizacionId')  
-            if 'organizationId' in user_data:
-                print(f"👤 Usuario {user_id}: Encontrado campo 'organizationId' duplicado")
-                # If 'organizacionId' doesn't exist, copy 'organizationId' to 'organizacionId'
-                if 'organizacionId' not in user_data:
-                    updates['organizacionId'] = user_data['organizationId']
-                    print(f"   ✅ Copiando 'organizationId' -> 'organizacionId': {user_data['organizationId']}")
-                # Remove 'organizationId' field using DELETE_FIELD
-                updates['organizationId'] = DELETE_FIELD
-                has_duplicates = True
-                print("   🗑️ Eliminando campo 'organizationId'")
-            
-            # Apply updates if needed
-            if has_duplicates:
+from firestore_utils import MAX_BATCH_SIZE, initialize_firebase, map_partitions
+
+CLEANUP_RULES: Dict[str, Dict[str, Any]] = {
+    "usuarios": {
+        "renames": {"role": "rol", "organizationId": "organizacionId"},
+        "defaults": {},
+        "coercions": {},
+        "deletions": [],
+    },
+}
+
+TRUE_STRINGS = {"true", "1", "si", "sí", "yes"}
+
+# Documents re-read from each committed batch to verify the rules no longer fire
+VERIFY_SAMPLE = 10
+
+
+def coerce_value(value: Any, type_name: str) -> Any:
+    """Convert a value to the given type name; raises ValueError if it cannot be converted"""
+    if type_name == "bool":
+        if isinstance(value, str):
+            return value.strip().lower() in TRUE_STRINGS
+        return bool(value)
+    if type_name == "int":
+        return int(float(value)) if isinstance(value, str) else int(value)
+    if type_name == "float":
+        return float(value)
+    if type_name == "str":
+        return str(value)
+    raise ValueError(f"Unknown coercion type: {type_name}")
+
+
+def is_type(value: Any, type_name: str) -> bool:
+    """Check whether a value already has the given type name"""
+    if type_name == "int":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if type_name == "float":
+        return isinstance(value, float)
+    return isinstance(value, {"bool": bool, "str": str}[type_name])
+
+
+def apply_rules(data: Dict[str, Any], rules: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Counter]:
+    """
+    Compute the Firestore update for one document.
+    Returns (updates, resulting document, per-rule counters).
+    """
+    result = dict(data)
+    updates: Dict[str, Any] = {}
+    counts: Counter = Counter()
+
+    for legacy, canonical in rules.get("renames", {}).items():
+        if legacy in result:
+            if canonical not in result:
+                result[canonical] = updates[canonical] = result[legacy]
+            del result[legacy]
+            updates[legacy] = DELETE_FIELD
+            counts[f"rename:{legacy}->{canonical}"] += 1
+
+    for field in rules.get("deletions", []):
+        if field in result:
+            del result[field]
+            updates[field] = DELETE_FIELD
+            counts[f"delete:{field}"] += 1
+
+    for field, default in rules.get("defaults", {}).items():
+        if field not in result:
+            result[field] = updates[field] = default
+            counts[f"default:{field}"] += 1
+
+    for field, type_name in rules.get("coercions", {}).items():
+        if field in result and result[field] is not None and not is_type(result[field], type_name):
+            try:
+                result[field] = updates[field] = coerce_value(result[field], type_name)
+                counts[f"coerce:{field}"] += 1
+            except (TypeError, ValueError):
+                counts[f"coerce_error:{field}"] += 1
+
+    return updates, result, counts
+
+
+def rule_fields(rules: Dict[str, Any]) -> List[str]:
+    """Every field a rule reads or writes, for projected verification reads"""
+    fields = set(rules.get("deletions", [])) | set(rules.get("defaults", {})) | set(rules.get("coercions", {}))
+    for legacy, canonical in rules.get("renames", {}).items():
+        fields.update((legacy, canonical))
+    return sorted(fields)
+
+
+def verify_sample(db, refs: List[Any], rules: Dict[str, Any]) -> Tuple[int, int]:
+    """Re-read a sample of written documents; returns (documents read, documents still violating)"""
+    sample = random.sample(refs, min(VERIFY_SAMPLE, len(refs)))
+    violations = 0
+    for snapshot in db.get_all(sample, field_paths=rule_fields(rules)):
+        updates, _, _ = apply_rules(snapshot.to_dict() or {}, rules)
+        if updates:
+            violations += 1
+    return len(sample), violations
+
+
+def clean_collection(db, collection_name: str, rules: Dict[str, Any],
+                     partitions: int = 8, dry_run: bool = False) -> Counter:
+    """Clean up a collection in one partitioned pass and return aggregated counters"""
+    print(f"🧹 Limpiando '{collection_name}' en {partitions} particiones{' (simulación)' if dry_run else ''}...")
+
+    def clean_partition(query) -> Counter:
+        totals: Counter = Counter()
+        pending: List[Tuple[Any, Dict[str, Any]]] = []
+
+        def flush():
+            if dry_run:
+                totals["por_actualizar"] += len(pending)
+            else:
+                batch = db.batch()
+                for ref, updates in pending:
+                    batch.update(ref, updates)
                 try:
-                    users_ref.document(user_id).update(updates)
-                    update_count += 1
-                    print(f"   ✅ Usuario {user_id} actualizado exitosamente")
+                    batch.commit()
+                    totals["actualizados"] += len(pending)
                 except Exception as e:
-                    print(f"   ❌ Error actualizando usuario {user_id}: {e}")
-            else:
-                print(f"👤 Usuario {user_id}: Sin campos duplicados")
-        
-        print(f"\n✅ Limpieza completada. {update_count} usuarios actualizados.")
-        
-    except Exception as e:
-        print(f"❌ Error durante la limpieza: {e}")
-        return False
-    
-    return True
-
-def verify_cleanup():
-    """Verify that the cleanup was successful"""
-    print("\n🔍 Verificando limpieza...")
-    
-    db = initialize_firebase()
-    users_ref = db.collection('usuarios')
-    
-    try:
-        users = users_ref.stream()
-        
-        duplicates_found = 0
-        for user_doc in users:
-            user_id = user_doc.id
-            user_data = user_doc.to_dict()
-            
-            # Check for remaining duplicate fields
-            if 'role' in user_data:
-                print(f"⚠️ Usuario {user_id}: Aún tiene campo 'role'")
-                duplicates_found += 1
-            
-            if 'organizationId' in user_data:
-                print(f"⚠️ Usuario {user_id}: Aún tiene campo 'organizationId'")
-                duplicates_found += 1
-        
-        if duplicates_found == 0:
-            print("✅ Verificación exitosa: No se encontraron campos duplicados")
-        else:
-            print(f"⚠️ Se encontraron {duplicates_found} campos duplicados restantes")
-        
-        return duplicates_found == 0
-        
-    except Exception as e:
-        print(f"❌ Error durante la verificación: {e}")
-        return False
+                    print(f"   ❌ Error aplicando lote de {len(pending)} documentos: {e}")
+                    totals["errores"] += len(pending)
+                else:
+                    checked, violations = verify_sample(db, [ref for ref, _ in pending], rules)
+                    totals["verificados"] += checked
+                    totals["violaciones_restantes"] += violations
+            pending.clear()
+
+        for doc in query.stream():
+            totals["documentos"] += 1
+            updates, _, counts = apply_rules(doc.to_dict() or {}, rules)
+            totals.update(counts)
+            if not updates:
+                totals["limpios"] += 1
+                continue
+            pending.append((doc.reference, updates))
+            if len(pending) >= MAX_BATCH_SIZE:
+                flush()
+
+        if pending:
+            flush()
+        return totals
+
+    totals: Counter = Counter()
+    for partition_totals in map_partitions(db, collection_name, clean_partition, partitions):
+        totals.update(partition_totals)
+    return totals
+
+
+def print_report(collection_name: str, totals: Counter, dry_run: bool):
+    """Print the cleanup and verification counters for a collection"""
+    print(f"\n📊 Resultado para '{collection_name}':")
+    print(f"   📄 Documentos revisados: {totals['documentos']}")
+    print(f"   ✨ Ya limpios: {totals['limpios']}")
+    for key in sorted(k for k in totals if ":" in k):
+        print(f"   • {key}: {totals[key]}")
+    if dry_run:
+        print(f"   💡 Documentos a actualizar: {totals['por_actualizar']}")
+        return
+    print(f"   ✅ Actualizados: {totals['actualizados']}")
+    print(f"   🔍 Verificados (muestra releída): {totals['verificados']}, "
+          f"con reglas pendientes: {totals['violaciones_restantes']}")
+    if totals["errores"]:
+        print(f"   ❌ Con errores: {totals['errores']}")
+
 
 def main():
     """Main function"""
     print("🚀 Iniciando script de limpieza de campos duplicados")
     print("=" * 60)
-    
-    # Clean up duplicate fields
-    if clean_user_duplicate_fields():
-        # Verify the cleanup
-        if verify_cleanup():
-            print("\n🎉 ¡Limpieza completada exitosamente!")
-        else:
-            print("\n⚠️ Limpieza completada con advertencias. Revisa los logs.")
+
+    dry_run = "--dry-run" in sys.argv
+    collections = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or list(CLEANUP_RULES)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    all_clean = True
+    for collection_name in collections:
+        if collection_name not in CLEANUP_RULES:
+            print(f"⚠️ No hay reglas definidas para '{collection_name}'")
+            continue
+        totals = clean_collection(db, collection_name, CLEANUP_RULES[collection_name], dry_run=dry_run)
+        print_report(collection_name, totals, dry_run)
+        all_clean = all_clean and totals["violaciones_restantes"] == 0 and totals["errores"] == 0
+
+    if dry_run:
+        print("\n💡 Simulación completada. Ejecuta sin --dry-run para aplicar los cambios.")
+    elif all_clean:
+        print("\n🎉 ¡Limpieza completada exitosamente! Verificación: la muestra releída no tiene campos pendientes")
     else:
-        print("\n❌ La limpieza falló. Revisa los logs para más detalles.")
+        print("\n⚠️ Limpieza completada con advertencias. Revisa los logs.")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Analítica columnar de contratos en memoria
+Carga `contratos` (desde Firestore o cualquier DocumentSource, p. ej. un snapshot local)
+en arreglos NumPy tipados, una columna por campo:
+- categorías (estado, tipo, moneda, contraparte, ...) codificadas por diccionario en int32,
+  con -1 para valores ausentes
+- fechas como segundos desde epoch en int64, con NO_DATE para valores ausentes
+- monto en float64, con NaN para valores ausentes
+
+Sobre esas columnas, group-by y agrupación temporal vectorizados (bincount/cumsum), de modo
+que un reporte sobre millones de contratos no itera documentos en Python.
+
+Uso:
+    python contract_analytics.py
+    python contract_analytics.py --top 20 --meses 24
+    python contract_analytics.py --snapshot store/    # almacén local, sin lecturas de Firestore
+"""
+
+import argparse
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from firestore_utils import DocumentSource, ThroughputReporter, firestore_source, initialize_firebase
+from snapshot_store import SnapshotStore
+
+# Columna -> campo (o campos, en orden de preferencia) del contrato
+CATEGORICAL_COLUMNS = {
+    "organizacionId": ["organizacionId"],
+    "contraparte": ["contraparteOrganizacionId", "contraparteId", "contraparte"],
+    "proyectoId": ["proyectoId"],
+    "estado": ["estado"],
+    "tipo": ["tipo"],
+    "categoria": ["categoria"],
+    "moneda": ["moneda"],
+    "periodicidad": ["periodicidad"],
+}
+DATE_COLUMNS = ["fechaInicio", "fechaTermino"]
+READ_FIELDS = sorted({field for fields in CATEGORICAL_COLUMNS.values() for field in fields}
+                     | set(DATE_COLUMNS) | {"monto"})
+
+NO_DATE = np.iinfo(np.int64).min
+MISSING_CODE = -1
+
+# Meses entre pagos; None para contratos de pago único
+PERIOD_MONTHS = {"unico": None, "mensual": 1, "trimestral": 3, "semestral": 6, "anual": 12, "bianual": 24}
+# Estados cuyos montos están comprometidos
+COMMITTED_STATES = ["aprobado", "activo", "renovado"]
+
+
+def epoch_seconds(value: Any) -> int:
+    """Timestamp, datetime o texto ISO -> segundos desde epoch (NO_DATE si no es fecha)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return NO_DATE
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return int(value.timestamp())
+    return NO_DATE
+
+
+class ContractColumns:
+    """Contratos en formato columnar: `codes`/`categories` por categoría, `dates` y `monto`"""
+
+    def __init__(self, ids: np.ndarray, codes: Dict[str, np.ndarray], categories: Dict[str, List[str]],
+                 dates: Dict[str, np.ndarray], monto: np.ndarray):
+        self.ids = ids
+        self.codes = codes
+        self.categories = categories
+        self.dates = dates
+        self.monto = monto
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def code_of(self, column: str, value: str) -> int:
+        """Código de un valor de categoría, o MISSING_CODE si no aparece"""
+        try:
+            return self.categories[column].index(value)
+        except ValueError:
+            return MISSING_CODE
+
+    def isin(self, column: str, values: Iterable[str]) -> np.ndarray:
+        """Máscara de filas cuya categoría está en `values`"""
+        wanted = [self.code_of(column, value) for value in values]
+        return np.isin(self.codes[column], [code for code in wanted if code != MISSING_CODE])
+
+    def equals(self, column: str, value: str) -> np.ndarray:
+        """Máscara de filas cuya categoría es `value`"""
+        return self.isin(column, [value])
+
+
+def load_contracts(source: DocumentSource) -> ContractColumns:
+    """Recorre `contratos` una vez y construye las columnas"""
+    encoders: Dict[str, Dict[str, int]] = {column: {} for column in CATEGORICAL_COLUMNS}
+    codes: Dict[str, List[int]] = {column: [] for column in CATEGORICAL_COLUMNS}
+    dates: Dict[str, List[int]] = {column: [] for column in DATE_COLUMNS}
+    ids: List[str] = []
+    montos: List[float] = []
+
+    reporter = ThroughputReporter("contratos", every=50000)
+    for doc in source("contratos", READ_FIELDS):
+        data = doc.to_dict() or {}
+        ids.append(doc.id)
+        for column, fields in CATEGORICAL_COLUMNS.items():
+            value = next((data[field] for field in fields if data.get(field)), None)
+            if value is None or not isinstance(value, str):
+                codes[column].append(MISSING_CODE)
+            else:
+                encoder = encoders[column]
+                codes[column].append(encoder.setdefault(value, len(encoder)))
+        for column in DATE_COLUMNS:
+            dates[column].append(epoch_seconds(data.get(column)))
+        monto = data.get("monto")
+        montos.append(float(monto) if isinstance(monto, (int, float)) and not isinstance(monto, bool) else np.nan)
+        reporter.add()
+    print(f"   ⏱️ {reporter.summary()}")
+
+    return ContractColumns(
+        ids=np.array(ids, dtype=object),
+        codes={column: np.array(values, dtype=np.int32) for column, values in codes.items()},
+        categories={column: list(encoder) for column, encoder in encoders.items()},
+        dates={column: np.array(values, dtype=np.int64) for column, values in dates.items()},
+        monto=np.array(montos, dtype=np.float64),
+    )
+
+
+def group_by(frame: ContractColumns, by: List[str], mask: Optional[np.ndarray] = None
+             ) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+    """
+    Cantidad y suma de monto por combinación de categorías.
+    Las claves compuestas se combinan en un solo índice (ravel_multi_index) y se agregan
+    con bincount; las filas con alguna categoría ausente se omiten.
+    """
+    selected = np.ones(len(frame), dtype=bool) if mask is None else mask.copy()
+    for column in by:
+        selected &= frame.codes[column] != MISSING_CODE
+    if not selected.any():
+        return {}
+
+    sizes = tuple(max(1, len(frame.categories[column])) for column in by)
+    keys = np.ravel_multi_index(tuple(frame.codes[column][selected] for column in by), sizes)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    sums = np.bincount(inverse, weights=np.nan_to_num(frame.monto[selected]))
+
+    result = {}
+    key_codes = np.unravel_index(unique, sizes)
+    for position in range(len(unique)):
+        labels = tuple(frame.categories[column][key_codes[i][position]] for i, column in enumerate(by))
+        result[labels] = (int(counts[position]), float(sums[position]))
+    return result
+
+
+def month_index(seconds: np.ndarray) -> np.ndarray:
+    """Segundos desde epoch -> meses desde enero de 1970 (int64); NO_DATE se conserva"""
+    valid = seconds != NO_DATE
+    months = np.full(seconds.shape, NO_DATE, dtype=np.int64)
+    months[valid] = seconds[valid].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    return months
+
+
+def month_label(index: int) -> str:
+    return str(np.datetime64(int(index), "M"))
+
+
+def time_buckets(frame: ContractColumns, column: str = "fechaTermino", mask: Optional[np.ndarray] = None
+                 ) -> Dict[str, Tuple[int, float]]:
+    """Cantidad y suma de monto por mes de `column`"""
+    months = month_index(frame.dates[column])
+    selected = months != NO_DATE
+    if mask is not None:
+        selected &= mask
+    if not selected.any():
+        return {}
+    unique, inverse = np.unique(months[selected], return_inverse=True)
+    counts = np.bincount(inverse)
+    sums = np.bincount(inverse, weights=np.nan_to_num(frame.monto[selected]))
+    return {month_label(month): (int(count), float(total)) for month, count, total in zip(unique, counts, sums)}
+
+
+def overlapping(frame: ContractColumns, start: datetime.datetime, end: datetime.datetime) -> np.ndarray:
+    """Máscara de contratos cuya vigencia [fechaInicio, fechaTermino] cruza [start, end]"""
+    inicio, termino = frame.dates["fechaInicio"], frame.dates["fechaTermino"]
+    begins_before_end = (inicio == NO_DATE) | (inicio <= epoch_seconds(end))
+    ends_after_start = (termino == NO_DATE) | (termino >= epoch_seconds(start))
+    return begins_before_end & ends_after_start
+
+
+def monthly_commitments(frame: ContractColumns, first_month: datetime.datetime, months: int,
+                        moneda: str, mask: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Monto mensual equivalente comprometido por periodicidad para cada mes de la ventana.
+    Cada contrato recurrente aporta monto / meses del período durante toda su vigencia;
+    se acumula con un arreglo de diferencias (np.add.at + cumsum), sin iterar contratos.
+    """
+    start = month_index(np.array([epoch_seconds(first_month)], dtype=np.int64))[0]
+    selected = frame.equals("moneda", moneda) & frame.isin("estado", COMMITTED_STATES) & ~np.isnan(frame.monto)
+    if mask is not None:
+        selected &= mask
+
+    first = month_index(frame.dates["fechaInicio"])
+    last = month_index(frame.dates["fechaTermino"])
+    first = np.where(first == NO_DATE, start, first)
+    last = np.where(last == NO_DATE, start + months - 1, last)
+
+    result = {}
+    for periodicidad, period in PERIOD_MONTHS.items():
+        if period is None:
+            continue
+        rows = selected & frame.equals("periodicidad", periodicidad) & (last >= start) & (first < start + months)
+        if not rows.any():
+            continue
+        offsets_start = np.clip(first[rows] - start, 0, months)
+        offsets_end = np.clip(last[rows] - start + 1, 0, months)
+        amounts = frame.monto[rows] / period
+        diff = np.zeros(months + 1, dtype=np.float64)
+        np.add.at(diff, offsets_start, amounts)
+        np.add.at(diff, offsets_end, -amounts)
+        result[periodicidad] = np.cumsum(diff)[:months]
+    return result
+
+
+def print_report(frame: ContractColumns, top: int, months: int):
+    """Reporte de cartera: totales por moneda, contrapartes principales y compromisos mensuales"""
+    print(f"\n📊 {len(frame)} contratos")
+    by_currency = group_by(frame, ["moneda"])
+    for (moneda,), (count, total) in sorted(by_currency.items()):
+        print(f"   💱 {moneda}: {count} contratos, {total:,.0f}")
+
+    spend = frame.isin("tipo", ["compra", "egreso"])
+    print(f"\n🏢 Gasto por contraparte (top {top}):")
+    ranking = sorted(group_by(frame, ["moneda", "contraparte"], spend).items(), key=lambda item: -item[1][1])
+    for (moneda, contraparte), (count, total) in ranking[:top]:
+        print(f"   • {contraparte}: {moneda} {total:,.0f} ({count} contratos)")
+
+    today = datetime.datetime.now(datetime.timezone.utc)
+    first_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for (moneda,) in sorted(by_currency):
+        commitments = monthly_commitments(frame, first_month, months, moneda)
+        if not commitments:
+            continue
+        print(f"\n📅 Compromisos mensuales recurrentes en {moneda} (próximos {months} meses):")
+        start = month_index(np.array([epoch_seconds(first_month)], dtype=np.int64))[0]
+        total = np.sum(list(commitments.values()), axis=0)
+        for offset in range(months):
+            detail = ", ".join(f"{name} {values[offset]:,.0f}" for name, values in commitments.items() if values[offset])
+            print(f"   {month_label(start + offset)}: {total[offset]:,.0f} ({detail})")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Analítica columnar de contratos")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--snapshot", help="Directorio de un almacén local (snapshot_store.py)")
+    args = parser.parse_args()
+
+    print("📈 Analítica de contratos")
+    print("=" * 50)
+
+    if args.snapshot:
+        source = SnapshotStore(args.snapshot).source()
+    else:
+        db = initialize_firebase()
+        if not db:
+            print("❌ No se pudo inicializar Firebase")
+            return
+        source = firestore_source(db)
+
+    frame = load_contracts(source)
+    print_report(frame, args.top, args.meses)
+
+
+if __name__ == "__main__":
+    main()
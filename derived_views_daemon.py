@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Daemon que mantiene los datos derivados al día con listeners en tiempo real
+Se suscribe con `on_snapshot` a `contratos`, `organizaciones` y `usuarios` y guarda en
+memoria sólo los campos que necesita. La carga inicial de cada listener es la única
+lectura completa; desde ahí Firestore entrega sólo los cambios.
+
+Los cambios se encolan y se agrupan en ventanas de --ventana segundos (el último estado
+de cada documento gana), y cada ventana se aplica en lotes:
+- contraparteOrganizacionId de los contratos que tienen `contraparte` pero no el ID,
+  resuelto por nombre normalizado de organización (también al crear o renombrar una
+  organización)
+- resumenes_contratos/<organizacionId> de las organizaciones con contratos modificados
+  (mismo formato que summarize_contracts.py); al cambiar el día se recalculan todos,
+  porque el histograma de vencimientos depende de la fecha
+- contadores contratos_por_organizacion y usuarios_por_organizacion (sharded_counters.py)
+
+Al arrancar, la carga inicial reescribe los resúmenes de todas las organizaciones, de
+modo que quedan consistentes aunque el daemon haya estado detenido.
+Los contadores se ajustan con deltas: los cambios ocurridos mientras el daemon está
+detenido no se cuentan, así que tras una caída conviene resembrarlos.
+
+Uso:
+    python derived_views_daemon.py
+    python derived_views_daemon.py --emulator localhost:8080 --ventana 1
+"""
+
+import argparse
+import datetime
+import queue
+import signal
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from firestore_utils import EMULATOR_PROJECT, Write, commit_writes, initialize_emulator, initialize_firebase
+from project_budget_rollups import normalize_name
+from sharded_counters import CounterBatch
+from summarize_contracts import MISSING, READ_FIELDS, SUMMARY_COLLECTION, add_contract, new_summary, round_amounts
+
+LINK_FIELD = "contraparteOrganizacionId"
+CONTRACT_FIELDS = sorted(set(READ_FIELDS) | {"contraparte", LINK_FIELD})
+CONTRACT_COUNTER = "contratos_por_organizacion"
+USER_COUNTER = "usuarios_por_organizacion"
+# Orden de aplicación dentro de una ventana: las organizaciones primero, para resolver nombres
+COLLECTIONS = ["organizaciones", "contratos", "usuarios"]
+DEFAULT_WINDOW = 2.0
+MAX_EVENTS_PER_WINDOW = 5000
+
+# Un cambio: (colección, ID, datos o None si se eliminó, ¿carga inicial?)
+Change = Tuple[str, str, Optional[Dict[str, Any]], bool]
+
+
+def utc_today() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class DerivedViews:
+    """Réplica mínima en memoria y cálculo incremental de los datos derivados"""
+
+    def __init__(self, db, counters: bool = True):
+        self.db = db
+        self.contracts: Dict[str, Dict[str, Any]] = {}
+        self.by_org: Dict[str, Set[str]] = defaultdict(set)
+        self.org_names: Dict[str, str] = {}
+        self.name_index: Dict[str, Optional[str]] = {}
+        self.user_orgs: Dict[str, Optional[str]] = {}
+        self.counters = CounterBatch(db) if counters else None
+        self.today = utc_today()
+        self.dirty_orgs: Set[str] = set()
+        # Nombres de organizaciones nuevas o renombradas en la ventana actual
+        self.dirty_names: Set[str] = set()
+        self.names_changed = False
+        # Enlaces escritos cuyo eco aún no llega por el listener
+        self.pending_links: Dict[str, str] = {}
+        self.writes: List[Write] = []
+
+    def _count(self, tipo: str, old: Optional[str], new: Optional[str], initial: bool):
+        if self.counters is None or initial or old == new:
+            return
+        if old:
+            self.counters.increment(tipo, old, -1)
+        if new:
+            self.counters.increment(tipo, new, 1)
+
+    def _rebuild_name_index(self):
+        index: Dict[str, Optional[str]] = {}
+        for org_id, name in self.org_names.items():
+            index[name] = None if name in index else org_id
+        self.name_index = index
+
+    def apply_organization(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        name = normalize_name(str((data or {}).get("nombre") or ""))
+        if data is None or not name:
+            self.names_changed |= self.org_names.pop(doc_id, None) is not None
+        elif self.org_names.get(doc_id) != name:
+            self.org_names[doc_id] = name
+            self.dirty_names.add(name)
+            self.names_changed = True
+
+    def apply_contract(self, doc_id: str, data: Optional[Dict[str, Any]], initial: bool):
+        old = self.contracts.pop(doc_id, None)
+        old_org = old.get("organizacionId") if old else None
+        if old is not None:
+            self.by_org[old_org or MISSING].discard(doc_id)
+            self.dirty_orgs.add(old_org or MISSING)
+
+        if data is None:
+            self.pending_links.pop(doc_id, None)
+        else:
+            data = {field: data[field] for field in CONTRACT_FIELDS if field in data}
+            self.contracts[doc_id] = data
+            summary_org = data.get("organizacionId") or MISSING
+            self.by_org[summary_org].add(doc_id)
+            self.dirty_orgs.add(summary_org)
+            if data.get(LINK_FIELD):
+                self.pending_links.pop(doc_id, None)
+            else:
+                self._link(doc_id, data)
+        self._count(CONTRACT_COUNTER, old_org, data.get("organizacionId") if data else None, initial)
+
+    def apply_user(self, doc_id: str, data: Optional[Dict[str, Any]], initial: bool):
+        old = self.user_orgs.pop(doc_id, None)
+        new = data.get("organizacionId") if data is not None else None
+        if data is not None:
+            self.user_orgs[doc_id] = new
+        self._count(USER_COUNTER, old, new, initial)
+
+    def _link(self, doc_id: str, data: Dict[str, Any]):
+        name = normalize_name(str(data.get("contraparte") or ""))
+        org_id = self.name_index.get(name) if name else None
+        if org_id is None or self.pending_links.get(doc_id) == org_id:
+            return
+        self.pending_links[doc_id] = org_id
+        self.writes.append(("update", self.db.collection("contratos").document(doc_id),
+                            {LINK_FIELD: org_id, "fechaModificacion": SERVER_TIMESTAMP}))
+
+    def apply(self, changes: List[Change]):
+        """Aplica una ventana de cambios ya agrupados (último estado por documento)"""
+        for collection_name in COLLECTIONS:
+            for name, doc_id, data, initial in changes:
+                if name != collection_name:
+                    continue
+                if name == "organizaciones":
+                    self.apply_organization(doc_id, data)
+                elif name == "contratos":
+                    self.apply_contract(doc_id, data, initial)
+                else:
+                    self.apply_user(doc_id, data, initial)
+            if collection_name == "organizaciones" and self.names_changed:
+                self._rebuild_name_index()
+                self._link_names(self.dirty_names)
+                self.dirty_names.clear()
+                self.names_changed = False
+
+    def _link_names(self, names: Set[str]):
+        """Enlaza los contratos sin ID cuya contraparte coincide con organizaciones nuevas o renombradas"""
+        if not names:
+            return
+        for doc_id, data in self.contracts.items():
+            if not data.get(LINK_FIELD) and normalize_name(str(data.get("contraparte") or "")) in names:
+                self._link(doc_id, data)
+
+    def summary_of(self, org_id: str) -> Dict[str, Any]:
+        summary = new_summary()
+        for doc_id in self.by_org.get(org_id, ()):
+            add_contract(summary, self.contracts[doc_id], self.today)
+        return round_amounts(summary)
+
+    def flush(self) -> Dict[str, Any]:
+        """Escribe enlaces, resúmenes de las organizaciones afectadas y contadores"""
+        today = utc_today()
+        if today != self.today:
+            self.today = today
+            self.dirty_orgs.update(self.by_org)
+
+        summaries_ref = self.db.collection(SUMMARY_COLLECTION)
+        links = len(self.writes)
+        for org_id in sorted(self.dirty_orgs):
+            if self.by_org.get(org_id):
+                data = dict(self.summary_of(org_id), organizacionId=org_id, fechaCalculo=SERVER_TIMESTAMP)
+                self.writes.append(("set", summaries_ref.document(org_id), data))
+            else:
+                self.by_org.pop(org_id, None)
+                self.writes.append(("delete", summaries_ref.document(org_id), None))
+        stats = {"enlaces": links, "resumenes": len(self.dirty_orgs), "errores": []}
+        self.dirty_orgs.clear()
+
+        if self.writes:
+            _, stats["errores"] = commit_writes(self.db, self.writes)
+            self.writes = []
+        if self.counters is not None:
+            self.counters.flush()
+            stats["errores"] += self.counters.errors
+            self.counters.errors = []
+        return stats
+
+
+def coalesce(events: List[Change]) -> List[Change]:
+    """
+    Último estado de cada documento, con la carga inicial y los cambios posteriores por
+    separado: primero se aplican los estados iniciales y después los cambios, para que un
+    documento que cambia en la misma ventana de su carga inicial mueva los contadores
+    desde su estado inicial y no se cuente como nuevo.
+    """
+    initial_latest: Dict[Tuple[str, str], Change] = {}
+    delta_latest: Dict[Tuple[str, str], Change] = {}
+    for event in events:
+        name, doc_id, _, initial = event
+        (initial_latest if initial else delta_latest)[(name, doc_id)] = event
+    return list(initial_latest.values()) + list(delta_latest.values())
+
+
+class ChangeListener:
+    """Listeners on_snapshot de las colecciones; los cambios quedan en una cola"""
+
+    def __init__(self, db, collections: List[str] = COLLECTIONS):
+        self.db = db
+        self.collections = collections
+        self.events: "queue.Queue[Change]" = queue.Queue()
+        self.loaded: Set[str] = set()
+        self._watches = []
+
+    def _callback(self, collection_name: str):
+        def on_snapshot(docs, changes, read_time):
+            # La primera entrega de cada listener es la carga inicial (todo como ADDED)
+            initial = collection_name not in self.loaded
+            for change in changes:
+                document = change.document
+                data = None if change.type.name == "REMOVED" else (document.to_dict() or {})
+                self.events.put((collection_name, document.id, data, initial))
+            self.loaded.add(collection_name)
+        return on_snapshot
+
+    def start(self):
+        for collection_name in self.collections:
+            self._watches.append(self.db.collection(collection_name).on_snapshot(self._callback(collection_name)))
+
+    def stop(self):
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+
+    def drain(self, window: float, stop: threading.Event) -> List[Change]:
+        """Espera el primer cambio y junta los que lleguen dentro de la ventana"""
+        events: List[Change] = []
+        try:
+            events.append(self.events.get(timeout=1.0))
+        except queue.Empty:
+            return events
+        deadline = time.monotonic() + window
+        while len(events) < MAX_EVENTS_PER_WINDOW and not stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                events.append(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return events
+
+
+def run(db, window: float = DEFAULT_WINDOW, counters: bool = True, stop: Optional[threading.Event] = None):
+    """Bucle principal: escucha, agrupa y aplica hasta que se active `stop`"""
+    stop = stop or threading.Event()
+    views = DerivedViews(db, counters)
+    listener = ChangeListener(db)
+    listener.start()
+    print(f"👂 Escuchando {', '.join(COLLECTIONS)} (ventana de {window:.1f}s)")
+    try:
+        while not stop.is_set():
+            events = listener.drain(window, stop)
+            if not events:
+                continue
+            changes = coalesce(events)
+            views.apply(changes)
+            stats = views.flush()
+            print(f"   🔄 {len(events)} eventos -> {len(changes)} documentos: {stats['enlaces']} enlaces, "
+                  f"{stats['resumenes']} resúmenes")
+            for error in stats["errores"][:5]:
+                print(f"   ❌ {error}")
+    finally:
+        listener.stop()
+    print("👋 Daemon detenido")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Mantiene datos derivados con listeners en tiempo real")
+    parser.add_argument("--ventana", type=float, default=DEFAULT_WINDOW, help="Segundos para agrupar cambios")
+    parser.add_argument("--sin-contadores", action="store_true", help="No ajusta los contadores distribuidos")
+    parser.add_argument("--emulator", help="host:puerto del emulador de Firestore")
+    parser.add_argument("--project", default=EMULATOR_PROJECT, help="ID de proyecto en el emulador")
+    args = parser.parse_args()
+
+    print("🛰️ Daemon de datos derivados")
+    print("=" * 50)
+
+    db = initialize_emulator(args.emulator, args.project) if args.emulator else initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    run(db, args.ventana, not args.sin_contadores, stop)
+
+
+if __name__ == "__main__":
+    main()
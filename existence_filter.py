@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Filtros de Bloom de existencia para importaciones idempotentes
+Antes de reimportar organizaciones, contrapartes o contratos hay que saber qué IDs (o
+claves naturales, p. ej. `rut`) ya existen; verificarlos uno a uno cuesta una lectura
+por registro aunque casi todos sean nuevos.
+
+El filtro se construye una vez desde un recorrido que sólo lee IDs (proyección vacía)
+o sólo el campo clave, o desde un almacén local (snapshot_store.py) sin lecturas, y se
+guarda en .existence_filters/. Un importador consulta el filtro: si responde "no está",
+el registro es nuevo con certeza y no se lee nada; sólo los "quizás está" (los que
+existen más una fracción --error de falsos positivos) se verifican en Firestore.
+
+El filtro refleja la colección al momento de construirlo: los documentos creados después
+por otros procesos no están, así que conviene reconstruirlo antes de cada importación
+grande (load_filter descarta los filtros más antiguos que `max_age`). Los importadores
+agregan al filtro lo que crean.
+
+Formato del archivo: cabecera "<8sQIQd" (magic, bits, funciones hash, claves, fecha de
+construcción) seguida del arreglo de bits.
+
+Uso:
+    python existence_filter.py build organizaciones
+    python existence_filter.py build contrapartes --campo rut --snapshot store/
+    python existence_filter.py check organizaciones ID1 ID2
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import struct
+import time
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from firestore_utils import ThroughputReporter, get_documents, initialize_firebase, stream_collection
+from snapshot_store import SnapshotStore
+
+DEFAULT_FILTER_DIR = ".existence_filters"
+FILTER_MAGIC = b"FSBLOOM1"
+HEADER = struct.Struct("<8sQIQd")
+DEFAULT_ERROR_RATE = 0.001
+# Holgura de capacidad para las claves que se agreguen después de construirlo
+GROWTH_FACTOR = 1.5
+
+
+class BloomFilter:
+    """Filtro de Bloom con doble hashing sobre blake2b (sin falsos negativos)"""
+
+    def __init__(self, bits: int, hashes: int, count: int = 0, built: Optional[float] = None,
+                 data: Optional[bytearray] = None):
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+        self.built = built if built is not None else time.time()
+        self.data = data if data is not None else bytearray((bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = DEFAULT_ERROR_RATE) -> "BloomFilter":
+        """Tamaño óptimo para `capacity` claves con tasa de falsos positivos `error_rate`"""
+        capacity = max(capacity, 1)
+        bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        hashes = max(1, int(round(bits / capacity * math.log(2))))
+        return cls(bits, hashes)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def error_rate(self) -> float:
+        """Tasa de falsos positivos estimada con las claves actuales"""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def age(self) -> float:
+        return time.time() - self.built
+
+    def save(self, path: str):
+        """Guarda el filtro de forma atómica (archivo temporal + rename)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(FILTER_MAGIC, self.bits, self.hashes, self.count, self.built))
+            f.write(self.data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as f:
+            magic, bits, hashes, count, built = HEADER.unpack(f.read(HEADER.size))
+            if magic != FILTER_MAGIC:
+                raise ValueError(f"Filtro inválido: {path}")
+            return cls(bits, hashes, count, built, bytearray(f.read()))
+
+
+def filter_path(collection_name: str, field: Optional[str] = None, directory: str = DEFAULT_FILTER_DIR) -> str:
+    return os.path.join(directory, f"{collection_name}.{field or 'id'}.bloom")
+
+
+def load_filter(collection_name: str, field: Optional[str] = None, max_age: Optional[float] = None,
+                directory: str = DEFAULT_FILTER_DIR) -> Optional[BloomFilter]:
+    """Filtro guardado de la colección, o None si no existe o tiene más de `max_age` segundos"""
+    path = filter_path(collection_name, field, directory)
+    if not os.path.exists(path):
+        return None
+    bloom = BloomFilter.load(path)
+    if max_age is not None and bloom.age() > max_age:
+        return None
+    return bloom
+
+
+def firestore_keys(db, collection_name: str, field: Optional[str] = None) -> Tuple[int, Iterator[str]]:
+    """(cantidad, claves) de Firestore: sólo IDs (proyección vacía) o sólo el campo clave"""
+    total = int(db.collection(collection_name).count().get()[0][0].value)
+
+    def keys():
+        for doc in stream_collection(db, collection_name, fields=[field] if field else []):
+            if field is None:
+                yield doc.id
+            else:
+                value = (doc.to_dict() or {}).get(field)
+                if value is not None:
+                    yield str(value)
+    return total, keys()
+
+
+def store_keys(store_dir: str, collection_name: str, field: Optional[str] = None) -> Tuple[int, Iterator[str]]:
+    """(cantidad, claves) de un almacén local, sin lecturas de Firestore"""
+    collection = SnapshotStore(store_dir).collection(collection_name)
+
+    def keys():
+        for position in range(len(collection)):
+            if field is None:
+                yield collection.id_at(position)
+            else:
+                value = collection.document_at(position, [field]).to_dict().get(field)
+                if value is not None:
+                    yield str(value)
+    return len(collection), keys()
+
+
+def build_filter(total: int, keys: Iterable[str], error_rate: float = DEFAULT_ERROR_RATE,
+                 label: str = "claves") -> BloomFilter:
+    bloom = BloomFilter.for_capacity(int(total * GROWTH_FACTOR) + 1000, error_rate)
+    reporter = ThroughputReporter(label, every=100000)
+    for key in keys:
+        bloom.add(key)
+        reporter.add()
+    print(f"   ⏱️ {reporter.summary()}")
+    return bloom
+
+
+def existing_ids(db, collection_name: str, doc_ids: Iterable[str],
+                 bloom: Optional[BloomFilter] = None) -> Tuple[Set[str], Dict[str, int]]:
+    """
+    IDs de `doc_ids` que existen en la colección. Con `bloom`, sólo se leen los posibles
+    aciertos del filtro; los descartados son nuevos con certeza.
+    """
+    doc_ids = list(dict.fromkeys(doc_ids))
+    candidates = [doc_id for doc_id in doc_ids if bloom is None or doc_id in bloom]
+    found = set(get_documents(db, collection_name, candidates, fields=[])) if candidates else set()
+    return found, {"consultados": len(doc_ids), "leidos": len(candidates), "existentes": len(found),
+                   "falsos_positivos": len(candidates) - len(found)}
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Filtros de Bloom de existencia de documentos")
+    parser.add_argument("--dir", default=DEFAULT_FILTER_DIR)
+    subparsers = parser.add_subparsers(dest="accion", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Construye el filtro de una colección")
+    build_parser.add_argument("coleccion")
+    build_parser.add_argument("--campo", help="Clave natural en vez del ID (p. ej. rut)")
+    build_parser.add_argument("--snapshot", help="Construye desde un almacén local (snapshot_store.py)")
+    build_parser.add_argument("--error", type=float, default=DEFAULT_ERROR_RATE, help="Tasa de falsos positivos")
+
+    check_parser = subparsers.add_parser("check", help="Verifica IDs usando el filtro")
+    check_parser.add_argument("coleccion")
+    check_parser.add_argument("ids", nargs="+")
+    args = parser.parse_args()
+
+    print("🌸 Filtro de existencia")
+    print("=" * 50)
+
+    if args.accion == "build":
+        if args.snapshot:
+            total, keys = store_keys(args.snapshot, args.coleccion, args.campo)
+        else:
+            db = initialize_firebase()
+            if not db:
+                print("❌ No se pudo inicializar Firebase")
+                return
+            total, keys = firestore_keys(db, args.coleccion, args.campo)
+        bloom = build_filter(total, keys, args.error, args.coleccion)
+        path = filter_path(args.coleccion, args.campo, args.dir)
+        bloom.save(path)
+        print(f"✅ {path}: {bloom.count} claves, {bloom.bits // 8 / 1024:.1f} KB, {bloom.hashes} funciones hash, "
+              f"falsos positivos ~{bloom.error_rate():.4%}")
+        return
+
+    bloom = load_filter(args.coleccion, directory=args.dir)
+    if bloom is None:
+        print(f"❌ No hay filtro para {args.coleccion}; constrúyelo con 'build'")
+        return
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+    found, stats = existing_ids(db, args.coleccion, args.ids, bloom)
+    for doc_id in args.ids:
+        print(f"   {'✅ existe' if doc_id in found else '➕ nuevo'}: {doc_id}")
+    print(f"\n📊 {stats['leidos']} lecturas para {stats['consultados']} IDs "
+          f"({stats['falsos_positivos']} falsos positivos); filtro de hace {bloom.age() / 3600:.1f} h")
+
+
+if __name__ == "__main__":
+    main()
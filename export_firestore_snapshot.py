@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Exportación de colecciones de Firestore a un snapshot local comprimido
+Cada colección se divide en particiones que se leen en paralelo, todas con el mismo
+read_time fijado al inicio, de modo que el snapshot es consistente aunque la base cambie
+durante la exportación. Cada partición se escribe en su propio archivo NDJSON
+comprimido y se registra en manifest.json al terminar.
+
+Si la exportación se interrumpe, al volver a ejecutarla con el mismo --output se
+reutilizan el read_time y los límites de partición del manifiesto y sólo se exportan
+las particiones pendientes. Sin Point-in-Time Recovery, Firestore sólo permite leer con
+un read_time de la última hora; pasado ese plazo hay que empezar de nuevo (--restart).
+
+Uso:
+    python export_firestore_snapshot.py
+    python export_firestore_snapshot.py --output snapshots/prod --partitions 16 contratos usuarios
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from firestore_utils import ThroughputReporter, bounded_query, initialize_firebase, partition_bounds
+from snapshot_utils import encode_document, load_manifest, save_manifest
+
+DEFAULT_COLLECTIONS = ["contratos", "proyectos", "organizaciones", "contrapartes", "usuarios"]
+# Plazo para leer con un read_time antiguo sin Point-in-Time Recovery
+MAX_READ_AGE = datetime.timedelta(hours=1)
+
+
+def default_output() -> str:
+    return os.path.join("snapshots", datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+
+def new_manifest(read_time: datetime.datetime) -> Dict[str, Any]:
+    return {"read_time": read_time.isoformat(), "colecciones": {}}
+
+
+def export_partition(db, directory: str, collection_name: str, index: int, start: Optional[str],
+                     end: Optional[str], read_time: datetime.datetime,
+                     reporter: ThroughputReporter) -> Dict[str, Any]:
+    """Escribe una partición en part-NNNNN.ndjson.gz; devuelve su entrada del manifiesto"""
+    relative = os.path.join(collection_name, f"part-{index:05d}.ndjson.gz")
+    path = os.path.join(directory, relative)
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for doc in bounded_query(db, collection_name, start, end).stream(read_time=read_time):
+            f.write(json.dumps(encode_document(doc), ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+            reporter.add()
+    os.replace(tmp_path, path)
+    return {"inicio": start, "fin": end, "archivo": relative, "documentos": count,
+            "bytes": os.path.getsize(path)}
+
+
+def export_snapshot(db, directory: str, collections: List[str], partitions: int = 8,
+                    max_workers: int = 8) -> Dict[str, Any]:
+    """Exporta (o completa) el snapshot en `directory` y devuelve el manifiesto"""
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    if manifest is None:
+        # Minuto completo: válido también como read_time de Point-in-Time Recovery
+        read_time = datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+        manifest = new_manifest(read_time)
+    read_time = datetime.datetime.fromisoformat(manifest["read_time"])
+    age = datetime.datetime.now(datetime.timezone.utc) - read_time
+    if age > MAX_READ_AGE:
+        print(f"⚠️ El read_time del snapshot tiene {age}; sin Point-in-Time Recovery la lectura fallará")
+
+    for collection_name in collections:
+        if collection_name not in manifest["colecciones"]:
+            bounds = partition_bounds(db, collection_name, partitions, read_time)
+            manifest["colecciones"][collection_name] = {
+                "completa": False,
+                "particiones": [{"inicio": start, "fin": end} for start, end in bounds],
+            }
+            os.makedirs(os.path.join(directory, collection_name), exist_ok=True)
+    save_manifest(directory, manifest)
+
+    pending = [(collection_name, index, part)
+               for collection_name in collections
+               for index, part in enumerate(manifest["colecciones"][collection_name]["particiones"])
+               if "archivo" not in part]
+    print(f"📦 read_time {manifest['read_time']}: {len(pending)} particiones pendientes")
+
+    reporter = ThroughputReporter("documentos", every=10000)
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(export_partition, db, directory, collection_name, index, part["inicio"],
+                                   part["fin"], read_time, reporter): (collection_name, index)
+                   for collection_name, index, part in pending}
+        for future in as_completed(futures):
+            collection_name, index = futures[future]
+            try:
+                manifest["colecciones"][collection_name]["particiones"][index] = future.result()
+            except Exception as e:
+                errors.append(f"{collection_name} parte {index}: {e}")
+                continue
+            # El manifiesto sólo se actualiza desde este hilo
+            save_manifest(directory, manifest)
+
+    for collection_name in collections:
+        collection = manifest["colecciones"][collection_name]
+        collection["completa"] = all("archivo" in part for part in collection["particiones"])
+        collection["documentos"] = sum(part.get("documentos", 0) for part in collection["particiones"])
+    save_manifest(directory, manifest)
+
+    print(f"   ⏱️ {reporter.summary()}")
+    for error in errors[:10]:
+        print(f"   ❌ {error}")
+    return manifest
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Exporta colecciones de Firestore a un snapshot local")
+    parser.add_argument("collections", nargs="*", default=DEFAULT_COLLECTIONS)
+    parser.add_argument("--output", help="Directorio del snapshot (por defecto snapshots/<fecha>)")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--restart", action="store_true", help="Descarta una exportación previa en --output")
+    args = parser.parse_args()
+
+    print("📦 Exportación de snapshot de Firestore")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    directory = args.output or default_output()
+    if args.restart and os.path.exists(directory):
+        shutil.rmtree(directory)
+
+    manifest = export_snapshot(db, directory, args.collections, args.partitions, args.workers)
+
+    print("\n📊 Resumen:")
+    for collection_name in args.collections:
+        collection = manifest["colecciones"][collection_name]
+        status = "✅" if collection["completa"] else "⏸️"
+        print(f"   {status} {collection_name}: {collection['documentos']} documentos "
+              f"en {len(collection['particiones'])} particiones")
+    if all(manifest["colecciones"][name]["completa"] for name in args.collections):
+        print(f"\n💾 Snapshot completo en {directory}")
+    else:
+        print(f"\n⚠️ Snapshot incompleto; vuelve a ejecutar con --output {directory} para retomarlo")
+
+
+if __name__ == "__main__":
+    main()
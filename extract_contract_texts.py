@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Extracción masiva de texto de los PDFs de contratos
+Descarga los PDFs referenciados por `contratos.pdfUrl`, extrae texto y número de páginas
+con un proceso por archivo (a lo más --workers a la vez) y guarda el resultado en una
+caché direccionada por el hash de contenido del blob (MD5 de Storage), de modo que los
+documentos sin cambios nunca se vuelven a procesar.
+
+Las descargas en vuelo se acotan a 2 * --workers, así que la memoria no crece con el
+número de PDFs. Un proceso que supera --timeout se termina, aunque pypdf quede atrapado
+en un archivo malformado.
+
+Salida compacta para indexación: contract_texts.jsonl.gz, una línea por contrato con
+{"id", "organizacionId", "hash", "paginas", "texto"}. Los PDFs que pypdf rechaza como
+inválidos quedan en caché con su error (borra su entrada para reintentarlos); los
+timeouts y los demás errores no se guardan y se reintentan en la próxima ejecución.
+
+Uso:
+    python extract_contract_texts.py
+    python extract_contract_texts.py --workers 8 --timeout 60 --local-dir ./storage-local
+"""
+
+import argparse
+import gzip
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+
+from firestore_utils import ThroughputReporter, initialize_firebase, stream_collection
+from storage_utils import CONTRACTS_PREFIX, blob_path_from_url, get_bucket, list_blobs_parallel
+
+DEFAULT_CACHE_DIR = ".pdf_text_cache"
+DEFAULT_OUTPUT = "contract_texts.jsonl.gz"
+DEFAULT_TIMEOUT = 120
+DOWNLOAD_WORKERS = 16
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def extract_pdf_text(content: bytes) -> Tuple[str, int]:
+    """Extrae (texto normalizado, páginas) de un PDF en memoria"""
+    reader = PdfReader(io.BytesIO(content))
+    pages = [page.extract_text() or "" for page in reader.pages]
+    return WHITESPACE.sub(" ", " ".join(pages)).strip(), len(pages)
+
+
+def _extraction_worker(content: bytes, connection):
+    """Proceso de un PDF: envía ("ok", (texto, páginas)), ("invalido", error) o ("error", error)"""
+    try:
+        connection.send(("ok", extract_pdf_text(content)))
+    except PyPdfError as e:
+        connection.send(("invalido", str(e)))
+    except Exception as e:
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+
+def download_contents(bucket, paths: Dict[str, str],
+                      max_in_flight: int) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """
+    Descarga los blobs de `paths` (hash -> ruta) con a lo más `max_in_flight` descargas
+    pendientes; devuelve (hash, contenido, error) a medida que terminan.
+    """
+    items = iter(paths.items())
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, max_in_flight)) as executor:
+        in_flight = {}
+        while True:
+            for content_hash, path in itertools.islice(items, max_in_flight - len(in_flight)):
+                in_flight[executor.submit(bucket.blob(path).download_as_bytes)] = content_hash
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                content_hash = in_flight.pop(future)
+                try:
+                    content, error = future.result(), None
+                except Exception as e:
+                    content, error = None, str(e)
+                yield content_hash, content, error
+
+
+def extract_in_processes(contents: Iterator[Tuple[str, bytes]], workers: int,
+                         timeout: int) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Extrae cada contenido en su propio proceso, con a lo más `workers` a la vez. El
+    proceso que supera `timeout` segundos se termina, sin bloquear a los demás.
+    Devuelve (hash, estado, resultado) con estado ok, invalido, error o timeout.
+    """
+    context = multiprocessing.get_context()
+    # conexión -> (hash, proceso, plazo)
+    running: Dict[Any, Tuple[str, Any, float]] = {}
+    exhausted = False
+    while running or not exhausted:
+        while not exhausted and len(running) < workers:
+            item = next(contents, None)
+            if item is None:
+                exhausted = True
+                break
+            content_hash, content = item
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_extraction_worker, args=(content, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (content_hash, process, time.monotonic() + timeout)
+        if not running:
+            break
+
+        nearest = min(deadline for _, _, deadline in running.values())
+        ready = wait_connections(list(running), timeout=max(0.0, nearest - time.monotonic()))
+        now = time.monotonic()
+        for receiver in list(running):
+            content_hash, process, deadline = running[receiver]
+            if receiver in ready:
+                try:
+                    status, result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    status, result = "error", f"el proceso terminó con código {process.exitcode}"
+            elif now >= deadline:
+                process.kill()
+                status, result = "timeout", None
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[receiver]
+            yield content_hash, status, result
+
+
+def cache_path(cache_dir: str, content_hash: str) -> str:
+    """Ruta del archivo de caché para un hash (dos niveles para no saturar un directorio)"""
+    safe_hash = content_hash.replace("/", "_").replace("+", "-").rstrip("=")
+    return os.path.join(cache_dir, safe_hash[:2], f"{safe_hash}.json.gz")
+
+
+def read_cache(cache_dir: str, content_hash: str) -> Optional[Dict[str, Any]]:
+    """Entrada de la caché, o None si no existe o está corrupta (se vuelve a extraer)"""
+    path = cache_path(cache_dir, content_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def write_cache(cache_dir: str, content_hash: str, entry: Dict[str, Any]):
+    """Guarda una entrada de forma atómica (archivo temporal + rename)"""
+    path = cache_path(cache_dir, content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def extract_contract_texts(db, bucket, cache_dir: str = DEFAULT_CACHE_DIR, output: str = DEFAULT_OUTPUT,
+                           workers: Optional[int] = None, timeout: int = DEFAULT_TIMEOUT,
+                           bucket_name: Optional[str] = None) -> Dict[str, int]:
+    """Extrae el texto de todos los contratos con PDF y escribe la salida compacta"""
+    stats = {"contratos": 0, "sin_blob": 0, "en_cache": 0, "extraidos": 0, "errores": 0, "timeouts": 0}
+
+    blobs = list_blobs_parallel(bucket, CONTRACTS_PREFIX)
+
+    # contrato -> (organizacionId, ruta del blob, hash de contenido)
+    contracts: Dict[str, Tuple[Optional[str], str, str]] = {}
+    for doc in stream_collection(db, "contratos", fields=["pdfUrl", "organizacionId"]):
+        data = doc.to_dict() or {}
+        path = blob_path_from_url(data.get("pdfUrl"), bucket_name)
+        if path is None:
+            continue
+        stats["contratos"] += 1
+        blob = blobs.get(path)
+        if blob is None or not blob.md5_hash:
+            stats["sin_blob"] += 1
+            continue
+        contracts[doc.id] = (data.get("organizacionId"), path, blob.md5_hash)
+
+    # Cada contenido distinto se procesa una sola vez, aunque varios contratos lo compartan
+    pending: Dict[str, str] = {}
+    seen = set()
+    for _, path, content_hash in contracts.values():
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        # Una entrada truncada por una ejecución anterior interrumpida cuenta como ausente
+        if read_cache(cache_dir, content_hash) is not None:
+            stats["en_cache"] += 1
+        else:
+            pending[content_hash] = path
+
+    print(f"📄 {len(contracts)} contratos con PDF, {len(pending)} documentos por extraer "
+          f"({stats['en_cache']} en caché)")
+
+    workers = workers or os.cpu_count() or 1
+
+    def downloaded() -> Iterator[Tuple[str, bytes]]:
+        for content_hash, content, error in download_contents(bucket, pending, 2 * workers):
+            if error is not None:
+                print(f"   ❌ Error descargando {pending[content_hash]}: {error}")
+                stats["errores"] += 1
+                continue
+            yield content_hash, content
+
+    reporter = ThroughputReporter("extracción", every=100)
+    for content_hash, status, result in extract_in_processes(downloaded(), workers, timeout):
+        if status == "ok":
+            text, pages = result
+            write_cache(cache_dir, content_hash, {"hash": content_hash, "paginas": pages, "texto": text})
+            stats["extraidos"] += 1
+        elif status == "timeout":
+            print(f"   ⏰ Tiempo agotado: {pending[content_hash]}")
+            stats["timeouts"] += 1
+        else:
+            print(f"   ❌ Error extrayendo {pending[content_hash]}: {result}")
+            stats["errores"] += 1
+            # Sólo un PDF inválido falla igual al reintentarlo; el resto no se guarda
+            if status == "invalido":
+                write_cache(cache_dir, content_hash, {"hash": content_hash, "error": result})
+        reporter.add()
+
+    with gzip.open(output, "wt", encoding="utf-8") as f:
+        for contract_id, (organizacion_id, _, content_hash) in sorted(contracts.items()):
+            entry = read_cache(cache_dir, content_hash)
+            if entry is None or "error" in entry:
+                continue
+            f.write(json.dumps({"id": contract_id, "organizacionId": organizacion_id, "hash": content_hash,
+                                "paginas": entry["paginas"], "texto": entry["texto"]}, ensure_ascii=False) + "\n")
+
+    print(f"   ⏱️ {reporter.summary()}")
+    return stats
+
+
+def load_contract_texts(path: str = DEFAULT_OUTPUT) -> Dict[str, Dict[str, Any]]:
+    """Carga la salida de la extracción: contratoId -> entrada"""
+    texts = {}
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                texts[entry["id"]] = entry
+    return texts
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Extrae el texto de los PDFs de contratos")
+    parser.add_argument("--bucket", help="Nombre del bucket (por defecto VITE_STORAGE_BUCKET)")
+    parser.add_argument("--local-dir", help="Usa un directorio local como bucket")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--workers", type=int, help="Procesos de extracción (por defecto, núcleos de CPU)")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="Segundos máximos por archivo")
+    args = parser.parse_args()
+
+    print("📑 Extracción de texto de contratos")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+    bucket = get_bucket(args.bucket, args.local_dir)
+
+    stats = extract_contract_texts(db, bucket, args.cache_dir, args.output, args.workers, args.timeout,
+                                   None if args.local_dir else bucket.name)
+
+    print("\n📊 Resumen:")
+    print(f"   📄 Contratos con PDF: {stats['contratos']}")
+    print(f"   ♻️ En caché: {stats['en_cache']}")
+    print(f"   ✅ Extraídos: {stats['extraidos']}")
+    if stats["sin_blob"]:
+        print(f"   ⚠️ Sin blob en Storage: {stats['sin_blob']}")
+    if stats["timeouts"] or stats["errores"]:
+        print(f"   ❌ Timeouts: {stats['timeouts']}, errores: {stats['errores']}")
+    print(f"\n💾 Textos guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Script para inferir el esquema de las colecciones de Firestore por muestreo
+Para cada colección calcula rutas de campos, distribución de tipos, proporción de
+presencia, cardinalidad de enumeraciones y percentiles del tamaño de documento.
+
+El número de lecturas está acotado por --max-docs: las colecciones pequeñas se recorren
+completas y las grandes se muestrean leyendo el inicio de cada partición que entrega
+Firestore (get_partitions), que reparte los cortes según los documentos existentes y no
+supone IDs automáticos uniformes.
+
+Guarda el resultado en JSON y lo compara con la ejecución anterior para detectar
+deriva de esquema (campos nuevos, eliminados, cambios de tipo y nombres casi duplicados
+como `role`/`rol`).
+
+Con --snapshot se lee un almacén local (snapshot_store.py) en vez de Firestore; el
+muestreo toma posiciones al azar del índice, sin costo de lecturas.
+
+Uso:
+    python extract_firestore_schema.py                       # colecciones por defecto
+    python extract_firestore_schema.py contratos usuarios --max-docs 5000
+    python extract_firestore_schema.py --snapshot store/
+"""
+
+import argparse
+import datetime
+import difflib
+import json
+import math
+import os
+import random
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List
+
+from firestore_utils import initialize_firebase, partition_collection, stream_collection
+from snapshot_store import SnapshotStore
+
+DEFAULT_COLLECTIONS = ["contratos", "proyectos", "organizaciones", "contrapartes", "usuarios",
+                       "registros_auditoria"]
+DEFAULT_OUTPUT = "firestore_schema.json"
+
+# Valores distintos máximos para considerar un campo string como enumeración
+ENUM_LIMIT = 25
+# Cantidad de documentos leídos al inicio de cada partición
+PROBE_SIZE = 50
+# Umbral de similitud para reportar nombres de campo casi duplicados
+SIMILAR_NAME_RATIO = 0.8
+# Cambio mínimo en la proporción de presencia que se reporta como deriva
+PRESENCE_DRIFT = 0.2
+
+
+def value_type(value: Any) -> str:
+    """Devuelve el nombre del tipo de Firestore para un valor de Python"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime.datetime):
+        return "timestamp"
+    if isinstance(value, dict):
+        return "map"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, bytes):
+        return "bytes"
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):
+        return "geopoint"
+    if hasattr(value, "path") and hasattr(value, "id"):
+        return "reference"
+    return type(value).__name__
+
+
+def value_size(value: Any) -> int:
+    """Estima el tamaño de almacenamiento de un valor según las reglas de Firestore"""
+    kind = value_type(value)
+    if kind == "string":
+        return len(value.encode("utf-8")) + 1
+    if kind in ("integer", "double", "timestamp"):
+        return 8
+    if kind in ("boolean", "null"):
+        return 1
+    if kind == "geopoint":
+        return 16
+    if kind == "bytes":
+        return len(value)
+    if kind == "map":
+        return sum(len(key.encode("utf-8")) + 1 + value_size(item) for key, item in value.items())
+    if kind == "array":
+        return sum(value_size(item) for item in value)
+    if kind == "reference":
+        return len(value.path.encode("utf-8")) + 1
+    return 8
+
+
+def document_size(collection_name: str, doc_id: str, data: Dict[str, Any]) -> int:
+    """Estima el tamaño de un documento: nombre + campos + 32 bytes de overhead"""
+    name_size = len(collection_name.encode("utf-8")) + 1 + len(doc_id.encode("utf-8")) + 1 + 16
+    return name_size + value_size(data) + 32
+
+
+def iter_fields(data: Dict[str, Any], prefix: str = "") -> Iterator[tuple]:
+    """Recorre un documento devolviendo (ruta, valor); los elementos de arreglos usan `campo[]`"""
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        yield path, value
+        if isinstance(value, dict):
+            yield from iter_fields(value, f"{path}.")
+        elif isinstance(value, list):
+            for item in value:
+                yield f"{path}[]", item
+                if isinstance(item, dict):
+                    yield from iter_fields(item, f"{path}[].")
+
+
+def sample_documents(db, collection_name: str, max_docs: int) -> tuple:
+    """
+    Devuelve (muestra, total de documentos, método) leyendo a lo más ~max_docs documentos.
+    El total se obtiene con una agregación count(), que cuesta 1 lectura por cada 1000 documentos.
+    """
+    collection_ref = db.collection(collection_name)
+    total = collection_ref.count().get()[0][0].value
+
+    if total <= max_docs:
+        return list(stream_collection(db, collection_name)), total, "completo"
+
+    # Los cortes de partición siguen la distribución real de los IDs (también los no
+    # automáticos); se leen PROBE_SIZE documentos desde el inicio de cada partición
+    sample: Dict[str, Any] = {}
+    for query in partition_collection(db, collection_name, math.ceil(max_docs / PROBE_SIZE)):
+        added = 0
+        for doc in query.limit(PROBE_SIZE).stream():
+            if doc.id not in sample:
+                sample[doc.id] = doc
+                added += 1
+        # Una lectura que no aporta IDs nuevos indica que la colección ya no da más muestra
+        if not added or len(sample) >= max_docs:
+            break
+
+    return list(sample.values()), total, "muestreo"
+
+
+def sample_store(store: SnapshotStore, collection_name: str, max_docs: int) -> tuple:
+    """Como sample_documents, pero sobre un almacén local: posiciones al azar del índice"""
+    collection = store.collection(collection_name)
+    total = len(collection)
+    if total <= max_docs:
+        return list(collection.scan()), total, "completo"
+    positions = sorted(random.sample(range(total), max_docs))
+    return [collection.document_at(position) for position in positions], total, "muestreo"
+
+
+def percentile(sorted_values: List[int], fraction: float) -> int:
+    """Percentil por el método del rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def infer_collection_schema(collection_name: str, docs: List[Any]) -> Dict[str, Any]:
+    """Infiere el esquema de una colección a partir de una muestra de documentos"""
+    presence: Counter = Counter()
+    types: Dict[str, Counter] = defaultdict(Counter)
+    values: Dict[str, Counter] = defaultdict(Counter)
+    sizes: List[int] = []
+
+    for doc in docs:
+        data = doc.to_dict() or {}
+        sizes.append(document_size(collection_name, doc.id, data))
+        paths_in_doc = set()
+        for path, value in iter_fields(data):
+            paths_in_doc.add(path)
+            kind = value_type(value)
+            types[path][kind] += 1
+            if kind == "string" and len(values[path]) <= ENUM_LIMIT:
+                values[path][value] += 1
+        presence.update(paths_in_doc)
+
+    sample_size = len(docs)
+    fields = {}
+    for path in sorted(types):
+        field = {
+            "presencia": round(presence[path] / sample_size, 4) if sample_size else 0,
+            "tipos": dict(types[path].most_common()),
+        }
+        if "string" in types[path]:
+            distinct = len(values[path])
+            field["cardinalidad"] = distinct if distinct <= ENUM_LIMIT else f">{ENUM_LIMIT}"
+            if distinct <= ENUM_LIMIT:
+                field["valores"] = sorted(values[path])
+        fields[path] = field
+
+    sizes.sort()
+    return {
+        "muestra": sample_size,
+        "campos": fields,
+        "tamaño_bytes": {
+            "p50": percentile(sizes, 0.50),
+            "p90": percentile(sizes, 0.90),
+            "p99": percentile(sizes, 0.99),
+            "max": sizes[-1] if sizes else 0,
+        },
+    }
+
+
+def similar_names(new_paths: List[str], existing_paths: List[str]) -> List[tuple]:
+    """Encuentra pares de rutas hermanas con nombres muy parecidos (p. ej. role/rol)"""
+    pairs = []
+    for new_path in new_paths:
+        parent, _, name = new_path.rpartition(".")
+        for other in existing_paths:
+            other_parent, _, other_name = other.rpartition(".")
+            if other == new_path or other_parent != parent or "[]" in (name[-2:], other_name[-2:]):
+                continue
+            if difflib.SequenceMatcher(None, name.lower(), other_name.lower()).ratio() >= SIMILAR_NAME_RATIO:
+                pairs.append((new_path, other))
+    return pairs
+
+
+def diff_schemas(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Compara dos esquemas y devuelve la deriva por colección"""
+    drift = {}
+    for collection_name, schema in current.get("colecciones", {}).items():
+        old_fields = previous.get("colecciones", {}).get(collection_name, {}).get("campos", {})
+        new_fields = schema["campos"]
+
+        added = sorted(set(new_fields) - set(old_fields)) if old_fields else []
+        removed = sorted(set(old_fields) - set(new_fields))
+        type_changes = {
+            path: {"antes": sorted(old_fields[path]["tipos"]), "ahora": sorted(new_fields[path]["tipos"])}
+            for path in set(new_fields) & set(old_fields)
+            if set(new_fields[path]["tipos"]) != set(old_fields[path]["tipos"])
+        }
+        presence_changes = {
+            path: {"antes": old_fields[path]["presencia"], "ahora": new_fields[path]["presencia"]}
+            for path in set(new_fields) & set(old_fields)
+            if abs(new_fields[path]["presencia"] - old_fields[path]["presencia"]) >= PRESENCE_DRIFT
+        }
+        # Los nombres casi duplicados se reportan siempre, aunque no exista una ejecución previa
+        duplicates = similar_names(sorted(new_fields), sorted(new_fields))
+        duplicates = sorted({tuple(sorted(pair)) for pair in duplicates})
+
+        entry = {key: value for key, value in (
+            ("nuevos", added), ("eliminados", removed), ("cambios_tipo", type_changes),
+            ("cambios_presencia", presence_changes), ("nombres_similares", duplicates),
+        ) if value}
+        if entry:
+            drift[collection_name] = entry
+    return drift
+
+
+def print_drift(drift: Dict[str, Any]):
+    """Imprime la deriva de esquema detectada"""
+    if not drift:
+        print("\n✅ Sin deriva de esquema respecto a la ejecución anterior")
+        return
+    print("\n⚠️ Deriva de esquema detectada:")
+    for collection_name, entry in drift.items():
+        print(f"\n📁 {collection_name}")
+        for path in entry.get("nuevos", []):
+            print(f"   ➕ Campo nuevo: {path}")
+        for path in entry.get("eliminados", []):
+            print(f"   ➖ Campo eliminado: {path}")
+        for path, change in entry.get("cambios_tipo", {}).items():
+            print(f"   🔀 Cambio de tipo en {path}: {change['antes']} -> {change['ahora']}")
+        for path, change in entry.get("cambios_presencia", {}).items():
+            print(f"   📉 Presencia de {path}: {change['antes']:.0%} -> {change['ahora']:.0%}")
+        for first, second in entry.get("nombres_similares", []):
+            print(f"   👯 Nombres casi duplicados: {first} / {second}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Infiere el esquema de Firestore por muestreo")
+    parser.add_argument("collections", nargs="*", default=DEFAULT_COLLECTIONS)
+    parser.add_argument("--max-docs", type=int, default=2000, help="Lecturas máximas por colección")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--snapshot", help="Directorio de un almacén local (snapshot_store.py)")
+    args = parser.parse_args()
+
+    print("🔍 Extracción de esquema de Firestore")
+    print("=" * 50)
+
+    if args.snapshot:
+        store = SnapshotStore(args.snapshot)
+        collections = [name for name in args.collections if name in store.collections()]
+        sample = lambda name: sample_store(store, name, args.max_docs)
+    else:
+        db = initialize_firebase()
+        if not db:
+            print("❌ No se pudo inicializar Firebase")
+            return
+        collections = args.collections
+        sample = lambda name: sample_documents(db, name, args.max_docs)
+
+    schema = {"generado": datetime.datetime.now().isoformat(timespec="seconds"), "colecciones": {}}
+    for collection_name in collections:
+        docs, total, method = sample(collection_name)
+        collection_schema = infer_collection_schema(collection_name, docs)
+        collection_schema.update({"total": total, "metodo": method})
+        schema["colecciones"][collection_name] = collection_schema
+        print(f"📁 {collection_name}: {len(docs)}/{total} documentos ({method}), "
+              f"{len(collection_schema['campos'])} rutas de campos")
+
+    previous = {}
+    if os.path.exists(args.output):
+        with open(args.output, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    drift = diff_schemas(previous, schema)
+    schema["deriva"] = drift
+    print_drift(drift)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Esquema guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
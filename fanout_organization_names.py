@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Propagación del nombre de una organización a los campos que lo copian
+Los contratos guardan el nombre de la contraparte (`contraparte`) junto a
+`contraparteOrganizacionId`, y las contrapartes migradas guardan `nombre` junto a
+`organizacionOrigenId`. Cuando una organización cambia de `nombre`, esas copias quedan
+desactualizadas.
+
+Para cada organización cambiada se buscan los documentos dependientes con consultas de
+igualdad sobre el campo de ID (índice simple, sólo se proyecta el campo de nombre) y se
+reescriben en lotes paralelos sólo los que tienen un nombre distinto. Las lecturas son
+proporcionales a los documentos afectados.
+
+Se usa siempre el nombre actual de la organización, así que varios cambios de nombre
+entre dos ejecuciones se resuelven en una sola pasada. Sin IDs explícitos, se recorre
+organizaciones proyectando sólo `nombre` (una lectura por organización) y se compara con
+los nombres guardados en --state. No se usa una marca de agua de fechaModificacion porque
+la app (organizacionService.actualizarOrganizacion) renombra sin escribirla.
+
+Uso:
+    python fanout_organization_names.py ORG_ID [ORG_ID ...]
+    python fanout_organization_names.py                # organizaciones modificadas desde la última ejecución
+    python fanout_organization_names.py --todas --dry-run
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from firestore_utils import commit_writes, get_documents, initialize_firebase, load_state, save_state, stream_collection
+
+DEFAULT_STATE = ".fanout_organization_names_state.json.gz"
+
+# (colección dependiente, campo con el ID de la organización, campo con la copia del nombre)
+FANOUT_TARGETS = [
+    ("contratos", "contraparteOrganizacionId", "contraparte"),
+    ("contrapartes", "organizacionOrigenId", "nombre"),
+]
+
+
+def changed_organizations(db, state: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Organizaciones cuyo nombre difiere del guardado en el estado, con un recorrido
+    proyectado sobre `nombre`. Reemplaza los nombres del estado por los actuales.
+    """
+    previous: Dict[str, str] = state.get("nombres", {})
+    seeding = not previous
+    names = {}
+    changed = {}
+    for doc in stream_collection(db, "organizaciones", fields=["nombre"]):
+        nombre = (doc.to_dict() or {}).get("nombre")
+        if not nombre:
+            continue
+        if not seeding and previous.get(doc.id) != nombre:
+            changed[doc.id] = nombre
+        names[doc.id] = nombre
+    # Las organizaciones eliminadas salen del estado
+    state["nombres"] = names
+    return changed
+
+
+def current_names(db, org_ids: List[str]) -> Dict[str, str]:
+    """Nombre actual de cada organización (lectura por lotes)"""
+    docs = get_documents(db, "organizaciones", org_ids, fields=["nombre"])
+    return {doc_id: (doc.to_dict() or {}).get("nombre") for doc_id, doc in docs.items()
+            if (doc.to_dict() or {}).get("nombre")}
+
+
+def dependent_writes(db, org_id: str, nombre: str, collection_name: str, id_field: str,
+                     name_field: str) -> List[Any]:
+    """Actualizaciones de los documentos de `collection_name` con una copia distinta del nombre"""
+    query = (db.collection(collection_name)
+             .where(filter=FieldFilter(id_field, "==", org_id))
+             .select([name_field]))
+    return [("update", doc.reference, {name_field: nombre, "fechaModificacion": SERVER_TIMESTAMP})
+            for doc in query.stream()
+            if (doc.to_dict() or {}).get(name_field) != nombre]
+
+
+def fanout_names(db, names: Dict[str, str], dry_run: bool = False, max_workers: int = 8) -> Dict[str, Any]:
+    """Busca en paralelo los dependientes de cada organización y reescribe las copias del nombre"""
+    tasks = [(org_id, nombre, target) for org_id, nombre in sorted(names.items()) for target in FANOUT_TARGETS]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda task: dependent_writes(db, task[0], task[1], *task[2]), tasks))
+
+    stats: Dict[str, Any] = {"por_coleccion": {}, "escritos": 0, "errores": []}
+    writes = []
+    for (_, _, (collection_name, _, _)), task_writes in zip(tasks, results):
+        stats["por_coleccion"][collection_name] = stats["por_coleccion"].get(collection_name, 0) + len(task_writes)
+        writes.extend(task_writes)
+    if not dry_run:
+        stats["escritos"], stats["errores"] = commit_writes(db, writes)
+    return stats
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Propaga los cambios de nombre de organizaciones")
+    parser.add_argument("organizaciones", nargs="*", help="IDs de organizaciones renombradas")
+    parser.add_argument("--todas", action="store_true", help="Revisa los dependientes de todas las organizaciones")
+    parser.add_argument("--state", default=DEFAULT_STATE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    print("🏷️ Propagación de nombres de organizaciones")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    state = None
+    if args.organizaciones:
+        names = current_names(db, args.organizaciones)
+    elif args.todas:
+        names = {doc.id: (doc.to_dict() or {}).get("nombre")
+                 for doc in stream_collection(db, "organizaciones", fields=["nombre"])
+                 if (doc.to_dict() or {}).get("nombre")}
+    else:
+        state = load_state(args.state, {"nombres": {}})
+        seeding = not state["nombres"]
+        names = changed_organizations(db, state)
+        if seeding:
+            print(f"🌱 Primera ejecución: se guardaron {len(state['nombres'])} nombres; "
+                  f"usa --todas para revisar todos los dependientes")
+
+    print(f"🏢 Organizaciones a propagar: {len(names)}")
+    for org_id, nombre in sorted(names.items())[:20]:
+        print(f"   • {org_id}: {nombre}")
+
+    stats = fanout_names(db, names, args.dry_run)
+    print("\n📊 Documentos con nombre desactualizado:")
+    for collection_name, count in stats["por_coleccion"].items():
+        print(f"   📁 {collection_name}: {count}")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se escribió nada")
+        return
+    for error in stats["errores"][:10]:
+        print(f"   ❌ {error}")
+    if state is not None and not stats["errores"]:
+        save_state(args.state, state)
+    print(f"\n✅ {stats['escritos']} documentos actualizados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Asesor de índices compuestos de Firestore
+Combina las formas de consulta registradas en los scripts Python (análisis estático de
+cadenas `.where(...)` / `.order_by(...)`, siguiendo variables reasignadas y funciones que
+devuelven consultas) con un log de consultas de la app y calcula:
+- índices compuestos faltantes (consultas que fallarían en producción)
+- índices declarados en firestore.indexes.json que ninguna consulta usa
+- costo de amplificación de escritura de cada índice
+y genera una propuesta de firestore.indexes.json.
+
+La app (src/services) es la principal consumidora de índices y sólo se ve a través del
+log, así que --prune exige al menos un --log.
+
+Formato del log de la app (JSONL, una consulta por línea):
+    {"collection": "contratos",
+     "filters": [{"field": "organizacionId", "op": "=="}, {"field": "fechaTermino", "op": ">="}],
+     "orderBy": [{"field": "fechaTermino", "direction": "ASCENDING"}],
+     "count": 120}
+
+Uso:
+    python firestore_index_advisor.py --log app-queries.jsonl
+    python firestore_index_advisor.py --log app-queries.jsonl --prune --output firestore.indexes.json
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+INDEXES_FILE = "firestore.indexes.json"
+SCHEMA_FILE = "firestore_schema.json"
+DEFAULT_OUTPUT = "firestore.indexes.proposed.json"
+
+EQUALITY_OPS = {"==", "in"}
+ARRAY_OPS = {"array-contains", "array-contains-any"}
+RANGE_OPS = {"<", "<=", ">", ">=", "!=", "not-in"}
+
+# Campo que el análisis estático no pudo resolver (variable sin valor conocido)
+UNKNOWN_FIELD = "?"
+# Profundidad máxima al seguir funciones que devuelven consultas
+MAX_CALL_DEPTH = 3
+TERMINAL_METHODS = ("stream", "get", "limit", "on_snapshot", "count")
+
+# Tamaño aproximado de una entrada de índice compuesto (nombre del documento + valores)
+INDEX_ENTRY_BYTES = 100
+
+# Una forma de consulta: colección, filtros [(campo, op)], orden [(campo, dirección)]
+QueryShape = Tuple[str, Tuple[Tuple[str, str], ...], Tuple[Tuple[str, str], ...]]
+# Un índice: colección y campos [(campo, modo)] donde modo es ASCENDING, DESCENDING o CONTAINS
+IndexKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+# Lo que exige una consulta: colección, campos de igualdad (orden libre) y campos restantes ordenados
+Requirement = Tuple[str, frozenset, Tuple[Tuple[str, str], ...]]
+
+
+def _literal(node) -> Optional[Any]:
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _direction(call: ast.Call) -> str:
+    nodes = list(call.args[1:]) + [kw.value for kw in call.keywords if kw.arg == "direction"]
+    for node in nodes:
+        text = ast.unparse(node)
+        if "DESCENDING" in text or text.strip("'\"").lower() == "desc":
+            return "DESCENDING"
+    return "ASCENDING"
+
+
+def _scope_nodes(scope) -> List[Any]:
+    """Nodos de un ámbito en orden de código, sin entrar en funciones o clases anidadas"""
+    nodes, pending = [], list(ast.iter_child_nodes(scope))
+    while pending:
+        node = pending.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        nodes.append(node)
+        pending.extend(ast.iter_child_nodes(node))
+    return sorted((node for node in nodes if hasattr(node, "lineno")),
+                  key=lambda node: (node.lineno, node.col_offset))
+
+
+class _ScriptScanner:
+    """
+    Formas de consulta de un script. Sigue variables reasignadas
+    (`query = query.where(...)`), constantes de texto y funciones que devuelven consultas
+    (`window_query(db, org, "fechaTermino", ...).stream()`), con los argumentos de cada
+    llamada. Los campos que siguen sin resolverse quedan como UNKNOWN_FIELD.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.constants = {node.targets[0].id: node.value.value for node in tree.body
+                          if isinstance(node, ast.Assign) and len(node.targets) == 1
+                          and isinstance(node.targets[0], ast.Name)
+                          and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)}
+        self.functions = {node.name: node for node in ast.walk(tree)
+                          if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        self.shapes: Counter = Counter()
+        self.unresolved: Counter = Counter()
+
+    @staticmethod
+    def _resolve(node, env: Dict[str, Any]) -> Optional[str]:
+        value = _literal(node)
+        if isinstance(value, str):
+            return value
+        if isinstance(node, ast.Name) and isinstance(env.get(node.id), str):
+            return env[node.id]
+        return None
+
+    def shape(self, node, env: Dict[str, Any], depth: int = 0) -> Optional[Tuple[str, list, list]]:
+        """Reconstruye (colección, filtros, orden) de una expresión de consulta"""
+        filters, orders = [], []
+        while isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name):
+                base = self._call_shape(node, env, depth) if func.id in self.functions else None
+                return (base[0], base[1] + filters, base[2] + orders) if base else None
+            if not isinstance(func, ast.Attribute):
+                return None
+            method = func.attr
+            if method == "where":
+                args = list(node.args)
+                filter_kw = next((kw.value for kw in node.keywords if kw.arg == "filter"), None)
+                if filter_kw is not None and isinstance(filter_kw, ast.Call):
+                    args = list(filter_kw.args)
+                if len(args) >= 2:
+                    op = self._resolve(args[1], env)
+                    if op is not None:
+                        filters.insert(0, (self._resolve(args[0], env) or UNKNOWN_FIELD, op))
+            elif method == "order_by" and node.args:
+                field = self._resolve(node.args[0], env) or UNKNOWN_FIELD
+                if field != "__name__":
+                    orders.insert(0, (field, _direction(node)))
+            elif method in ("collection", "collection_group") and node.args:
+                name = self._resolve(node.args[0], env)
+                return (name, filters, orders) if name else None
+            node = func.value
+        if isinstance(node, ast.Name) and isinstance(env.get(node.id), tuple):
+            base = env[node.id]
+            return base[0], list(base[1]) + filters, list(base[2]) + orders
+        return None
+
+    def _call_shape(self, call: ast.Call, env: Dict[str, Any], depth: int) -> Optional[Tuple[str, list, list]]:
+        """Forma que devuelve una función del script, con los argumentos de la llamada"""
+        if depth >= MAX_CALL_DEPTH:
+            return None
+        function = self.functions[call.func.id]
+        local: Dict[str, Any] = dict(self.constants)
+        params = [arg.arg for arg in function.args.args]
+        bindings = list(zip(params, call.args)) + [(kw.arg, kw.value) for kw in call.keywords if kw.arg]
+        for param, arg in bindings:
+            value = self._resolve(arg, env)
+            if value is None and isinstance(arg, ast.Name) and isinstance(env.get(arg.id), tuple):
+                value = env[arg.id]
+            if value is not None:
+                local[param] = value
+        return self.run_scope(function, local, depth + 1, record=False)
+
+    def run_scope(self, scope, env: Dict[str, Any], depth: int = 0, record: bool = True):
+        """Recorre un ámbito en orden; registra las consultas ejecutadas y devuelve la forma retornada"""
+        returned = None
+        for node in _scope_nodes(scope):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                name = node.targets[0].id
+                value = self.shape(node.value, env, depth) or self._resolve(node.value, env)
+                if value is None:
+                    env.pop(name, None)
+                else:
+                    env[name] = value
+            elif isinstance(node, ast.For) and isinstance(node.target, ast.Name):
+                env.pop(node.target.id, None)
+            elif isinstance(node, ast.Return) and node.value is not None:
+                returned = self.shape(node.value, env, depth) or returned
+            elif (record and isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                  and node.func.attr in TERMINAL_METHODS):
+                self._record(self.shape(node.func.value, env, depth))
+        return returned
+
+    def _record(self, shape: Optional[Tuple[str, list, list]]):
+        if not shape or not (shape[1] or shape[2]):
+            return
+        fields = [field for field, _ in shape[1]] + [field for field, _ in shape[2]]
+        if UNKNOWN_FIELD in fields:
+            self.unresolved[shape[0]] += 1
+        else:
+            self.shapes[(shape[0], tuple(shape[1]), tuple(shape[2]))] += 1
+
+    def scan(self):
+        self.run_scope(self.tree, dict(self.constants))
+        for function in self.functions.values():
+            self.run_scope(function, dict(self.constants))
+
+
+def extract_script_queries(paths: List[str]) -> Tuple[Counter, Counter]:
+    """
+    Extrae las formas de consulta de scripts Python por análisis estático. Devuelve
+    (formas, consultas con campos no resueltos por colección).
+    """
+    shapes: Counter = Counter()
+    unresolved: Counter = Counter()
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=path)
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        scanner = _ScriptScanner(tree)
+        scanner.scan()
+        shapes.update(scanner.shapes)
+        unresolved.update(scanner.unresolved)
+    return shapes, unresolved
+
+
+def load_query_log(path: str) -> Counter:
+    """Carga el log de consultas de la app (JSONL)"""
+    shapes: Counter = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            filters = tuple((item["field"], item["op"]) for item in entry.get("filters", []))
+            orders = tuple((item["field"], item.get("direction", "ASCENDING")) for item in entry.get("orderBy", []))
+            shapes[(entry["collection"], filters, orders)] += entry.get("count", 1)
+    return shapes
+
+
+def required_index(shape: QueryShape) -> Optional[Requirement]:
+    """
+    Devuelve el índice compuesto que necesita una consulta, o None si bastan los índices
+    de campo único (sólo igualdades, o un único campo de rango/orden sin igualdades).
+    """
+    collection_name, filters, orders = shape
+    equality = frozenset(field for field, op in filters if op in EQUALITY_OPS)
+    arrays = [field for field, op in filters if op in ARRAY_OPS]
+    ranges = [field for field, op in filters if op in RANGE_OPS]
+
+    ordering: List[Tuple[str, str]] = list(orders)
+    # Firestore exige que el primer orden sea el campo de desigualdad; si no se indica lo agrega
+    for field in ranges:
+        if field not in [name for name, _ in ordering]:
+            ordering.insert(0, (field, "ASCENDING"))
+    ordering = [(field, direction) for field, direction in ordering if field not in equality]
+
+    needs_composite = len(ordering) >= 2 or (equality and ordering) or (arrays and (equality or ordering))
+    if not needs_composite:
+        return None
+    tail = tuple((field, "CONTAINS") for field in arrays) + tuple(ordering)
+    return collection_name, equality, tail
+
+
+def requirement_to_index(requirement: Requirement) -> IndexKey:
+    """Convierte un requisito en el índice canónico (igualdades en orden alfabético)"""
+    collection_name, equality, tail = requirement
+    return collection_name, tuple((field, "ASCENDING") for field in sorted(equality)) + tail
+
+
+def serves(index: IndexKey, requirement: Requirement) -> bool:
+    """Un índice sirve a una consulta si coinciden el grupo de igualdades y el orden restante"""
+    collection_name, equality, tail = requirement
+    if index[0] != collection_name or len(index[1]) != len(equality) + len(tail):
+        return False
+    # Los campos de igualdad pueden aparecer en cualquier orden y dirección
+    head = {field for field, mode in index[1][:len(equality)] if mode != "CONTAINS"}
+    return head == equality and tuple(index[1][len(equality):]) == tail
+
+
+def load_declared_indexes(path: str) -> Tuple[Dict[str, Any], List[IndexKey]]:
+    """Lee firestore.indexes.json y devuelve (contenido, índices normalizados)"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    indexes = []
+    for index in content.get("indexes", []):
+        fields = tuple(
+            (field["fieldPath"], "CONTAINS" if field.get("arrayConfig") == "CONTAINS" else field.get("order", "ASCENDING"))
+            for field in index["fields"]
+        )
+        indexes.append((index["collectionGroup"], fields))
+    return content, indexes
+
+
+def load_collection_sizes(path: str) -> Dict[str, int]:
+    """Obtiene el total de documentos por colección desde el esquema inferido, si existe"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    return {name: entry.get("total", 0) for name, entry in schema.get("colecciones", {}).items()}
+
+
+def write_amplification(index: IndexKey, sizes: Dict[str, int]) -> Dict[str, Any]:
+    """Estima las entradas extra por escritura y el almacenamiento de un índice compuesto"""
+    entries_per_write = 1
+    if any(mode == "CONTAINS" for _, mode in index[1]):
+        # Un índice con CONTAINS agrega una entrada por elemento del arreglo; se asume ~4
+        entries_per_write = 4
+    documents = sizes.get(index[0], 0)
+    return {
+        "entradas_por_escritura": entries_per_write,
+        "entradas_totales": documents * entries_per_write,
+        "almacenamiento_bytes": documents * entries_per_write * INDEX_ENTRY_BYTES,
+    }
+
+
+def index_to_json(index: IndexKey) -> Dict[str, Any]:
+    """Convierte un índice normalizado al formato de firestore.indexes.json"""
+    fields = []
+    for field, mode in index[1]:
+        if mode == "CONTAINS":
+            fields.append({"fieldPath": field, "arrayConfig": "CONTAINS"})
+        else:
+            fields.append({"fieldPath": field, "order": mode})
+    return {"collectionGroup": index[0], "queryScope": "COLLECTION", "fields": fields}
+
+
+def advise(shapes: Counter, declared: List[IndexKey],
+           uncertain: Optional[set] = None) -> Tuple[Dict[IndexKey, int], List[IndexKey]]:
+    """
+    Devuelve (índices faltantes con su número de consultas, índices declarados sin uso).
+    Los índices de las colecciones en `uncertain` (con consultas no resueltas) nunca se
+    consideran sin uso.
+    """
+    missing: Counter = Counter()
+    used = set()
+    for shape, count in shapes.items():
+        needed = required_index(shape)
+        if needed is None:
+            continue
+        matches = [index for index in declared if serves(index, needed)]
+        if matches:
+            used.update(matches)
+        else:
+            missing[requirement_to_index(needed)] += count
+    unused = [index for index in declared if index not in used and index[0] not in (uncertain or set())]
+    return dict(missing), unused
+
+
+def describe(index: IndexKey) -> str:
+    """Representación legible de un índice"""
+    labels = {"ASCENDING": "ASC", "DESCENDING": "DESC", "CONTAINS": "CONTAINS"}
+    fields = ", ".join(f"{field} {labels[mode]}" for field, mode in index[1])
+    return f"{index[0]} ({fields})"
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Propone índices compuestos de Firestore")
+    parser.add_argument("--log", action="append", default=[], help="Log JSONL de consultas de la app (repetible)")
+    parser.add_argument("--scripts", default="*.py", help="Patrón de scripts Python a analizar")
+    parser.add_argument("--indexes", default=INDEXES_FILE)
+    parser.add_argument("--prune", action="store_true",
+                        help="Quita de la propuesta los índices sin uso (requiere --log)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+    if args.prune and not args.log:
+        parser.error("--prune requiere --log: las consultas de la app (src/services) no se ven en los scripts")
+
+    print("🧭 Asesor de índices de Firestore")
+    print("=" * 50)
+
+    shapes, unresolved = extract_script_queries(sorted(glob.glob(args.scripts)))
+    print(f"🐍 Consultas encontradas en scripts: {len(shapes)} formas")
+    for collection_name, count in sorted(unresolved.items()):
+        print(f"   ⚠️ {collection_name}: {count} consultas con campos no resueltos; sus índices no se proponen para quitar")
+    for path in args.log:
+        log_shapes = load_query_log(path)
+        print(f"📜 Consultas en {path}: {len(log_shapes)} formas")
+        shapes.update(log_shapes)
+
+    content, declared = load_declared_indexes(args.indexes)
+    sizes = load_collection_sizes(SCHEMA_FILE)
+    missing, unused = advise(shapes, declared, set(unresolved))
+
+    print(f"\n❌ Índices faltantes: {len(missing)}")
+    for index, count in sorted(missing.items(), key=lambda item: -item[1]):
+        cost = write_amplification(index, sizes)
+        print(f"   • {describe(index)} — {count} consultas, +{cost['entradas_por_escritura']} entrada(s) por escritura")
+
+    if not args.log:
+        print("\n⚠️ Sin --log sólo se ven las consultas de los scripts, no las de la app: "
+              "los índices 'sin uso' pueden estar en uso")
+    print(f"\n💤 Índices declarados sin uso: {len(unused)}")
+    for index in unused:
+        cost = write_amplification(index, sizes)
+        print(f"   • {describe(index)} — {cost['entradas_totales']} entradas, "
+              f"~{cost['almacenamiento_bytes'] / 1024:.0f} KB")
+    if unused and not args.prune:
+        print("   💡 Usa --prune para quitarlos de la propuesta (verifica antes que la app no los use)")
+
+    keep = [index for index in declared if not (args.prune and index in unused)]
+    proposal = dict(content)
+    proposal["indexes"] = [index_to_json(index) for index in keep + sorted(missing)]
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(proposal, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"\n💾 Propuesta guardada en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas para los scripts de mantenimiento de Firestore
+Lectura paginada de colecciones, lecturas por lotes y escrituras en lotes paralelos
+"""
+
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+SERVICE_ACCOUNT_PATH = "pullmai-e0bb0-firebase-adminsdk-6nr9p-f6c7ab0040.json"
+EMULATOR_PROJECT = "pullmai-e0bb0"
+
+# Límite de operaciones por WriteBatch impuesto por Firestore
+MAX_BATCH_SIZE = 500
+# Límite de documentos por llamada a get_all recomendado para no exceder el tamaño de la respuesta
+MAX_GET_ALL = 300
+
+# Una escritura es (operación, referencia, datos); operación: 'set', 'create', 'merge',
+# 'update' o 'delete'. 'create' falla (y con él su lote) si el documento ya existe.
+Write = Tuple[str, Any, Optional[Dict[str, Any]]]
+
+# Campos de fecha que marcan un cambio: los scripts escriben fechaModificacion; la app
+# escribe fechaCreacion al crear y fechaUltimaModificacion en proyectos y en los vínculos
+# contrato-proyecto. Ediciones de la app que no escriben ninguno (actualizarContrato,
+# organizacionService) no son visibles para las consultas por marca de agua.
+CHANGE_FIELDS = ("fechaModificacion", "fechaUltimaModificacion", "fechaCreacion")
+
+# Fuente de documentos: (colección, campos proyectados) -> iterador de documentos
+DocumentSource = Callable[[str, Optional[List[str]]], Iterator[Any]]
+
+
+def initialize_firebase(service_account_path: str = SERVICE_ACCOUNT_PATH):
+    """Inicializa Firebase Admin SDK usando las credenciales del service account"""
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        if not os.path.exists(service_account_path):
+            print(f"❌ No se encontró el archivo de credenciales: {service_account_path}")
+            return None
+        cred = credentials.Certificate(service_account_path)
+        firebase_admin.initialize_app(cred)
+
+    return firestore.client()
+
+
+def initialize_project(service_account_path: str, app_name: str):
+    """Cliente de Firestore de otro proyecto, en una app de Firebase con nombre propio"""
+    try:
+        app = firebase_admin.get_app(app_name)
+    except ValueError:
+        if not os.path.exists(service_account_path):
+            print(f"❌ No se encontró el archivo de credenciales: {service_account_path}")
+            return None
+        app = firebase_admin.initialize_app(credentials.Certificate(service_account_path), name=app_name)
+
+    return firestore.client(app)
+
+
+def initialize_emulator(host: str, project: str = EMULATOR_PROJECT):
+    """Cliente de Firestore conectado al emulador en `host` (p. ej. localhost:8080), sin credenciales"""
+    from google.cloud import firestore as cloud_firestore
+
+    os.environ["FIRESTORE_EMULATOR_HOST"] = host
+    return cloud_firestore.Client(project=project)
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Agrupa un iterable en listas de a lo más `size` elementos"""
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_collection(db, collection_name: str, fields: Optional[List[str]] = None,
+                      page_size: int = 500, start_after: Optional[str] = None,
+                      read_time=None) -> Iterator[Any]:
+    """
+    Recorre una colección completa en páginas ordenadas por ID de documento.
+
+    A diferencia de `collection.stream()`, cada página es una consulta corta, por lo que
+    el recorrido no se corta en colecciones grandes y puede retomarse desde `start_after`.
+    Si se indican `fields`, sólo se leen esos campos (proyección).
+    """
+    collection_ref = db.collection(collection_name)
+    last_id = start_after
+
+    while True:
+        query = collection_ref.order_by("__name__").limit(page_size)
+        if fields is not None:
+            query = query.select(fields)
+        if last_id is not None:
+            query = query.start_after({"__name__": collection_ref.document(last_id)})
+
+        page = list(query.stream(read_time=read_time)) if read_time else list(query.stream())
+        for doc in page:
+            yield doc
+
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
+def firestore_source(db) -> DocumentSource:
+    """Fuente de documentos respaldada por Firestore con lecturas paginadas"""
+    return lambda collection_name, fields: stream_collection(db, collection_name, fields=fields)
+
+
+def stream_modified_since(db, collection_name: str, field: str, since=None,
+                          fields: Optional[List[str]] = None) -> Iterator[Any]:
+    """
+    Documentos con `field` >= `since` (inclusive, para no perder empates en la marca de
+    agua); la colección completa si `since` es None. Usa el índice simple de `field`.
+    """
+    if since is None:
+        return stream_collection(db, collection_name, fields=fields)
+    query = db.collection(collection_name).where(filter=FieldFilter(field, ">=", since))
+    if fields is not None:
+        query = query.select(fields)
+    return query.stream()
+
+
+def stream_changed_since(db, collection_name: str, since=None, fields: Optional[List[str]] = None,
+                         change_fields: Iterable[str] = CHANGE_FIELDS) -> Iterator[Any]:
+    """
+    Unión de `stream_modified_since` sobre cada campo de `change_fields` (una consulta por
+    campo); cada documento se entrega una sola vez. Si se proyecta, `fields` debe incluir
+    los campos de cambio para poder calcular la nueva marca con `latest_change`.
+    """
+    if since is None:
+        yield from stream_collection(db, collection_name, fields=fields)
+        return
+    seen = set()
+    for field in change_fields:
+        for doc in stream_modified_since(db, collection_name, field, since, fields):
+            if doc.id not in seen:
+                seen.add(doc.id)
+                yield doc
+
+
+def latest_change(data: Dict[str, Any], change_fields: Iterable[str] = CHANGE_FIELDS):
+    """La fecha más reciente entre los campos de cambio del documento, o None"""
+    dates = [data.get(field) for field in change_fields if isinstance(data.get(field), datetime.datetime)]
+    return max(dates) if dates else None
+
+
+def partition_collection(db, collection_name: str, partition_count: int,
+                         fields: Optional[List[str]] = None, read_time=None) -> List[Any]:
+    """
+    Divide una colección en consultas disjuntas que pueden recorrerse en paralelo.
+
+    Usa los cursores de partición de Firestore sobre el grupo de colecciones, por lo que
+    también incluye subcolecciones con el mismo nombre (en este proyecto no existen).
+    """
+    if partition_count <= 1:
+        query = db.collection(collection_name)
+        return [query.select(fields) if fields is not None else query]
+
+    group = db.collection_group(collection_name)
+    if read_time:
+        partitions = group.get_partitions(partition_count, read_time=read_time)
+    else:
+        partitions = group.get_partitions(partition_count)
+
+    queries = []
+    for partition in partitions:
+        query = partition.query()
+        queries.append(query.select(fields) if fields is not None else query)
+    return queries
+
+
+def partition_bounds(db, collection_name: str, partition_count: int,
+                     read_time=None) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Límites de partición como rutas de documento (inicio inclusive, fin exclusivo).
+    A diferencia de las consultas de `partition_collection`, se pueden guardar y volver a
+    usar con `bounded_query` para retomar un recorrido interrumpido.
+    """
+    if partition_count <= 1:
+        return [(None, None)]
+    group = db.collection_group(collection_name)
+    if read_time:
+        partitions = group.get_partitions(partition_count, read_time=read_time)
+    else:
+        partitions = group.get_partitions(partition_count)
+    return [(partition.start_at.path if partition.start_at else None,
+             partition.end_at.path if partition.end_at else None) for partition in partitions]
+
+
+def bounded_query(db, collection_name: str, start: Optional[str] = None, end: Optional[str] = None,
+                  fields: Optional[List[str]] = None):
+    """Consulta del grupo de colecciones entre dos rutas de documento (ver partition_bounds)"""
+    query = db.collection_group(collection_name).order_by("__name__")
+    if start:
+        query = query.start_at({"__name__": db.document(start)})
+    if end:
+        query = query.end_before({"__name__": db.document(end)})
+    return query.select(fields) if fields is not None else query
+
+
+def map_partitions(db, collection_name: str, worker: Callable[[Any], Any], partition_count: int = 8,
+                   fields: Optional[List[str]] = None, read_time=None) -> List[Any]:
+    """Ejecuta `worker(consulta)` sobre cada partición en paralelo y devuelve sus resultados"""
+    queries = partition_collection(db, collection_name, partition_count, fields, read_time)
+    with ThreadPoolExecutor(max_workers=max(1, len(queries))) as executor:
+        return list(executor.map(worker, queries))
+
+
+def get_documents(db, collection_name: str, doc_ids: Iterable[str],
+                  fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Lee documentos por ID con `get_all` en lotes; devuelve sólo los que existen"""
+    collection_ref = db.collection(collection_name)
+    found: Dict[str, Any] = {}
+
+    for ids in chunked(dict.fromkeys(doc_ids), MAX_GET_ALL):
+        refs = [collection_ref.document(doc_id) for doc_id in ids]
+        for snapshot in db.get_all(refs, field_paths=fields):
+            if snapshot.exists:
+                found[snapshot.id] = snapshot
+
+    return found
+
+
+def _commit_batch(db, writes: List[Write]) -> int:
+    batch = db.batch()
+    for operation, ref, data in writes:
+        if operation == "set":
+            batch.set(ref, data)
+        elif operation == "create":
+            batch.create(ref, data)
+        elif operation == "merge":
+            batch.set(ref, data, merge=True)
+        elif operation == "update":
+            batch.update(ref, data)
+        elif operation == "delete":
+            batch.delete(ref)
+        else:
+            raise ValueError(f"Operación de escritura desconocida: {operation}")
+    batch.commit()
+    return len(writes)
+
+
+class RateLimiter:
+    """
+    Limita operaciones por segundo (balde de tokens). Con `ramp`, la tasa parte en `rate` y
+    crece 50% cada 5 minutos, como recomienda Firestore para cargas masivas (regla 500/50/5).
+    """
+
+    RAMP_EVERY = 300
+    RAMP_FACTOR = 1.5
+
+    def __init__(self, rate: float, ramp: bool = False):
+        self.rate = rate
+        self.ramp = ramp
+        self.started = time.monotonic()
+        self._available = 0.0
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def current_rate(self) -> float:
+        if not self.ramp:
+            return self.rate
+        steps = int((time.monotonic() - self.started) // self.RAMP_EVERY)
+        return self.rate * self.RAMP_FACTOR ** steps
+
+    def acquire(self, n: int = 1):
+        """Bloquea hasta que haya cupo para `n` operaciones"""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                rate = self.current_rate()
+                self._available = min(max(rate, n), self._available + (now - self._last) * rate)
+                self._last = now
+                if self._available >= n:
+                    self._available -= n
+                    return
+                time.sleep((n - self._available) / rate)
+
+
+def commit_writes(db, writes: Iterable[Write], batch_size: int = MAX_BATCH_SIZE,
+                  max_workers: int = 8, limiter: Optional[RateLimiter] = None,
+                  on_batch: Optional[Callable[[List[Write], Optional[Exception]], None]] = None) -> Tuple[int, List[str]]:
+    """
+    Aplica escrituras en lotes de `batch_size` confirmados en paralelo.
+
+    Mantiene a lo más `2 * max_workers` lotes en vuelo para acotar la memoria cuando
+    `writes` es un generador. Con `limiter`, cada lote espera su cupo antes de enviarse.
+    Con `on_batch`, se llama (en el hilo que invoca) con cada lote terminado y su
+    excepción, o None si se confirmó. Devuelve (escrituras confirmadas, errores).
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    committed = 0
+    errors: List[str] = []
+    chunks: Dict[Any, List[Write]] = {}
+
+    def collect(done):
+        nonlocal committed
+        for future in done:
+            chunk = chunks.pop(future)
+            try:
+                committed += future.result()
+                error = None
+            except Exception as e:
+                errors.append(str(e))
+                error = e
+            if on_batch is not None:
+                on_batch(chunk, error)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for chunk in chunked(writes, batch_size):
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            if limiter is not None:
+                limiter.acquire(len(chunk))
+            future = executor.submit(_commit_batch, db, chunk)
+            chunks[future] = chunk
+            pending.add(future)
+        done, _ = wait(pending)
+        collect(done)
+
+    return committed, errors
+
+
+def load_state(path: str, default: Dict[str, Any]) -> Dict[str, Any]:
+    """Lee un archivo de estado JSON comprimido de un job incremental; `default` si no existe"""
+    if not os.path.exists(path):
+        return default
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: Dict[str, Any]):
+    """Guarda el estado de forma atómica (archivo temporal + rename)"""
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class ThroughputReporter:
+    """Cuenta documentos procesados e imprime el avance y la tasa (docs/s) periódicamente"""
+
+    def __init__(self, label: str, every: int = 1000):
+        self.label = label
+        self.every = every
+        self.count = 0
+        self.started = time.monotonic()
+
+    def add(self, n: int = 1):
+        before = self.count
+        self.count += n
+        if self.count // self.every > before // self.every:
+            print(f"   ⏱️ {self.label}: {self.count} docs ({self.rate():.0f} docs/s)")
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def rate(self) -> float:
+        elapsed = self.elapsed()
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return f"{self.label}: {self.count} docs en {self.elapsed():.1f}s ({self.rate():.0f} docs/s)"
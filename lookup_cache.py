@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Caché local persistente para colecciones de referencia pequeñas
+Varios scripts vuelven a leer `organizaciones` completa sólo para armar el mapa
+nombre -> ID (o `usuarios` para los roles, `proyectos` para los nombres). Esta caché
+guarda en disco la proyección leída de cada colección y la reutiliza entre ejecuciones
+mientras la colección no haya cambiado.
+
+La vigencia se valida con una huella barata en vez de releer la colección:
+- cantidad de documentos (agregación count(): 1 lectura por cada 1000 documentos)
+- máximo de fechaModificacion (una consulta ordenada con limit 1), en las colecciones
+  que tienen ese campo (FRESHNESS_FIELDS)
+Además cada entrada vence tras `max_age` (24 horas), porque en las colecciones sin campo de
+modificación una edición que no cambia la cantidad no altera la huella. Las colecciones
+de MAX_AGES vencen antes: organizaciones no tiene campo de modificación confiable (la app
+la edita sin escribir fechaModificacion), así que un renombre se ve a lo más tras 1 hora.
+
+Cada entrada es un archivo JSON comprimido en .lookup_cache/. Si el total supera
+max_bytes, se eliminan las entradas usadas hace más tiempo (LRU).
+
+Como la huella de organizaciones y usuarios es sólo la cantidad, sus entradas pueden
+servir datos desactualizados hasta su edad máxima: un renombre de organización hasta 1
+hora y un cambio de rol en usuarios hasta 24 horas. Los scripts que escriben a partir de
+esos mapas (por ejemplo contraparteOrganizacionId) deben llamar antes a invalidate().
+
+Uso como módulo:
+    cache = LookupCache()
+    org_ids = cache.mapping(db, "organizaciones", "nombre")      # nombre -> ID
+    roles = cache.mapping(db, "usuarios", "email", "rol")          # email -> rol, hasta 24 h de antigüedad
+
+Uso:
+    python lookup_cache.py estado
+    python lookup_cache.py limpiar [colección]
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional
+
+from google.cloud.firestore_v1 import Query
+
+from firestore_utils import initialize_firebase, stream_collection
+from snapshot_utils import decode_value, encode_value
+
+DEFAULT_CACHE_DIR = ".lookup_cache"
+INDEX_NAME = "index.json"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE = datetime.timedelta(hours=24)
+
+# Campo de modificación por colección para la huella; None: sólo cantidad y edad.
+# organizaciones no usa fechaModificacion: actualizarOrganizacion (organizacionService)
+# la edita sin escribirla, así que el máximo no cambiaría con un renombre
+FRESHNESS_FIELDS = {
+    "organizaciones": None,
+    "contrapartes": "fechaModificacion",
+    "proyectos": None,
+    "usuarios": None,
+}
+DEFAULT_FRESHNESS_FIELD = "fechaModificacion"
+# Edad máxima más corta para colecciones que se editan sin campo de modificación
+MAX_AGES = {
+    "organizaciones": datetime.timedelta(hours=1),
+}
+
+
+def collection_fingerprint(db, collection_name: str) -> Dict[str, Any]:
+    """Huella de vigencia: cantidad de documentos y máximo del campo de modificación"""
+    collection_ref = db.collection(collection_name)
+    fingerprint: Dict[str, Any] = {"documentos": int(collection_ref.count().get()[0][0].value)}
+    field = FRESHNESS_FIELDS.get(collection_name, DEFAULT_FRESHNESS_FIELD)
+    if field:
+        latest = list(collection_ref.order_by(field, direction=Query.DESCENDING).limit(1).select([field]).stream())
+        value = (latest[0].to_dict() or {}).get(field) if latest else None
+        fingerprint["maxModificacion"] = value.isoformat() if isinstance(value, datetime.datetime) else None
+    return fingerprint
+
+
+class LookupCache:
+    """Proyecciones de colecciones en disco, validadas por huella y con expulsión LRU"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: datetime.timedelta = DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index = self._load_index()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_NAME)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self._index_path()):
+            return {}
+        with open(self._index_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._index_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._index_path())
+
+    @staticmethod
+    def entry_key(collection_name: str, fields: Optional[List[str]]) -> str:
+        projection = ",".join(sorted(fields)) if fields is not None else "*"
+        return f"{collection_name}-{zlib.crc32(projection.encode('utf-8')):08x}"
+
+    def is_fresh(self, entry: Dict[str, Any], fingerprint: Dict[str, Any], now: datetime.datetime) -> bool:
+        saved = datetime.datetime.fromisoformat(entry["guardado"])
+        max_age = min(self.max_age, MAX_AGES.get(entry["coleccion"], self.max_age))
+        return (entry["huella"] == fingerprint and now - saved < max_age
+                and os.path.exists(os.path.join(self.directory, entry["archivo"])))
+
+    def documents(self, db, collection_name: str, fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """ID -> datos proyectados de la colección, desde la caché si sigue vigente"""
+        key = self.entry_key(collection_name, fields)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        fingerprint = collection_fingerprint(db, collection_name)
+        entry = self.index.get(key)
+
+        if entry is not None and self.is_fresh(entry, fingerprint, now):
+            with gzip.open(os.path.join(self.directory, entry["archivo"]), "rt", encoding="utf-8") as f:
+                documents = decode_value(json.load(f))
+            entry["usado"] = now.isoformat()
+            self._save_index()
+            print(f"   💾 {collection_name}: {len(documents)} documentos desde la caché")
+            return documents
+
+        documents = {doc.id: doc.to_dict() or {} for doc in stream_collection(db, collection_name, fields=fields)}
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{key}.json.gz"
+        path = os.path.join(self.directory, filename)
+        with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as f:
+            json.dump(encode_value(documents), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+        self.index[key] = {"coleccion": collection_name, "campos": fields, "archivo": filename,
+                           "bytes": os.path.getsize(path), "huella": fingerprint,
+                           "guardado": now.isoformat(), "usado": now.isoformat()}
+        self._evict(keep=key)
+        self._save_index()
+        print(f"   📥 {collection_name}: {len(documents)} documentos leídos de Firestore")
+        return documents
+
+    def mapping(self, db, collection_name: str, key_field: str, value_field: Optional[str] = None) -> Dict[Any, Any]:
+        """`key_field` -> ID del documento (o -> `value_field`); omite documentos sin clave"""
+        fields = [key_field] if value_field is None else [key_field, value_field]
+        result = {}
+        for doc_id, data in self.documents(db, collection_name, fields).items():
+            if data.get(key_field) is not None:
+                result[data[key_field]] = doc_id if value_field is None else data.get(value_field)
+        return result
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        """Elimina las entradas de una colección (o todas)"""
+        for key, entry in list(self.index.items()):
+            if collection_name is None or entry["coleccion"] == collection_name:
+                self._remove(key)
+        self._save_index()
+
+    def _remove(self, key: str):
+        entry = self.index.pop(key)
+        path = os.path.join(self.directory, entry["archivo"])
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _evict(self, keep: str):
+        """Expulsa las entradas menos usadas recientemente hasta respetar max_bytes"""
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]["usado"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.index[key]["bytes"]
+            self._remove(key)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Caché local de colecciones de referencia")
+    parser.add_argument("--dir", default=DEFAULT_CACHE_DIR)
+    subparsers = parser.add_subparsers(dest="accion", required=True)
+    subparsers.add_parser("estado", help="Lista las entradas de la caché")
+    subparsers.add_parser("verificar", help="Compara las huellas guardadas con Firestore")
+    clear_parser = subparsers.add_parser("limpiar", help="Elimina entradas de la caché")
+    clear_parser.add_argument("coleccion", nargs="?")
+    args = parser.parse_args()
+
+    cache = LookupCache(args.dir)
+    if args.accion == "limpiar":
+        cache.invalidate(args.coleccion)
+        print(f"🧹 Caché limpiada{f' ({args.coleccion})' if args.coleccion else ''}")
+        return
+
+    if args.accion == "estado":
+        total = sum(entry["bytes"] for entry in cache.index.values())
+        print(f"💾 {len(cache.index)} entradas, {total / 1024:.1f} KB en {args.dir}")
+        for entry in sorted(cache.index.values(), key=lambda e: e["usado"], reverse=True):
+            fields = ", ".join(entry["campos"]) if entry["campos"] is not None else "todos los campos"
+            print(f"   • {entry['coleccion']} ({fields}): {entry['huella']['documentos']} documentos, "
+                  f"{entry['bytes'] / 1024:.1f} KB, usada {entry['usado']}")
+        return
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for entry in cache.index.values():
+        fresh = cache.is_fresh(entry, collection_fingerprint(db, entry["coleccion"]), now)
+        print(f"   {'✅' if fresh else '♻️'} {entry['coleccion']}: {'vigente' if fresh else 'desactualizada'}")
+
+
+if __name__ == "__main__":
+    main()
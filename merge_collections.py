@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Motor de migración y fusión de colecciones de Firestore
+Recorre la colección origen en páginas, transforma cada documento, resuelve colisiones
+contra la colección destino con lecturas por lotes, escribe en lotes paralelos y
+reescribe las referencias en colecciones dependientes (por ejemplo `contratos`).
+
+Con --filtro, las colisiones se buscan sólo entre los IDs que el filtro de existencia
+del destino (existence_filter.py) marca como posibles; el resto se escriben con `create`,
+que falla en vez de sobrescribir si el documento se creó después de construir el filtro.
+Los lotes que fallan así se releen y se reenvían según --on-conflict. Se rechazan los
+filtros con más de --filtro-max-edad horas.
+
+Las referencias sólo se reescriben si todas las escrituras en el destino se confirmaron.
+
+Uso:
+    python merge_collections.py users usuarios              # simulación (dry-run)
+    python merge_collections.py users usuarios --apply --on-conflict merge
+    python merge_collections.py users usuarios --apply --filtro
+"""
+
+import argparse
+import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from existence_filter import BloomFilter, filter_path, load_filter
+from firestore_utils import (
+    ThroughputReporter,
+    chunked,
+    commit_writes,
+    get_documents,
+    initialize_firebase,
+    stream_collection,
+)
+
+# Políticas de colisión cuando el documento destino ya existe
+ON_CONFLICT = ("skip", "merge", "overwrite")
+
+# Edad máxima por defecto del filtro de existencia
+DEFAULT_FILTER_MAX_AGE = datetime.timedelta(hours=1)
+
+# Máximo de valores admitidos por un filtro 'in' de Firestore
+MAX_IN_VALUES = 30
+
+# (documento origen) -> (ID destino, datos destino) o None para omitirlo
+Transform = Callable[[Any], Optional[Tuple[str, Dict[str, Any]]]]
+
+
+def identity_transform(doc) -> Tuple[str, Dict[str, Any]]:
+    """Copia el documento tal cual, conservando su ID"""
+    return doc.id, doc.to_dict() or {}
+
+
+def merge_collections(db, source: str, target: str, transform: Transform = identity_transform,
+                      on_conflict: str = "skip",
+                      reference_fields: Optional[List[Tuple[str, str]]] = None,
+                      dry_run: bool = True, page_size: int = 500, max_workers: int = 8,
+                      existence: Optional[BloomFilter] = None) -> Dict[str, Any]:
+    """
+    Migra `source` hacia `target` y devuelve un resumen con contadores y el mapa de IDs.
+
+    `reference_fields` es una lista de (colección, campo) cuyos valores apuntan a IDs de
+    `source`; cuando la transformación cambia el ID, esos campos se reescriben al ID nuevo.
+    Un ID entra en el mapa sólo cuando se confirma la escritura de su destino, y la
+    reescritura se omite si alguna escritura en el destino falló.
+    Con `existence` (filtro de IDs de `target`) sólo se leen los posibles aciertos del
+    filtro; los descartados por el filtro se escriben con 'create' y se agregan al filtro.
+    Un lote con un 'create' sobre un ID que ya existe falla completo: sus IDs se releen y
+    se reenvían, los existentes como colisión según `on_conflict`. Si dos documentos
+    origen producen el mismo ID destino, el segundo se trata como colisión.
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"Política de colisión inválida: {on_conflict} (opciones: {', '.join(ON_CONFLICT)})")
+
+    print(f"🔄 Migrando '{source}' -> '{target}' ({'simulación' if dry_run else 'aplicando cambios'}, colisiones: {on_conflict})")
+
+    target_ref = db.collection(target)
+    reporter = ThroughputReporter(f"{source} -> {target}")
+    stats = {"leidos": 0, "omitidos": 0, "creados": 0, "fusionados": 0, "sobrescritos": 0,
+             "colisiones": 0, "escritos": 0, "referencias": 0, "verificados": 0, "errores": []}
+    id_map: Dict[str, str] = {}
+    # Orígenes de las escrituras emitidas por ID destino, en orden; pasan a id_map al confirmarse
+    sources: Dict[str, List[str]] = {}
+    # IDs destino ya escritos en esta ejecución y escrituras repetidas sobre ellos, que se
+    # confirman al final en orden para no competir con la primera escritura del mismo ID
+    emitted = set()
+    deferred = []
+    # Escrituras de lotes que fallaron por un 'create' sobre un ID existente
+    retry: List[Any] = []
+
+    def collision() -> Optional[Tuple[str, str]]:
+        """(contador, operación) de una colisión según la política, o None para omitirla"""
+        stats["colisiones"] += 1
+        if on_conflict == "skip":
+            stats["omitidos"] += 1
+            return None
+        return ("fusionados", "merge") if on_conflict == "merge" else ("sobrescritos", "set")
+
+    def take_source(target_id: str) -> str:
+        queue = sources[target_id]
+        source_id = queue.pop(0)
+        if not queue:
+            del sources[target_id]
+        return source_id
+
+    def on_batch(chunk, error):
+        if error is None:
+            for _, ref, _ in chunk:
+                source_id = take_source(ref.id)
+                if source_id != ref.id:
+                    id_map[source_id] = ref.id
+        elif any(operation == "create" for operation, _, _ in chunk):
+            retry.extend(chunk)
+        else:
+            stats["errores"].append(str(error))
+            for _, ref, _ in chunk:
+                take_source(ref.id)
+
+    def retry_writes(failed):
+        """Reenvía un lote fallido: cada 'create' se verifica contra el destino"""
+        existing = get_documents(db, target, {ref.id for _, ref, _ in failed}, fields=[])
+        stats["verificados"] += len({ref.id for _, ref, _ in failed})
+        for operation, ref, data in failed:
+            if operation == "create":
+                stats["creados"] -= 1
+                if ref.id in existing:
+                    resolution = collision()
+                    if resolution is None:
+                        take_source(ref.id)
+                        continue
+                    key, operation = resolution
+                else:
+                    key, operation = "creados", "set"
+                stats[key] += 1
+            yield operation, ref, data
+
+    def page_writes():
+        for page in chunked(stream_collection(db, source, page_size=page_size), page_size):
+            transformed = []
+            for doc in page:
+                stats["leidos"] += 1
+                result = transform(doc)
+                if result is None:
+                    stats["omitidos"] += 1
+                    continue
+                transformed.append((doc.id, result[0], result[1]))
+
+            # Una sola lectura por lotes por página para detectar colisiones en el destino
+            candidates = {target_id for _, target_id, _ in transformed
+                          if existence is None or target_id in existence}
+            stats["verificados"] += len(candidates)
+            existing = get_documents(db, target, candidates, fields=[]) if candidates else {}
+
+            for source_id, target_id, data in transformed:
+                repeated = target_id in emitted
+                if target_id in existing or repeated:
+                    resolution = collision()
+                    if resolution is None:
+                        continue
+                    key, operation = resolution
+                elif existence is not None and target_id not in candidates:
+                    # Nuevo según el filtro, sin verificar: no debe sobrescribir si el filtro quedó atrasado
+                    key, operation = "creados", "create"
+                    existence.add(target_id)
+                else:
+                    key, operation = "creados", "set"
+                    if existence is not None:
+                        existence.add(target_id)
+
+                stats[key] += 1
+                # Sólo se reescriben referencias de los orígenes que escriben su destino
+                if dry_run:
+                    if source_id != target_id:
+                        id_map[source_id] = target_id
+                else:
+                    sources.setdefault(target_id, []).append(source_id)
+                write = (operation, target_ref.document(target_id), data)
+                if repeated:
+                    deferred.append(write)
+                    continue
+                emitted.add(target_id)
+                yield write
+
+            reporter.add(len(page))
+
+    if dry_run:
+        for _ in page_writes():
+            pass
+    else:
+        # Los errores se registran en on_batch, que distingue los lotes que se reintentan
+        stats["escritos"], _ = commit_writes(db, page_writes(), max_workers=max_workers, on_batch=on_batch)
+        if retry:
+            failed = list(retry)
+            retry.clear()
+            print(f"   🔁 {len(failed)} escrituras de lotes con 'create' fallido (filtro atrasado): "
+                  f"se verifican y reenvían")
+            written, _ = commit_writes(db, retry_writes(failed), max_workers=max_workers, on_batch=on_batch)
+            stats["escritos"] += written
+        if deferred:
+            written, _ = commit_writes(db, deferred, max_workers=1, on_batch=on_batch)
+            stats["escritos"] += written
+
+    if reference_fields and id_map:
+        if stats["errores"]:
+            print("   ⚠️ Hubo escrituras fallidas en el destino: no se reescriben referencias")
+        else:
+            stats["referencias"] = rewrite_references(db, id_map, reference_fields, dry_run, max_workers)
+
+    print(f"   ⏱️ {reporter.summary()}")
+    stats["id_map"] = id_map
+    return stats
+
+
+def rewrite_references(db, id_map: Dict[str, str], reference_fields: List[Tuple[str, str]],
+                       dry_run: bool = True, max_workers: int = 8) -> int:
+    """
+    Reescribe campos de referencia de IDs antiguos a nuevos.
+
+    Consulta sólo los documentos afectados con filtros 'in' de hasta 30 IDs, de modo que
+    el costo es proporcional a los documentos que realmente referencian IDs migrados.
+    """
+    total = 0
+
+    for collection_name, field in reference_fields:
+        print(f"🔗 Reescribiendo referencias en {collection_name}.{field}...")
+        collection_ref = db.collection(collection_name)
+
+        def reference_writes():
+            nonlocal total
+            for old_ids in chunked(id_map.keys(), MAX_IN_VALUES):
+                query = collection_ref.where(filter=FieldFilter(field, "in", old_ids)).select([field])
+                for doc in query.stream():
+                    total += 1
+                    new_id = id_map[doc.get(field)]
+                    yield "update", doc.reference, {field: new_id, "fechaModificacion": SERVER_TIMESTAMP}
+
+        if dry_run:
+            for _ in reference_writes():
+                pass
+        else:
+            _, errors = commit_writes(db, reference_writes(), max_workers=max_workers)
+            for error in errors:
+                print(f"   ❌ Error reescribiendo {collection_name}.{field}: {error}")
+
+    return total
+
+
+def print_summary(stats: Dict[str, Any], dry_run: bool):
+    """Imprime el resumen de una migración"""
+    print("\n📊 Resumen:")
+    print(f"   📥 Leídos: {stats['leidos']}")
+    print(f"   ✅ Nuevos: {stats['creados']}")
+    print(f"   🔀 Fusionados: {stats['fusionados']}")
+    print(f"   ♻️ Sobrescritos: {stats['sobrescritos']}")
+    print(f"   ⏭️ Omitidos: {stats['omitidos']} (colisiones: {stats['colisiones']})")
+    print(f"   🔎 IDs verificados en el destino: {stats['verificados']} de {stats['leidos']}")
+    print(f"   🔗 Referencias reescritas: {stats['referencias']}")
+    if dry_run:
+        print("   💡 Simulación: no se escribió nada. Usa --apply para aplicar los cambios.")
+    else:
+        print(f"   💾 Escrituras confirmadas: {stats['escritos']}")
+    if stats["errores"]:
+        print(f"   ❌ Errores: {len(stats['errores'])}")
+        for error in stats["errores"][:10]:
+            print(f"      • {error}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Migra/fusiona una colección de Firestore en otra")
+    parser.add_argument("source", help="Colección origen")
+    parser.add_argument("target", help="Colección destino")
+    parser.add_argument("--apply", action="store_true", help="Aplica los cambios (por defecto sólo simula)")
+    parser.add_argument("--on-conflict", choices=ON_CONFLICT, default="skip")
+    parser.add_argument("--rewrite", action="append", default=[], metavar="COLECCION.CAMPO",
+                        help="Campo de referencia a reescribir si cambian los IDs (repetible)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--filtro", action="store_true",
+                        help="Usa el filtro de existencia del destino (existence_filter.py build)")
+    parser.add_argument("--filtro-max-edad", type=float, default=DEFAULT_FILTER_MAX_AGE.total_seconds() / 3600,
+                        help="Horas máximas desde que se construyó el filtro")
+    args = parser.parse_args()
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    existence = None
+    if args.filtro:
+        existence = load_filter(args.target, max_age=args.filtro_max_edad * 3600)
+        if existence is None:
+            print(f"❌ No hay filtro para {args.target} o tiene más de {args.filtro_max_edad:g} horas; "
+                  f"constrúyelo con 'existence_filter.py build {args.target}'")
+            return
+
+    reference_fields = [tuple(spec.split(".", 1)) for spec in args.rewrite]
+    stats = merge_collections(db, args.source, args.target, on_conflict=args.on_conflict,
+                              reference_fields=reference_fields, dry_run=not args.apply,
+                              max_workers=args.workers, existence=existence)
+    print_summary(stats, dry_run=not args.apply)
+    if existence is not None and args.apply and not stats["errores"]:
+        existence.save(filter_path(args.target))
+
+
+if __name__ == "__main__":
+    main()
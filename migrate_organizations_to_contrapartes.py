@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Script para migrar organizaciones a la colección contrapartes
+Usa el motor de merge_collections: cada organización se convierte en una contraparte con
+ID derivado del nombre normalizado, se fusiona con la contraparte existente si ya hay una
+con ese ID, y los contratos que apuntaban a la organización vía `contraparteId` (campo
+antiguo) o `contraparteOrganizacionId` (enlace actual) se reescriben al nuevo ID.
+
+Uso:
+    python migrate_organizations_to_contrapartes.py            # simulación
+    python migrate_organizations_to_contrapartes.py --apply
+"""
+
+import re
+import sys
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from firestore_utils import initialize_firebase
+from merge_collections import merge_collections, print_summary
+
+# Campos de la organización que se copian tal cual a la contraparte
+COPIED_FIELDS = ("nombre", "descripcion", "email", "telefono", "direccion", "pais", "ciudad",
+                 "rut", "giro", "sitioWeb", "logo", "fechaCreacion")
+
+
+def contraparte_id_from_nombre(nombre: str) -> str:
+    """Genera un ID estable a partir del nombre (sin tildes, minúsculas, separado por '_')"""
+    ascii_nombre = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", ascii_nombre.lower()).strip("_")
+
+
+def organization_to_contraparte(doc) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Transforma un documento de organizaciones en (ID contraparte, datos contraparte)"""
+    org_data = doc.to_dict() or {}
+    nombre = (org_data.get("nombre") or "").strip()
+    if not nombre:
+        print(f"   ⚠️ Organización {doc.id} sin nombre, se omite")
+        return None
+
+    contraparte = {field: org_data[field] for field in COPIED_FIELDS if field in org_data}
+    contraparte.update({
+        "nombre": nombre,
+        "tipo": "organizacion",
+        "organizacionOrigenId": doc.id,
+        "activo": org_data.get("activa", True),
+        "fechaModificacion": SERVER_TIMESTAMP,
+    })
+
+    return contraparte_id_from_nombre(nombre) or doc.id, contraparte
+
+
+def main():
+    """Función principal"""
+    print("🚀 Migración de organizaciones a contrapartes")
+    print("=" * 60)
+
+    dry_run = "--apply" not in sys.argv
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    stats = merge_collections(
+        db,
+        "organizaciones",
+        "contrapartes",
+        transform=organization_to_contraparte,
+        on_conflict="merge",
+        reference_fields=[("contratos", "contraparteId"), ("contratos", "contraparteOrganizacionId")],
+        dry_run=dry_run,
+    )
+    print_summary(stats, dry_run)
+
+
+if __name__ == "__main__":
+    main()
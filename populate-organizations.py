@@ -12,6 +12,8 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1 import SERVER_TIMESTAMP
 
+from lookup_cache import LookupCache
+
 def initialize_firebase():
     """Inicializa Firebase Admin SDK usando las credenciales del service account"""
     try:
@@ -127,15 +129,12 @@ def update_contracts_with_organization_ids(db) -> bool:
     """Actualiza los contratos existentes para vincularlos con las organizaciones creadas"""
     try:
         print(f"\n🔗 Actualizando contratos con IDs de organizaciones...")
-          # Obtener todas las organizaciones
-        organizaciones_ref = db.collection('organizaciones')
-        organizaciones = organizaciones_ref.get()
-        org_mapping = {}
-        
-        for org_doc in organizaciones:
-            org_data = org_doc.to_dict()
-            if org_data and 'nombre' in org_data:
-                org_mapping[org_data['nombre']] = org_doc.id
+        # Mapa nombre -> ID de organizaciones leído de Firestore: este script escribe
+        # contraparteOrganizacionId y la caché de organizaciones puede tener hasta 1 hora
+        # (un renombre no cambia su huella). Se invalida y la relectura queda en la caché.
+        cache = LookupCache()
+        cache.invalidate('organizaciones')
+        org_mapping = cache.mapping(db, 'organizaciones', 'nombre')
         
         # Obtener todos los contratos
         contratos_ref = db.collection('contratos')
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Consolidación de presupuestos de proyectos desde sus contratos
+Los contratos referencian su proyecto por `proyectoId` o, en los datos antiguos, sólo por
+el nombre libre en `proyecto`. Este job arma un índice nombre -> ID por organización,
+resuelve cada contrato a su proyecto y suma `monto` por proyecto y moneda en una sola
+pasada. Después escribe en lotes, sólo en los proyectos cuyas cifras cambiaron:
+- numeroContratos, contratosActivos, contratosPendientes
+- valorTotalContratos: contratos no cancelados, en la moneda del proyecto
+- presupuestoComprometido: contratos aprobados o en ejecución, en la moneda del proyecto
+- montosPorMoneda: valor de los contratos no cancelados por moneda
+
+Es incremental: guarda en --state la marca de agua de los campos de cambio
+(fechaModificacion, fechaUltimaModificacion que escribe la app al vincular o desvincular
+un contrato de un proyecto, y fechaCreacion) y la contribución de cada contrato, así sólo
+se leen los contratos cambiados. Las ediciones de la app que no escriben ninguno de esos
+campos (actualizarContrato) no se ven en modo incremental: --full relee todos (y
+descarta los contratos eliminados), conviene ejecutarlo periódicamente.
+
+Uso:
+    python project_budget_rollups.py
+    python project_budget_rollups.py --full --dry-run
+"""
+
+import argparse
+import datetime
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from firestore_utils import (CHANGE_FIELDS, ThroughputReporter, commit_writes, initialize_firebase, latest_change,
+                             load_state, save_state, stream_changed_since, stream_collection)
+
+DEFAULT_STATE = ".project_budget_rollups_state.json.gz"
+
+CONTRACT_FIELDS = ["organizacionId", "proyectoId", "proyecto", "moneda", "monto", "estado"] + list(CHANGE_FIELDS)
+ROLLUP_FIELDS = ["numeroContratos", "contratosActivos", "contratosPendientes", "valorTotalContratos",
+                 "presupuestoComprometido", "montosPorMoneda"]
+PROJECT_FIELDS = ["nombre", "organizacionId", "moneda"] + ROLLUP_FIELDS
+
+ACTIVE_STATES = {"activo", "renovado"}
+PENDING_STATES = {"borrador", "revision", "aprobado"}
+COMMITTED_STATES = {"aprobado", "activo", "renovado", "vencido"}
+EXCLUDED_STATES = {"cancelado"}
+
+# Contribución de un contrato: [organizacionId, proyectoId, proyecto, moneda, monto, estado]
+Contribution = List[Any]
+
+
+def normalize_name(name: str) -> str:
+    """Nombre de proyecto comparable: minúsculas, sin acentos y con espacios simples"""
+    folded = unicodedata.normalize("NFKD", name.lower())
+    return " ".join("".join(c for c in folded if not unicodedata.combining(c)).split())
+
+
+def build_name_index(projects: Dict[str, Dict[str, Any]]) -> Tuple[Dict[Tuple[str, str], Optional[str]],
+                                                                      Dict[str, Optional[str]]]:
+    """
+    Índices (organizacionId, nombre) -> ID y nombre -> ID.
+    Un nombre repetido queda en None (ambiguo) y no se resuelve por ese índice.
+    """
+    by_org: Dict[Tuple[str, str], Optional[str]] = {}
+    by_name: Dict[str, Optional[str]] = {}
+    for project_id, data in projects.items():
+        name = normalize_name(data.get("nombre") or "")
+        if not name:
+            continue
+        key = (data.get("organizacionId") or "", name)
+        by_org[key] = None if key in by_org else project_id
+        by_name[name] = None if name in by_name else project_id
+    return by_org, by_name
+
+
+def resolve_project(contribution: Contribution, projects: Dict[str, Any],
+                    by_org: Dict[Tuple[str, str], Optional[str]], by_name: Dict[str, Optional[str]]) -> Optional[str]:
+    """ID del proyecto de un contrato: proyectoId si existe, si no su nombre en la organización"""
+    organizacion_id, proyecto_id, proyecto = contribution[0], contribution[1], contribution[2]
+    if proyecto_id in projects:
+        return proyecto_id
+    if not proyecto:
+        return None
+    name = normalize_name(proyecto)
+    if (organizacion_id, name) in by_org:
+        return by_org[(organizacion_id, name)]
+    return by_name.get(name)
+
+
+def compute_rollups(contributions: Dict[str, Contribution], projects: Dict[str, Dict[str, Any]]
+                    ) -> Tuple[Dict[str, Dict[str, Any]], Counter]:
+    """Cifras derivadas de cada proyecto y nombres de proyecto sin resolver"""
+    by_org, by_name = build_name_index(projects)
+    rollups = {project_id: {"numeroContratos": 0, "contratosActivos": 0, "contratosPendientes": 0,
+                            "valorTotalContratos": 0.0, "presupuestoComprometido": 0.0, "montosPorMoneda": {}}
+               for project_id in projects}
+    unresolved: Counter = Counter()
+
+    for contribution in contributions.values():
+        _, _, proyecto, moneda, monto, estado = contribution
+        project_id = resolve_project(contribution, projects, by_org, by_name)
+        if project_id is None:
+            if proyecto:
+                unresolved[proyecto] += 1
+            continue
+        if estado in EXCLUDED_STATES:
+            continue
+
+        rollup = rollups[project_id]
+        rollup["numeroContratos"] += 1
+        rollup["contratosActivos"] += estado in ACTIVE_STATES
+        rollup["contratosPendientes"] += estado in PENDING_STATES
+        moneda = moneda or projects[project_id].get("moneda") or "CLP"
+        rollup["montosPorMoneda"][moneda] = rollup["montosPorMoneda"].get(moneda, 0.0) + monto
+        if moneda == (projects[project_id].get("moneda") or moneda):
+            rollup["valorTotalContratos"] += monto
+            if estado in COMMITTED_STATES:
+                rollup["presupuestoComprometido"] += monto
+
+    for rollup in rollups.values():
+        rollup["valorTotalContratos"] = round(rollup["valorTotalContratos"], 2)
+        rollup["presupuestoComprometido"] = round(rollup["presupuestoComprometido"], 2)
+        rollup["montosPorMoneda"] = {moneda: round(monto, 2) for moneda, monto in rollup["montosPorMoneda"].items()}
+    return rollups, unresolved
+
+
+def contribution_of(data: Dict[str, Any]) -> Contribution:
+    monto = data.get("monto")
+    monto = float(monto) if isinstance(monto, (int, float)) and not isinstance(monto, bool) else 0.0
+    return [data.get("organizacionId") or "", data.get("proyectoId") or None, data.get("proyecto") or None,
+            data.get("moneda") or None, monto, data.get("estado")]
+
+
+def run_rollups(db, state: Dict[str, Any], full: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """Actualiza `state` con los contratos modificados y escribe las cifras que cambiaron"""
+    full = full or state.get("marca") is None
+    since = None if full else datetime.datetime.fromisoformat(state["marca"])
+    contributions: Dict[str, Contribution] = {} if full else dict(state["contratos"])
+    stats = {"modo": "completo" if full else "incremental", "leidos": 0, "proyectos": 0,
+             "actualizados": 0, "sin_resolver": {}, "errores": []}
+
+    projects = {doc.id: doc.to_dict() or {} for doc in stream_collection(db, "proyectos", fields=PROJECT_FIELDS)}
+    stats["proyectos"] = len(projects)
+
+    watermark = since
+    reporter = ThroughputReporter("contratos", every=5000)
+    for doc in stream_changed_since(db, "contratos", since, CONTRACT_FIELDS):
+        data = doc.to_dict() or {}
+        contributions[doc.id] = contribution_of(data)
+        modified = latest_change(data)
+        if modified is not None and (watermark is None or modified > watermark):
+            watermark = modified
+        stats["leidos"] += 1
+        reporter.add()
+    print(f"   ⏱️ {reporter.summary()}")
+
+    rollups, unresolved = compute_rollups(contributions, projects)
+    stats["sin_resolver"] = dict(unresolved.most_common())
+
+    collection_ref = db.collection("proyectos")
+    writes = []
+    for project_id, rollup in sorted(rollups.items()):
+        current = {field: projects[project_id].get(field) for field in ROLLUP_FIELDS}
+        if current == rollup:
+            continue
+        writes.append(("update", collection_ref.document(project_id),
+                       dict(rollup, fechaModificacion=SERVER_TIMESTAMP)))
+    stats["actualizados"] = len(writes)
+    if dry_run:
+        return stats
+
+    _, errors = commit_writes(db, writes)
+    stats["errores"] = errors
+    if not errors:
+        state["contratos"] = contributions
+        state["marca"] = watermark.isoformat() if watermark else datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return stats
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Consolida presupuestos de proyectos desde sus contratos")
+    parser.add_argument("--full", action="store_true", help="Relee todos los contratos")
+    parser.add_argument("--state", default=DEFAULT_STATE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    print("💰 Consolidación de presupuestos de proyectos")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    state = load_state(args.state, {"marca": None, "contratos": {}})
+    stats = run_rollups(db, state, args.full, args.dry_run)
+
+    print(f"\n📊 Resumen ({stats['modo']}):")
+    print(f"   📁 Proyectos: {stats['proyectos']}")
+    print(f"   📥 Contratos leídos: {stats['leidos']}")
+    print(f"   ✏️ Proyectos con cifras nuevas: {stats['actualizados']}")
+    if stats["sin_resolver"]:
+        print(f"   ⚠️ Nombres de proyecto sin resolver: {len(stats['sin_resolver'])}")
+        for name, count in list(stats["sin_resolver"].items())[:10]:
+            print(f"      - {name}: {count} contratos")
+    for error in stats["errores"][:10]:
+        print(f"   ❌ {error}")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se escribieron proyectos ni estado")
+    elif not stats["errores"]:
+        save_state(args.state, state)
+        print(f"\n✅ Estado guardado en {args.state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Purga masiva de datos de prueba y de carga inicial
+Selecciona documentos por predicado y los elimina junto con sus subcolecciones:
+- --organizacion ID: documentos con organizacionId == ID
+- --prefijo contract_: documentos cuyo ID empieza con el prefijo (rango sobre __name__)
+- --campo creadoPor=system: igualdad sobre cualquier campo (repetible)
+Los predicados se combinan con AND; sin ninguno hay que pasar --todo.
+
+Primero se cuenta con agregaciones count() (1 lectura por cada 1000 documentos) y, si
+no se indica --apply, ahí termina. Al aplicar, los IDs se recorren en páginas con
+proyección vacía, las subcolecciones de cada documento se descubren en paralelo y todas
+las eliminaciones pasan por un BulkWriter, que envía en paralelo y limita la tasa (parte
+en --tasa-inicial operaciones/s y sube hasta --tasa-maxima según la regla 500/50/5).
+
+Uso:
+    python purge_test_data.py contratos --prefijo contract_                 # sólo cuenta
+    python purge_test_data.py contratos contrapartes --organizacion ORG_TEST --apply
+    python purge_test_data.py usuarios --campo creadoPor=system --apply --sin-subcolecciones
+    python purge_test_data.py contratos --todo --apply --emulator localhost:8080
+"""
+
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+from firestore_utils import EMULATOR_PROJECT, ThroughputReporter, chunked, initialize_emulator, initialize_firebase
+
+# Último carácter de rango para consultas por prefijo
+PREFIX_END = "\uf8ff"
+MAX_ATTEMPTS = 5
+
+# Un predicado de igualdad: (campo, valor)
+Predicate = Tuple[str, Any]
+
+
+def parse_predicate(spec: str) -> Predicate:
+    """'campo=valor'; el valor se interpreta como JSON (true, 3) y si no, como texto"""
+    field, separator, raw = spec.partition("=")
+    if not separator or not field:
+        raise ValueError(f"Predicado inválido '{spec}': se espera CAMPO=VALOR")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    return field, value
+
+
+def filtered_query(db, collection_name: str, predicates: List[Predicate]):
+    query = db.collection(collection_name)
+    for field, value in predicates:
+        query = query.where(filter=FieldFilter(field, "==", value))
+    return query
+
+
+def prefix_bounds(db, collection_name: str, prefix: Optional[str]) -> Tuple[Any, Any]:
+    if not prefix:
+        return None, None
+    collection_ref = db.collection(collection_name)
+    return collection_ref.document(prefix), collection_ref.document(prefix + PREFIX_END)
+
+
+def count_matches(db, collection_name: str, predicates: List[Predicate], prefix: Optional[str]) -> int:
+    """Cantidad de documentos que cumplen los predicados (agregación count)"""
+    query = filtered_query(db, collection_name, predicates)
+    start, end = prefix_bounds(db, collection_name, prefix)
+    if start is not None:
+        query = query.order_by("__name__").start_at({"__name__": start}).end_before({"__name__": end})
+    return int(query.count().get()[0][0].value)
+
+
+def matching_refs(db, collection_name: str, predicates: List[Predicate], prefix: Optional[str],
+                  page_size: int = 1000) -> Iterator[Any]:
+    """Referencias de los documentos seleccionados, en páginas que sólo leen IDs"""
+    base = filtered_query(db, collection_name, predicates).order_by("__name__").select([])
+    start, end = prefix_bounds(db, collection_name, prefix)
+    last = None
+    while True:
+        query = base.limit(page_size)
+        if last is not None:
+            query = query.start_after({"__name__": last})
+        elif start is not None:
+            query = query.start_at({"__name__": start})
+        if end is not None:
+            query = query.end_before({"__name__": end})
+        page = list(query.stream())
+        for doc in page:
+            yield doc.reference
+        if len(page) < page_size:
+            return
+        last = page[-1].reference
+
+
+def descendant_refs(ref) -> List[Any]:
+    """Documentos de todas las subcolecciones de `ref` (a cualquier profundidad)"""
+    refs = []
+    for subcollection in ref.collections():
+        refs.extend(doc.reference for doc in subcollection.recursive().select([]).stream())
+    return refs
+
+
+def purge(db, collections: List[str], predicates: List[Predicate], prefix: Optional[str],
+          recursive: bool = True, initial_rate: int = 500, max_rate: int = 10000,
+          max_workers: int = 16) -> Dict[str, Any]:
+    """Elimina los documentos seleccionados (y sus subcolecciones) con un BulkWriter"""
+    failures: List[str] = []
+    lock = threading.Lock()
+
+    def on_error(failure, _writer) -> bool:
+        if failure.attempts < MAX_ATTEMPTS:
+            return True
+        with lock:
+            failures.append(f"{failure.operation.reference.path}: {failure.message}")
+        return False
+
+    writer = db.bulk_writer(options=BulkWriterOptions(initial_ops_per_second=initial_rate,
+                                                      max_ops_per_second=max(initial_rate, max_rate)))
+    writer.on_write_error(on_error)
+    stats: Dict[str, Any] = {"documentos": {}, "subcolecciones": 0, "errores": failures}
+    reporter = ThroughputReporter("eliminados", every=10000)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for collection_name in collections:
+            deleted = 0
+            for page in chunked(matching_refs(db, collection_name, predicates, prefix), 500):
+                if recursive:
+                    # Descubrir subcolecciones es una llamada por documento: se hace en paralelo
+                    for descendants in executor.map(descendant_refs, page):
+                        for ref in descendants:
+                            writer.delete(ref)
+                        stats["subcolecciones"] += len(descendants)
+                        reporter.add(len(descendants))
+                for ref in page:
+                    writer.delete(ref)
+                deleted += len(page)
+                reporter.add(len(page))
+            stats["documentos"][collection_name] = deleted
+
+    writer.close()
+    print(f"   ⏱️ {reporter.summary()}")
+    return stats
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Purga masiva de datos de prueba por predicado")
+    parser.add_argument("collections", nargs="+")
+    parser.add_argument("--organizacion", help="organizacionId de los documentos a eliminar")
+    parser.add_argument("--prefijo", help="Prefijo de ID de los documentos a eliminar")
+    parser.add_argument("--campo", action="append", default=[], metavar="CAMPO=VALOR",
+                        help="Igualdad adicional (repetible)")
+    parser.add_argument("--todo", action="store_true", help="Permite purgar colecciones completas")
+    parser.add_argument("--sin-subcolecciones", action="store_true")
+    parser.add_argument("--tasa-inicial", type=int, default=500)
+    parser.add_argument("--tasa-maxima", type=int, default=10000)
+    parser.add_argument("--apply", action="store_true", help="Elimina (por defecto sólo cuenta)")
+    parser.add_argument("--emulator", help="host:puerto del emulador de Firestore")
+    parser.add_argument("--project", default=EMULATOR_PROJECT, help="ID de proyecto en el emulador")
+    args = parser.parse_args()
+    try:
+        predicates = [parse_predicate(spec) for spec in args.campo]
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("🧹 Purga de datos de prueba")
+    print("=" * 50)
+
+    if args.organizacion:
+        predicates.append(("organizacionId", args.organizacion))
+    if not predicates and not args.prefijo and not args.todo:
+        print("❌ Sin predicados se eliminarían las colecciones completas; usa --todo si es lo que quieres")
+        return
+
+    db = initialize_emulator(args.emulator, args.project) if args.emulator else initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    description = [f"{field} == {value!r}" for field, value in predicates]
+    if args.prefijo:
+        description.append(f"ID empieza con {args.prefijo!r}")
+    print(f"🔎 Predicado: {' y '.join(description) or 'todos los documentos'}")
+
+    total = 0
+    for collection_name in args.collections:
+        count = count_matches(db, collection_name, predicates, args.prefijo)
+        total += count
+        print(f"   📁 {collection_name}: {count} documentos")
+    if not args.apply:
+        suffix = "" if args.sin_subcolecciones else " (más sus subcolecciones)"
+        print(f"\n⚠️ Simulación: se eliminarían {total} documentos{suffix}. Usa --apply para eliminarlos")
+        return
+    if total == 0:
+        print("\n✅ No hay nada que eliminar")
+        return
+
+    stats = purge(db, args.collections, predicates, args.prefijo, not args.sin_subcolecciones,
+                  args.tasa_inicial, args.tasa_maxima)
+    print("\n📊 Resumen:")
+    for collection_name, count in stats["documentos"].items():
+        print(f"   🗑️ {collection_name}: {count} documentos")
+    print(f"   📂 Documentos de subcolecciones: {stats['subcolecciones']}")
+    for error in stats["errores"][:10]:
+        print(f"   ❌ {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Conciliación bidireccional entre Storage y los PDFs referenciados por contratos
+Lista el bucket una sola vez (paginado, una subcarpeta por hilo) y recorre `contratos`
+con proyección de pdfUrl/documentoNombre/documentoTamaño. Con una diferencia de conjuntos
+reporta:
+- contratos cuyo PDF no existe en el bucket
+- contratos cuyo documentoTamaño no coincide con el tamaño real del blob
+- contratos con pdfUrl externo (fuera del bucket)
+- blobs que ningún contrato referencia (huérfanos)
+
+Opcionalmente elimina los huérfanos en lotes (--gc), sólo si son más antiguos que
+--min-age-hours para no borrar subidas cuyo contrato aún no se guarda.
+
+Uso:
+    python reconcile_contract_pdfs.py
+    python reconcile_contract_pdfs.py --local-dir ./storage-local   # bucket simulado en disco
+    python reconcile_contract_pdfs.py --gc --min-age-hours 48
+"""
+
+import argparse
+import datetime
+import json
+from typing import Any, Dict, List, Optional
+
+from firestore_utils import initialize_firebase, stream_collection
+from storage_utils import CONTRACTS_PREFIX, blob_path_from_url, delete_blobs, get_bucket, list_blobs_parallel
+
+PDF_FIELDS = ["pdfUrl", "documentoNombre", "documentoTamaño"]
+
+
+def reconcile(contracts, blobs: Dict[str, Any], bucket_name: Optional[str] = None,
+              prefix: str = CONTRACTS_PREFIX) -> Dict[str, Any]:
+    """
+    Cruza los contratos con el listado del bucket.
+    `contracts` es un iterable de documentos con pdfUrl y documentoTamaño; `blobs` es
+    el resultado de list_blobs_parallel (nombre -> blob) para `prefix`.
+    """
+    missing: List[Dict[str, Any]] = []
+    wrong_size: List[Dict[str, Any]] = []
+    external: List[Dict[str, Any]] = []
+    outside_prefix: List[Dict[str, Any]] = []
+    referenced = set()
+    without_pdf = 0
+
+    for doc in contracts:
+        data = doc.to_dict() or {}
+        pdf_url = data.get("pdfUrl")
+        if not pdf_url:
+            without_pdf += 1
+            continue
+
+        path = blob_path_from_url(pdf_url, bucket_name)
+        if path is None:
+            external.append({"id": doc.id, "pdfUrl": pdf_url})
+            continue
+
+        if not path.startswith(prefix):
+            # No está en el listado; no se puede afirmar que falte
+            outside_prefix.append({"id": doc.id, "ruta": path})
+            continue
+
+        referenced.add(path)
+        blob = blobs.get(path)
+        if blob is None:
+            missing.append({"id": doc.id, "ruta": path, "documentoNombre": data.get("documentoNombre")})
+            continue
+
+        expected = data.get("documentoTamaño")
+        if expected is not None and blob.size is not None and int(expected) != int(blob.size):
+            wrong_size.append({"id": doc.id, "ruta": path, "documentoTamaño": expected, "tamañoReal": blob.size})
+
+    orphans = sorted(set(blobs) - referenced)
+    return {
+        "sin_pdf": without_pdf,
+        "faltantes": missing,
+        "tamaño_incorrecto": wrong_size,
+        "externos": external,
+        "fuera_de_prefijo": outside_prefix,
+        "huerfanos": orphans,
+    }
+
+
+def collectable_orphans(orphans: List[str], blobs: Dict[str, Any], min_age_hours: float) -> List[str]:
+    """Filtra los huérfanos más antiguos que `min_age_hours`"""
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=min_age_hours)
+    return [name for name in orphans if blobs[name].updated is None or blobs[name].updated < cutoff]
+
+
+def print_report(report: Dict[str, Any], total_blobs: int):
+    """Imprime el resultado de la conciliación"""
+    print("\n📊 Resultado de la conciliación:")
+    print(f"   🗂️ Blobs en el bucket: {total_blobs}")
+    print(f"   📄 Contratos sin PDF: {report['sin_pdf']}")
+    print(f"   ❌ PDFs faltantes: {len(report['faltantes'])}")
+    for item in report["faltantes"][:20]:
+        print(f"      - {item['id']}: {item['ruta']}")
+    print(f"   📏 Tamaño incorrecto: {len(report['tamaño_incorrecto'])}")
+    for item in report["tamaño_incorrecto"][:20]:
+        print(f"      - {item['id']}: {item['documentoTamaño']} registrado vs {item['tamañoReal']} real")
+    print(f"   🌐 URLs externas: {len(report['externos'])}")
+    print(f"   📁 Rutas fuera del prefijo listado: {len(report['fuera_de_prefijo'])}")
+    print(f"   👻 Blobs huérfanos: {len(report['huerfanos'])}")
+    for name in report["huerfanos"][:20]:
+        print(f"      - {name}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Concilia los PDFs de Storage con los contratos")
+    parser.add_argument("--bucket", help="Nombre del bucket (por defecto VITE_STORAGE_BUCKET)")
+    parser.add_argument("--local-dir", help="Usa un directorio local como bucket")
+    parser.add_argument("--prefix", default=CONTRACTS_PREFIX)
+    parser.add_argument("--gc", action="store_true", help="Elimina los blobs huérfanos")
+    parser.add_argument("--min-age-hours", type=float, default=24)
+    parser.add_argument("--json", help="Guarda el reporte completo en este archivo")
+    args = parser.parse_args()
+
+    print("🔄 Conciliación Storage ↔ contratos")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+    bucket = get_bucket(args.bucket, args.local_dir)
+
+    print(f"🗂️ Listando {bucket.name}/{args.prefix}...")
+    blobs = list_blobs_parallel(bucket, args.prefix)
+
+    print("📥 Leyendo contratos...")
+    contracts = stream_collection(db, "contratos", fields=PDF_FIELDS)
+    report = reconcile(contracts, blobs, None if args.local_dir else bucket.name, args.prefix)
+    print_report(report, len(blobs))
+
+    if args.gc and report["huerfanos"]:
+        candidates = collectable_orphans(report["huerfanos"], blobs, args.min_age_hours)
+        print(f"\n🗑️ Eliminando {len(candidates)} huérfanos con más de {args.min_age_hours:g} horas...")
+        deleted = delete_blobs(bucket, candidates)
+        print(f"   ✅ Eliminados: {deleted}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
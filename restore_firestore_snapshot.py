@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Restauración de un snapshot local (export_firestore_snapshot.py) en un proyecto de
+Firestore o en el emulador
+Los registros de cada colección se escriben con sus rutas originales (mismos IDs, incluidas
+subcolecciones) en lotes de 500 confirmados en paralelo. Los valores etiquetados del
+snapshot se reconstruyen como tipos de Firestore: fechas como Timestamp, referencias
+como DocumentReference del proyecto destino, geopuntos y bytes.
+
+create_time y update_time los asigna el servidor y no se pueden restaurar; los campos de
+fecha de los documentos (fechaCreacion, fechaModificacion, ...) sí se conservan.
+
+Para no saturar un proyecto recién creado, las escrituras se limitan con --rate
+operaciones por segundo, creciendo 50% cada 5 minutos (regla 500/50/5 de Firestore). En
+el emulador no se limita la tasa.
+
+Por seguridad el destino se indica siempre de forma explícita: --emulator o --credenciales.
+
+Uso:
+    python restore_firestore_snapshot.py snapshots/prod --emulator localhost:8080
+    python restore_firestore_snapshot.py snapshots/prod --credenciales staging-sa.json contratos usuarios
+"""
+
+import argparse
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from firestore_utils import (EMULATOR_PROJECT, RateLimiter, ThroughputReporter, Write, commit_writes,
+                             initialize_emulator, initialize_firebase)
+from snapshot_utils import decode_value, iter_collection_records, load_manifest
+
+DEFAULT_RATE = 500
+
+
+def restore_writes(db, directory: str, collection_name: str, reporter: ThroughputReporter) -> Iterator[Write]:
+    """Escrituras `set` de los registros de una colección, con sus rutas originales"""
+    collection_ref = db.collection(collection_name)
+    for record in iter_collection_records(directory, collection_name):
+        ref = db.document(record["ruta"]) if record.get("ruta") else collection_ref.document(record["id"])
+        reporter.add()
+        yield "set", ref, decode_value(record.get("datos") or {}, db)
+
+
+def restore_snapshot(db, directory: str, collections: List[str], limiter: Optional[RateLimiter] = None,
+                     max_workers: int = 16) -> Dict[str, Any]:
+    """Restaura las colecciones indicadas; devuelve escrituras y errores por colección"""
+    results = {}
+    for collection_name in collections:
+        reporter = ThroughputReporter(collection_name, every=10000)
+        committed, errors = commit_writes(db, restore_writes(db, directory, collection_name, reporter),
+                                          max_workers=max_workers, limiter=limiter)
+        print(f"   ⏱️ {reporter.summary()}")
+        results[collection_name] = {"escritos": committed, "errores": errors}
+    return results
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Restaura un snapshot local en Firestore o en el emulador")
+    parser.add_argument("snapshot", help="Directorio del snapshot")
+    parser.add_argument("collections", nargs="*", help="Colecciones a restaurar (por defecto todas)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--emulator", help="host:puerto del emulador de Firestore")
+    target.add_argument("--credenciales", help="Service account del proyecto destino")
+    parser.add_argument("--project", default=EMULATOR_PROJECT, help="ID de proyecto en el emulador")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="Escrituras por segundo iniciales (0 = sin límite)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    print("♻️ Restauración de snapshot de Firestore")
+    print("=" * 50)
+
+    manifest = load_manifest(args.snapshot)
+    if manifest is None:
+        print(f"❌ No hay manifest.json en {args.snapshot}")
+        return
+    collections = args.collections or sorted(manifest["colecciones"])
+    missing = [name for name in collections if name not in manifest["colecciones"]]
+    if missing:
+        print(f"❌ Colecciones que no están en el snapshot: {', '.join(missing)}")
+        return
+    for name in collections:
+        collection = manifest["colecciones"][name]
+        if not collection.get("completa"):
+            print(f"⚠️ {name}: exportación incompleta, se restaurarán sólo las particiones exportadas")
+        print(f"   📁 {name}: {collection.get('documentos', 0)} documentos")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se escribió nada")
+        return
+
+    if args.emulator:
+        db = initialize_emulator(args.emulator, args.project)
+        limiter = None
+        print(f"🧪 Destino: emulador {args.emulator}")
+    else:
+        if not os.path.exists(args.credenciales):
+            print(f"❌ No se encontró el archivo de credenciales: {args.credenciales}")
+            return
+        db = initialize_firebase(args.credenciales)
+        limiter = RateLimiter(args.rate, ramp=True) if args.rate > 0 else None
+        print(f"☁️ Destino: proyecto de {args.credenciales}")
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    print(f"\n♻️ Restaurando snapshot del {manifest['read_time']}...")
+    results = restore_snapshot(db, args.snapshot, collections, limiter, args.workers)
+
+    print("\n📊 Resumen:")
+    for name, result in results.items():
+        status = "✅" if not result["errores"] else "⚠️"
+        print(f"   {status} {name}: {result['escritos']} documentos escritos, {len(result['errores'])} errores")
+        for error in result["errores"][:5]:
+            print(f"      ❌ {error}")
+
+
+if __name__ == "__main__":
+    main()
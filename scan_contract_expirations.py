@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Escáner nocturno de vencimientos y pagos recurrentes de contratos
+En vez de recorrer todos los contratos, consulta por organización sólo la ventana de
+tiempo de interés usando índices de rango:
+- (organizacionId, fechaTermino): contratos que terminan en los próximos --dias días
+- (organizacionId, proximaFechaPago): pagos recurrentes en los próximos --dias-pago días
+
+`proximaFechaPago` se precalcula desde fechaInicio y periodicidad. Se mantiene con
+lecturas proporcionales a los cambios: los contratos cambiados desde la última marca de
+agua (--state) de los campos de cambio (fechaModificacion, fechaUltimaModificacion y
+fechaCreacion, que es la única que escribe crearContrato) y los contratos cuya fecha de
+pago ya pasó, que se adelantan al siguiente período. Las ediciones de la app que no
+escriben ninguno de esos campos (actualizarContrato) no se ven en modo incremental:
+--full recalcula todos los contratos, conviene ejecutarlo periódicamente.
+
+Las alertas de cada organización se agrupan en un documento de resumen diario
+`alertas_vencimiento/<organizacionId>_<AAAA-MM-DD>`, escrito en lotes.
+
+Uso:
+    python scan_contract_expirations.py
+    python scan_contract_expirations.py --dias 60 --dias-pago 7 --dry-run
+    python scan_contract_expirations.py --full
+"""
+
+import argparse
+import calendar
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from google.cloud.firestore_v1 import DELETE_FIELD, SERVER_TIMESTAMP
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from firestore_utils import (CHANGE_FIELDS, commit_writes, initialize_firebase, latest_change, load_state,
+                             save_state, stream_changed_since, stream_collection)
+
+DIGEST_COLLECTION = "alertas_vencimiento"
+NEXT_DUE_FIELD = "proximaFechaPago"
+DEFAULT_STATE = ".scan_contract_expirations_state.json.gz"
+
+ALERT_FIELDS = ["titulo", "organizacionId", "estado", "fechaTermino", "periodicidad", "monto", "moneda",
+                NEXT_DUE_FIELD]
+DUE_FIELDS = ["fechaInicio", "fechaTermino", "periodicidad", "estado", NEXT_DUE_FIELD]
+
+# Meses entre pagos; None para contratos de pago único
+PERIOD_MONTHS = {"unico": None, "mensual": 1, "trimestral": 3, "semestral": 6, "anual": 12, "bianual": 24}
+# Estados de los contratos en ejecución, los únicos que generan alertas
+CURRENT_STATES = {"aprobado", "activo", "renovado"}
+
+
+def as_datetime(value: Any) -> Optional[datetime.datetime]:
+    """Normaliza Timestamp, datetime o texto ISO a datetime con zona horaria (UTC)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime.datetime):
+        return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+    return None
+
+
+def add_months(date: datetime.datetime, months: int) -> datetime.datetime:
+    """Suma meses conservando el día, ajustado al último día del mes si no existe"""
+    month_index = date.month - 1 + months
+    year, month = date.year + month_index // 12, month_index % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+
+def next_due_date(data: Dict[str, Any], after: datetime.datetime) -> Optional[datetime.datetime]:
+    """
+    Primera fecha de pago fechaInicio + k períodos que no es anterior a `after`, o None si
+    el contrato no es recurrente, no está en ejecución o ya terminó.
+    """
+    period = PERIOD_MONTHS.get(data.get("periodicidad"))
+    start = as_datetime(data.get("fechaInicio"))
+    if period is None or start is None or data.get("estado") not in CURRENT_STATES:
+        return None
+    if start >= after:
+        return start
+
+    elapsed = (after.year - start.year) * 12 + after.month - start.month
+    steps = max(0, elapsed // period)
+    due = add_months(start, steps * period)
+    while due < after:
+        steps += 1
+        due = add_months(start, steps * period)
+
+    end = as_datetime(data.get("fechaTermino"))
+    return None if end is not None and due > end else due
+
+
+def due_date_update(data: Dict[str, Any], today: datetime.datetime) -> Optional[Dict[str, Any]]:
+    """Actualización de proximaFechaPago si el valor guardado no es el vigente"""
+    due = next_due_date(data, today)
+    current = as_datetime(data.get(NEXT_DUE_FIELD))
+    if due == current:
+        return None
+    return {NEXT_DUE_FIELD: due if due is not None else DELETE_FIELD}
+
+
+def refresh_due_dates(db, state: Dict[str, Any], today: datetime.datetime, full: bool = False,
+                      dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Recalcula proximaFechaPago de los contratos cambiados desde la marca de agua (o de
+    todos con `full`) y adelanta las fechas de pago vencidas. No modifica fechaModificacion.
+    """
+    since = None if full or not state.get("marca") else datetime.datetime.fromisoformat(state["marca"])
+    contratos = db.collection("contratos")
+    updates: Dict[str, Dict[str, Any]] = {}
+    watermark = since
+    stats = {"modificados": 0, "vencidos": 0, "actualizados": 0, "errores": []}
+
+    for doc in stream_changed_since(db, "contratos", since, DUE_FIELDS + list(CHANGE_FIELDS)):
+        data = doc.to_dict() or {}
+        stats["modificados"] += 1
+        modified = latest_change(data)
+        if modified is not None and (watermark is None or modified > watermark):
+            watermark = modified
+        update = due_date_update(data, today)
+        if update:
+            updates[doc.id] = update
+
+    overdue = contratos.where(filter=FieldFilter(NEXT_DUE_FIELD, "<", today)).select(DUE_FIELDS)
+    for doc in overdue.stream():
+        stats["vencidos"] += 1
+        update = due_date_update(doc.to_dict() or {}, today)
+        if update:
+            updates[doc.id] = update
+
+    stats["actualizados"] = len(updates)
+    if dry_run:
+        return stats
+
+    writes = [("update", contratos.document(doc_id), update) for doc_id, update in sorted(updates.items())]
+    _, stats["errores"] = commit_writes(db, writes)
+    if not stats["errores"]:
+        state["marca"] = (watermark or today).isoformat()
+    return stats
+
+
+def window_query(db, organizacion_id: str, field: str, start: datetime.datetime, end: datetime.datetime):
+    return (db.collection("contratos")
+            .where(filter=FieldFilter("organizacionId", "==", organizacion_id))
+            .where(filter=FieldFilter(field, ">=", start))
+            .where(filter=FieldFilter(field, "<=", end))
+            .select(ALERT_FIELDS))
+
+
+def alert_entry(doc, field: str, today: datetime.datetime) -> Dict[str, Any]:
+    data = doc.to_dict() or {}
+    date = as_datetime(data.get(field))
+    return {
+        "contratoId": doc.id,
+        "titulo": data.get("titulo", ""),
+        "fecha": date,
+        "dias": (date - today).days,
+        "monto": data.get("monto"),
+        "moneda": data.get("moneda"),
+        "periodicidad": data.get("periodicidad"),
+    }
+
+
+def scan_organization(db, organizacion_id: str, today: datetime.datetime, days: int,
+                      payment_days: int) -> Dict[str, Any]:
+    """Alertas de una organización: términos y pagos dentro de sus ventanas"""
+    expiring = [alert_entry(doc, "fechaTermino", today)
+                for doc in window_query(db, organizacion_id, "fechaTermino", today,
+                                        today + datetime.timedelta(days=days)).stream()
+                if (doc.to_dict() or {}).get("estado") in CURRENT_STATES]
+    payments = [alert_entry(doc, NEXT_DUE_FIELD, today)
+                for doc in window_query(db, organizacion_id, NEXT_DUE_FIELD, today,
+                                        today + datetime.timedelta(days=payment_days)).stream()
+                # proximaFechaPago puede haber quedado de antes de que el contrato dejara de estar vigente
+                if (doc.to_dict() or {}).get("estado") in CURRENT_STATES]
+    expiring.sort(key=lambda alert: alert["fecha"])
+    payments.sort(key=lambda alert: alert["fecha"])
+    return {"vencimientos": expiring, "pagos": payments}
+
+
+def scan_expirations(db, today: datetime.datetime, days: int = 30, payment_days: int = 7,
+                     max_workers: int = 8) -> Dict[str, Dict[str, Any]]:
+    """Escanea todas las organizaciones en paralelo; devuelve sólo las que tienen alertas"""
+    organizaciones = [doc.id for doc in stream_collection(db, "organizaciones", fields=[])]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda org: scan_organization(db, org, today, days, payment_days), organizaciones)
+        digests = dict(zip(organizaciones, results))
+    return {org: digest for org, digest in digests.items() if digest["vencimientos"] or digest["pagos"]}
+
+
+def write_digests(db, digests: Dict[str, Dict[str, Any]], today: datetime.datetime, days: int,
+                  payment_days: int) -> List[str]:
+    """Escribe un documento de resumen por organización y día; devuelve los errores"""
+    collection_ref = db.collection(DIGEST_COLLECTION)
+    day = today.date().isoformat()
+    writes = []
+    for organizacion_id, digest in sorted(digests.items()):
+        writes.append(("set", collection_ref.document(f"{organizacion_id}_{day}"), {
+            "organizacionId": organizacion_id,
+            "fecha": day,
+            "ventanaDias": days,
+            "ventanaDiasPago": payment_days,
+            "vencimientos": digest["vencimientos"],
+            "pagos": digest["pagos"],
+            "total": len(digest["vencimientos"]) + len(digest["pagos"]),
+            "fechaGeneracion": SERVER_TIMESTAMP,
+        }))
+    _, errors = commit_writes(db, writes)
+    return errors
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Escanea vencimientos y pagos próximos de contratos")
+    parser.add_argument("--dias", type=int, default=30, help="Ventana de vencimientos en días")
+    parser.add_argument("--dias-pago", type=int, default=7, help="Ventana de pagos recurrentes en días")
+    parser.add_argument("--state", default=DEFAULT_STATE)
+    parser.add_argument("--full", action="store_true", help="Recalcula la fecha de pago de todos los contratos")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    print("⏰ Escáner de vencimientos de contratos")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    state = load_state(args.state, {"marca": None})
+    refresh = refresh_due_dates(db, state, today, args.full, args.dry_run)
+    print(f"📅 Fechas de pago: {refresh['modificados']} contratos modificados, {refresh['vencidos']} "
+          f"pagos vencidos, {refresh['actualizados']} actualizaciones")
+
+    digests = scan_expirations(db, today, args.dias, args.dias_pago)
+    print(f"\n📊 Organizaciones con alertas: {len(digests)}")
+    for organizacion_id, digest in sorted(digests.items()):
+        print(f"   🏢 {organizacion_id}: {len(digest['vencimientos'])} vencimientos, {len(digest['pagos'])} pagos")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se escribieron fechas de pago ni resúmenes")
+        return
+
+    errors = refresh["errores"] + write_digests(db, digests, today, args.dias, args.dias_pago)
+    for error in errors[:10]:
+        print(f"   ❌ {error}")
+    if not refresh["errores"]:
+        save_state(args.state, state)
+    print(f"\n✅ Resúmenes escritos en {DIGEST_COLLECTION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Contadores distribuidos (sharded counters) para conteos con muchas escrituras
+Cada contador vive en `contadores/<tipo>:<clave>` con su número de shards, y su valor
+se reparte en `contadores/<tipo>:<clave>/shards/<n>`. Cada incremento toca un shard al
+azar, así un contador admite tantas escrituras sostenidas por segundo como shards tenga,
+en vez de una sola. El valor se lee con una agregación `sum` sobre los shards.
+
+- CounterBatch acumula incrementos en memoria (p. ej. durante una importación) y los
+  escribe en lotes: una escritura por contador y por flush.
+- reseed_counters recalcula los contadores de un tipo desde su colección de origen. Es
+  una pasada offline: los incrementos concurrentes durante la resiembra se pierden.
+
+Uso:
+    python sharded_counters.py leer contratos_por_organizacion ORG_ID
+    python sharded_counters.py resembrar contratos_por_organizacion --shards 20
+"""
+
+import argparse
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from google.cloud.firestore_v1 import Increment
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from firestore_utils import (ThroughputReporter, Write, commit_writes, get_documents,
+                             initialize_firebase, map_partitions)
+
+COUNTERS_COLLECTION = "contadores"
+SHARDS_SUBCOLLECTION = "shards"
+DEFAULT_SHARDS = 10
+
+# Tipo de contador -> (colección de origen, campo que define la clave)
+COUNTER_SOURCES = {
+    "contratos_por_organizacion": ("contratos", "organizacionId"),
+    "auditoria_por_usuario": ("registros_auditoria", "usuarioId"),
+    "usuarios_por_organizacion": ("usuarios", "organizacionId"),
+}
+
+
+def counter_id(tipo: str, clave: str) -> str:
+    return f"{tipo}:{clave}"
+
+
+def counter_ref(db, tipo: str, clave: str):
+    return db.collection(COUNTERS_COLLECTION).document(counter_id(tipo, clave))
+
+
+def configure_counter(db, tipo: str, clave: str, shards: int = DEFAULT_SHARDS):
+    """Fija el número de shards de un contador (los shards sobrantes se siguen sumando)"""
+    counter_ref(db, tipo, clave).set({"tipo": tipo, "clave": clave, "shards": shards}, merge=True)
+
+
+def read_counter(db, tipo: str, clave: str) -> int:
+    """Valor actual de un contador: suma de sus shards en una agregación"""
+    shards_ref = counter_ref(db, tipo, clave).collection(SHARDS_SUBCOLLECTION)
+    value = shards_ref.sum("valor").get()[0][0].value
+    return int(value or 0)
+
+
+def read_counters(db, tipo: str, claves: Iterable[str], max_workers: int = 16) -> Dict[str, int]:
+    """Lee varios contadores del mismo tipo en paralelo"""
+    claves = list(dict.fromkeys(claves))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        values = executor.map(lambda clave: read_counter(db, tipo, clave), claves)
+        return dict(zip(claves, values))
+
+
+class CounterBatch:
+    """
+    Acumula incrementos y los escribe agrupados.
+    El número de shards de cada contador se lee de su documento (en lote) al hacer
+    flush; si el contador no existe se usa `default_shards`.
+    """
+
+    def __init__(self, db, default_shards: int = DEFAULT_SHARDS, flush_every: Optional[int] = None):
+        self.db = db
+        self.default_shards = default_shards
+        self.flush_every = flush_every
+        self.pending: Counter = Counter()
+        self.written = 0
+        self.errors: List[str] = []
+
+    def increment(self, tipo: str, clave: str, amount: int = 1):
+        if not clave:
+            return
+        self.pending[(tipo, clave)] += amount
+        if self.flush_every and len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def _shard_counts(self) -> Dict[str, int]:
+        ids = [counter_id(tipo, clave) for tipo, clave in self.pending]
+        configured = get_documents(self.db, COUNTERS_COLLECTION, ids, fields=["shards"])
+        return {doc_id: (snapshot.to_dict() or {}).get("shards") or self.default_shards
+                for doc_id, snapshot in configured.items()}
+
+    def flush(self):
+        """Escribe los incrementos acumulados: uno por contador, en un shard al azar"""
+        if not self.pending:
+            return
+        shard_counts = self._shard_counts()
+        writes: List[Write] = []
+        for (tipo, clave), amount in self.pending.items():
+            if amount == 0:
+                continue
+            ref = counter_ref(self.db, tipo, clave)
+            shards = shard_counts.get(ref.id)
+            if shards is None:
+                shards = self.default_shards
+                writes.append(("merge", ref, {"tipo": tipo, "clave": clave, "shards": shards}))
+            shard_ref = ref.collection(SHARDS_SUBCOLLECTION).document(str(random.randrange(shards)))
+            writes.append(("merge", shard_ref, {"valor": Increment(amount)}))
+        self.pending.clear()
+
+        committed, errors = commit_writes(self.db, writes)
+        self.written += committed
+        self.errors.extend(errors)
+
+
+def count_source(db, tipo: str, partitions: int = 8) -> Counter:
+    """Cuenta los documentos de la colección de origen por clave (sólo el campo clave)"""
+    collection_name, field = COUNTER_SOURCES[tipo]
+    reporter = ThroughputReporter(collection_name, every=10000)
+
+    def worker(query) -> Counter:
+        partial: Counter = Counter()
+        for doc in query.stream():
+            clave = (doc.to_dict() or {}).get(field)
+            if clave:
+                partial[clave] += 1
+            reporter.add()
+        return partial
+
+    totals: Counter = Counter()
+    for partial in map_partitions(db, collection_name, worker, partitions, fields=[field]):
+        totals.update(partial)
+    print(f"   ⏱️ {reporter.summary()}")
+    return totals
+
+
+def reseed_counters(db, tipo: str, shards: int = DEFAULT_SHARDS, partitions: int = 8,
+                    dry_run: bool = False) -> Dict[str, int]:
+    """
+    Recalcula todos los contadores de `tipo` desde la colección de origen.
+    El total queda en el shard 0, los demás en cero y los shards sobrantes (si se redujo
+    el número de shards) se eliminan. Los contadores cuya clave ya no existe quedan en cero.
+    """
+    totals = count_source(db, tipo, partitions)
+    existing = {(doc.to_dict() or {}).get("clave"): (doc.to_dict() or {}).get("shards") or 0
+                for doc in db.collection(COUNTERS_COLLECTION).where(filter=FieldFilter("tipo", "==", tipo)).stream()}
+    stats = {"contadores": len(set(totals) | set(existing)), "reiniciados": len(set(existing) - set(totals)),
+             "escrituras": 0, "errores": 0}
+    if dry_run:
+        return stats
+
+    def writes():
+        for clave in sorted(set(totals) | set(existing)):
+            ref = counter_ref(db, tipo, clave)
+            shards_ref = ref.collection(SHARDS_SUBCOLLECTION)
+            yield ("set", ref, {"tipo": tipo, "clave": clave, "shards": shards})
+            for shard in range(shards):
+                yield ("set", shards_ref.document(str(shard)), {"valor": totals.get(clave, 0) if shard == 0 else 0})
+            for shard in range(shards, existing.get(clave, 0)):
+                yield ("delete", shards_ref.document(str(shard)), None)
+
+    stats["escrituras"], errors = commit_writes(db, writes())
+    stats["errores"] = len(errors)
+    for error in errors[:10]:
+        print(f"   ❌ {error}")
+    return stats
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Contadores distribuidos de Firestore")
+    subparsers = parser.add_subparsers(dest="accion", required=True)
+
+    read_parser = subparsers.add_parser("leer", help="Lee el valor de contadores")
+    read_parser.add_argument("tipo", choices=sorted(COUNTER_SOURCES))
+    read_parser.add_argument("claves", nargs="+")
+
+    reseed_parser = subparsers.add_parser("resembrar", help="Recalcula contadores desde su origen")
+    reseed_parser.add_argument("tipo", choices=sorted(COUNTER_SOURCES))
+    reseed_parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    reseed_parser.add_argument("--partitions", type=int, default=8)
+    reseed_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    if args.accion == "leer":
+        for clave, value in read_counters(db, args.tipo, args.claves).items():
+            print(f"   🔢 {counter_id(args.tipo, clave)}: {value}")
+        return
+
+    print(f"🔢 Resiembra de contadores '{args.tipo}' con {args.shards} shards")
+    print("=" * 50)
+    stats = reseed_counters(db, args.tipo, args.shards, args.partitions, args.dry_run)
+    print(f"\n📊 Contadores: {stats['contadores']} ({stats['reiniciados']} sin documentos de origen)")
+    if args.dry_run:
+        print("⚠️ Modo simulación: no se escribieron contadores")
+    else:
+        print(f"✅ Escrituras: {stats['escrituras']}, errores: {stats['errores']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Almacén local de snapshots con acceso aleatorio por ID vía mmap
+Por colección hay dos archivos:
+- <colección>.data: registros [longitud u32][JSON comprimido con zlib], sólo se agregan
+- <colección>.idx: cabecera, tabla de entradas ordenada por ID (offset/longitud de cada
+  registro), tabla hash de direccionamiento abierto (crc32 del ID) y los IDs concatenados
+
+Ambos se abren con mmap: una búsqueda por ID es O(1) (tabla hash) y un recorrido por
+prefijo de ID es una búsqueda binaria sobre la tabla ordenada; sólo se descomprimen los
+registros que se leen, nunca la colección completa.
+
+Se construye desde un snapshot NDJSON (export_firestore_snapshot.py), se mantiene al día
+con sync_snapshot_store.py y expone la misma interfaz DocumentSource que Firestore para
+las herramientas offline.
+
+Uso:
+    python snapshot_store.py build snapshots/20250101_120000 store/
+    python snapshot_store.py get store/ contratos/ABC123
+    python snapshot_store.py scan store/ contratos --prefix contract_
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from snapshot_utils import SnapshotDocument, iter_collection_records, load_manifest
+
+STORE_MANIFEST = "store.json"
+INDEX_MAGIC = b"FSIDX001"
+# magic, cantidad de entradas, cantidad de ranuras hash, offset del bloque de IDs
+HEADER = struct.Struct("<8sQQQ")
+# offset del ID, largo del ID, offset del registro, largo del registro
+ENTRY = struct.Struct("<QIQI")
+SLOT = struct.Struct("<I")
+RECORD_LENGTH = struct.Struct("<I")
+COMPRESSION_LEVEL = 6
+# Fracción del archivo de datos ocupada por registros reemplazados a partir de la cual se compacta
+COMPACT_RATIO = 0.5
+
+
+def _slot_count(count: int) -> int:
+    """Potencia de dos con factor de carga <= 0.5"""
+    slots = 1
+    while slots < 2 * max(count, 1):
+        slots <<= 1
+    return slots
+
+
+def write_index(index_path: str, entries: List[Tuple[bytes, int, int]]):
+    """Escribe el índice de (ID, offset, largo); las entradas se ordenan por ID"""
+    entries = sorted(entries)
+    slots = _slot_count(len(entries))
+    ids_offset = HEADER.size + ENTRY.size * len(entries) + SLOT.size * slots
+
+    table = bytearray(SLOT.size * slots)
+    mask = slots - 1
+    for position, (doc_id, _, _) in enumerate(entries):
+        slot = zlib.crc32(doc_id) & mask
+        while SLOT.unpack_from(table, slot * SLOT.size)[0]:
+            slot = (slot + 1) & mask
+        SLOT.pack_into(table, slot * SLOT.size, position + 1)
+
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, len(entries), slots, ids_offset))
+        id_offset = 0
+        for doc_id, offset, length in entries:
+            f.write(ENTRY.pack(id_offset, len(doc_id), offset, length))
+            id_offset += len(doc_id)
+        f.write(table)
+        for doc_id, _, _ in entries:
+            f.write(doc_id)
+    os.replace(tmp_path, index_path)
+
+
+def append_records(data_path: str, records: Iterable[Dict[str, Any]]) -> List[Tuple[bytes, int, int]]:
+    """Agrega registros al archivo de datos; devuelve (ID, offset, largo) de cada uno"""
+    entries = []
+    with open(data_path, "ab") as f:
+        offset = f.tell()
+        for record in records:
+            payload = zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                                    COMPRESSION_LEVEL)
+            f.write(RECORD_LENGTH.pack(len(payload)))
+            f.write(payload)
+            entries.append((record["id"].encode("utf-8"), offset + RECORD_LENGTH.size, len(payload)))
+            offset += RECORD_LENGTH.size + len(payload)
+    return entries
+
+
+class CollectionStore:
+    """Una colección del almacén abierta con mmap (sólo lectura)"""
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        self.data_path = os.path.join(directory, f"{name}.data")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self._data_file = open(self.data_path, "rb")
+        self._index_file = open(self.index_path, "rb")
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if os.path.getsize(self.data_path) else b""
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._slots, self._ids_offset = HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Índice inválido: {self.index_path}")
+        self._slots_offset = HEADER.size + ENTRY.size * self._count
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._index.close()
+        self._data_file.close()
+        self._index_file.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int) -> Tuple[int, int, int, int]:
+        return ENTRY.unpack_from(self._index, HEADER.size + ENTRY.size * position)
+
+    def entries(self) -> List[Tuple[bytes, int, int]]:
+        """(ID, offset, largo) de todas las entradas, en orden de ID"""
+        result = []
+        for position in range(self._count):
+            id_offset, id_length, offset, length = self._entry(position)
+            start = self._ids_offset + id_offset
+            result.append((bytes(self._index[start:start + id_length]), offset, length))
+        return result
+
+    def id_at(self, position: int) -> str:
+        id_offset, id_length, _, _ = self._entry(position)
+        start = self._ids_offset + id_offset
+        return self._index[start:start + id_length].decode("utf-8")
+
+    def record_at(self, position: int) -> Dict[str, Any]:
+        _, _, offset, length = self._entry(position)
+        return json.loads(zlib.decompress(memoryview(self._data)[offset:offset + length]))
+
+    def document_at(self, position: int, fields: Optional[List[str]] = None) -> SnapshotDocument:
+        return SnapshotDocument(self.record_at(position), fields)
+
+    def find(self, doc_id: str) -> Optional[int]:
+        """Posición del ID en la tabla ordenada (tabla hash, O(1) esperado)"""
+        key = doc_id.encode("utf-8")
+        mask = self._slots - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            position = SLOT.unpack_from(self._index, self._slots_offset + slot * SLOT.size)[0]
+            if not position:
+                return None
+            id_offset, id_length, _, _ = self._entry(position - 1)
+            start = self._ids_offset + id_offset
+            if id_length == len(key) and self._index[start:start + id_length] == key:
+                return position - 1
+            slot = (slot + 1) & mask
+
+    def get(self, doc_id: str, fields: Optional[List[str]] = None) -> Optional[SnapshotDocument]:
+        position = self.find(doc_id)
+        return self.document_at(position, fields) if position is not None else None
+
+    def _lower_bound(self, doc_id: str) -> int:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.id_at(middle) < doc_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def scan(self, prefix: str = "", fields: Optional[List[str]] = None) -> Iterator[SnapshotDocument]:
+        """Documentos cuyo ID empieza con `prefix`, en orden de ID"""
+        position = self._lower_bound(prefix) if prefix else 0
+        while position < self._count:
+            if prefix and not self.id_at(position).startswith(prefix):
+                return
+            yield self.document_at(position, fields)
+            position += 1
+
+
+class SnapshotStore:
+    """Almacén de snapshot: directorio con store.json y los archivos de cada colección"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest = load_store_manifest(directory)
+        self._collections: Dict[str, CollectionStore] = {}
+
+    def collections(self) -> List[str]:
+        return sorted(self.manifest["colecciones"])
+
+    def collection(self, name: str) -> CollectionStore:
+        if name not in self._collections:
+            if name not in self.manifest["colecciones"]:
+                raise KeyError(f"La colección {name} no está en el almacén {self.directory}")
+            self._collections[name] = CollectionStore(self.directory, name)
+        return self._collections[name]
+
+    def get(self, path: str, fields: Optional[List[str]] = None) -> Optional[SnapshotDocument]:
+        """Documento por ruta `<colección>/<id>`"""
+        collection_name, _, doc_id = path.rpartition("/")
+        return self.collection(collection_name.rsplit("/", 1)[-1]).get(doc_id, fields)
+
+    def source(self):
+        """DocumentSource sobre el almacén (compatible con firestore_source)"""
+        return lambda collection_name, fields=None: self.collection(collection_name).scan("", fields)
+
+    def close(self):
+        for collection in self._collections.values():
+            collection.close()
+        self._collections.clear()
+
+
+def load_store_manifest(store_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(store_dir, STORE_MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_store_manifest(store_dir: str, manifest: Dict[str, Any]):
+    """Guarda store.json de forma atómica (archivo temporal + rename)"""
+    path = os.path.join(store_dir, STORE_MANIFEST)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _compact(store_dir: str, name: str, entries: List[Tuple[bytes, int, int]]) -> List[Tuple[bytes, int, int]]:
+    """Reescribe el archivo de datos sólo con los registros vigentes; devuelve las nuevas entradas"""
+    data_path = os.path.join(store_dir, f"{name}.data")
+    tmp_path = f"{data_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with open(data_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        records = (json.loads(zlib.decompress(data[offset:offset + length])) for _, offset, length in entries)
+        compacted = append_records(tmp_path, records)
+    # Entre los dos rename el índice antiguo apunta al archivo nuevo: si el proceso se
+    # interrumpe justo ahí, hay que reconstruir la colección (build)
+    os.replace(tmp_path, data_path)
+    return compacted
+
+
+def update_collection(store_dir: str, name: str, records: Iterable[Dict[str, Any]],
+                      deleted: Iterable[str] = ()) -> Dict[str, int]:
+    """
+    Aplica cambios a una colección del almacén: agrega los registros nuevos o modificados
+    al final del archivo de datos y reescribe el índice sin los IDs eliminados. El índice
+    se reemplaza de forma atómica, así que los lectores ven el estado anterior o el nuevo.
+    Compacta el archivo de datos cuando los registros reemplazados superan COMPACT_RATIO.
+    """
+    data_path = os.path.join(store_dir, f"{name}.data")
+    index_path = os.path.join(store_dir, f"{name}.idx")
+    if os.path.exists(index_path):
+        collection = CollectionStore(store_dir, name)
+        current = {doc_id: (doc_id, offset, length) for doc_id, offset, length in collection.entries()}
+        collection.close()
+    else:
+        current = {}
+
+    appended = append_records(data_path, records)
+    for entry in appended:
+        current[entry[0]] = entry
+    removed = 0
+    for doc_id in deleted:
+        removed += current.pop(doc_id.encode("utf-8"), None) is not None
+
+    entries = sorted(current.values())
+    live_bytes = sum(RECORD_LENGTH.size + length for _, _, length in entries)
+    compacted = bool(entries) and live_bytes < (1 - COMPACT_RATIO) * os.path.getsize(data_path)
+    if compacted:
+        entries = _compact(store_dir, name, entries)
+    write_index(index_path, entries)
+    return {"escritos": len(appended), "eliminados": removed, "documentos": len(entries),
+            "compactado": int(compacted)}
+
+
+def build_store(snapshot_dir: str, store_dir: str, collections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Construye el almacén desde un snapshot NDJSON; devuelve el manifiesto del almacén"""
+    snapshot_manifest = load_manifest(snapshot_dir)
+    if snapshot_manifest is None:
+        raise FileNotFoundError(f"No hay manifest.json en {snapshot_dir}")
+    os.makedirs(store_dir, exist_ok=True)
+
+    manifest = {"read_time": snapshot_manifest["read_time"], "origen": os.path.abspath(snapshot_dir),
+                "colecciones": {}}
+    for name in collections or sorted(snapshot_manifest["colecciones"]):
+        data_path = os.path.join(store_dir, f"{name}.data")
+        if os.path.exists(data_path):
+            os.remove(data_path)
+        entries = append_records(data_path, iter_collection_records(snapshot_dir, name))
+        # Un ID repetido (p. ej. en subcolecciones homónimas) conserva el último registro
+        unique = list({doc_id: (doc_id, offset, length) for doc_id, offset, length in entries}.values())
+        write_index(os.path.join(store_dir, f"{name}.idx"), unique)
+        manifest["colecciones"][name] = {"documentos": len(unique)}
+        print(f"   📁 {name}: {len(unique)} documentos")
+
+    save_store_manifest(store_dir, manifest)
+    return manifest
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Almacén local de snapshots con acceso por ID")
+    subparsers = parser.add_subparsers(dest="accion", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Construye el almacén desde un snapshot NDJSON")
+    build_parser.add_argument("snapshot")
+    build_parser.add_argument("store")
+    build_parser.add_argument("collections", nargs="*")
+
+    get_parser = subparsers.add_parser("get", help="Muestra un documento por ruta")
+    get_parser.add_argument("store")
+    get_parser.add_argument("path", help="<colección>/<id>")
+
+    scan_parser = subparsers.add_parser("scan", help="Lista documentos por prefijo de ID")
+    scan_parser.add_argument("store")
+    scan_parser.add_argument("collection")
+    scan_parser.add_argument("--prefix", default="")
+    scan_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.accion == "build":
+        print(f"🗄️ Construyendo almacén {args.store} desde {args.snapshot}")
+        build_store(args.snapshot, args.store, args.collections or None)
+        print("✅ Almacén listo")
+        return
+
+    store = SnapshotStore(args.store)
+    if args.accion == "get":
+        doc = store.get(args.path)
+        if doc is None:
+            print(f"❌ No existe {args.path}")
+            return
+        print(json.dumps(doc.to_dict(), ensure_ascii=False, indent=2, default=str))
+        return
+
+    for count, doc in enumerate(store.collection(args.collection).scan(args.prefix)):
+        if count >= args.limit:
+            break
+        print(f"   • {doc.id}")
+
+
+if __name__ == "__main__":
+    main()
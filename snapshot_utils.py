@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas para los snapshots locales de Firestore
+Codificación JSON de los valores de Firestore (fechas, referencias, geopuntos, bytes),
+lectura y escritura del manifiesto, y una fuente de documentos (DocumentSource) que
+lee un snapshot exportado en vez de Firestore.
+
+Estructura de un snapshot:
+    <directorio>/manifest.json
+    <directorio>/<colección>/part-00000.ndjson.gz   una línea JSON por documento
+"""
+
+import base64
+import datetime
+import gzip
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from google.cloud.firestore_v1 import DocumentReference, GeoPoint
+
+MANIFEST_NAME = "manifest.json"
+
+
+def encode_value(value: Any) -> Any:
+    """Convierte un valor de Firestore en JSON; los tipos especiales quedan etiquetados"""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return {"$fecha": value.isoformat()}
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    if isinstance(value, GeoPoint):
+        return {"$geo": [value.latitude, value.longitude]}
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, DocumentReference):
+        return {"$ref": value.path}
+    return value
+
+
+def decode_value(value: Any, db=None) -> Any:
+    """Inverso de encode_value; las referencias se reconstruyen sólo si se entrega `db`"""
+    if isinstance(value, list):
+        return [decode_value(item, db) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        tag, item = next(iter(value.items()))
+        if tag == "$fecha":
+            return datetime.datetime.fromisoformat(item)
+        if tag == "$geo":
+            return GeoPoint(item[0], item[1])
+        if tag == "$bytes":
+            return base64.b64decode(item)
+        if tag == "$ref":
+            return db.document(item) if db is not None else item
+    return {key: decode_value(item, db) for key, item in value.items()}
+
+
+def encode_document(doc) -> Dict[str, Any]:
+    """Registro de snapshot de un DocumentSnapshot"""
+    return {
+        "id": doc.id,
+        "ruta": doc.reference.path,
+        "creado": doc.create_time.isoformat() if doc.create_time else None,
+        "actualizado": doc.update_time.isoformat() if doc.update_time else None,
+        "datos": encode_value(doc.to_dict() or {}),
+    }
+
+
+class SnapshotDocument:
+    """Documento leído de un snapshot, con la interfaz mínima de DocumentSnapshot"""
+
+    exists = True
+
+    def __init__(self, record: Dict[str, Any], fields: Optional[List[str]] = None):
+        self.id = record["id"]
+        self.path = record.get("ruta")
+        self.create_time = datetime.datetime.fromisoformat(record["creado"]) if record.get("creado") else None
+        self.update_time = datetime.datetime.fromisoformat(record["actualizado"]) if record.get("actualizado") else None
+        self._data = record.get("datos") or {}
+        self._fields = fields
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self._data
+        if self._fields is not None:
+            wanted = {field.split(".", 1)[0] for field in self._fields}
+            data = {key: value for key, value in data.items() if key in wanted}
+        return decode_value(data)
+
+    def get(self, field: str) -> Any:
+        value: Any = self.to_dict()
+        for part in field.split("."):
+            value = value[part]
+        return value
+
+
+def load_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(directory: str, manifest: Dict[str, Any]):
+    """Guarda el manifiesto de forma atómica (archivo temporal + rename)"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def iter_chunk(path: str) -> Iterator[Dict[str, Any]]:
+    """Registros de un archivo NDJSON comprimido"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_collection_records(directory: str, collection_name: str) -> Iterator[Dict[str, Any]]:
+    """Registros de una colección exportada, en el orden de sus particiones"""
+    manifest = load_manifest(directory) or {}
+    collection = manifest.get("colecciones", {}).get(collection_name)
+    if collection is None:
+        raise KeyError(f"La colección {collection_name} no está en el snapshot {directory}")
+    for part in collection["particiones"]:
+        if part.get("archivo"):
+            yield from iter_chunk(os.path.join(directory, part["archivo"]))
+
+
+def ndjson_source(directory: str):
+    """DocumentSource que lee un snapshot exportado (compatible con firestore_source)"""
+    def source(collection_name: str, fields: Optional[List[str]] = None) -> Iterator[SnapshotDocument]:
+        for record in iter_collection_records(directory, collection_name):
+            yield SnapshotDocument(record, fields)
+    return source
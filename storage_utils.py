@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas para Firebase Storage
+Resolución de rutas desde pdfUrl, listado paralelo por prefijos, borrado por lotes y un
+bucket respaldado por un directorio local para pruebas sin conexión.
+"""
+
+import base64
+import datetime
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import unquote, urlparse
+
+from dotenv import load_dotenv
+from firebase_admin import storage
+
+load_dotenv()
+
+# Carpeta raíz de los PDFs de contratos (ver FileStorageService.uploadContractPDF)
+CONTRACTS_PREFIX = "contracts/"
+# Máximo de operaciones por lote HTTP de Cloud Storage
+MAX_STORAGE_BATCH = 100
+
+
+def get_bucket(bucket_name: Optional[str] = None, local_dir: Optional[str] = None):
+    """
+    Devuelve el bucket de Storage del proyecto, o un LocalBucket si se indica `local_dir`.
+    El nombre por defecto se toma de VITE_STORAGE_BUCKET.
+    """
+    if local_dir:
+        return LocalBucket(local_dir)
+    return storage.bucket(bucket_name or os.getenv("VITE_STORAGE_BUCKET"))
+
+
+def blob_path_from_url(pdf_url: str, bucket_name: Optional[str] = None) -> Optional[str]:
+    """
+    Convierte el valor de `pdfUrl` en la ruta del blob dentro del bucket.
+    Acepta rutas relativas, URLs gs:// y URLs de descarga de Firebase; devuelve None para
+    URLs externas o de otro bucket.
+    """
+    if not pdf_url:
+        return None
+    if "://" not in pdf_url:
+        return pdf_url.lstrip("/")
+
+    parsed = urlparse(pdf_url)
+    if parsed.scheme == "gs":
+        if bucket_name and parsed.netloc != bucket_name:
+            return None
+        return parsed.path.lstrip("/")
+
+    if parsed.netloc in ("firebasestorage.googleapis.com", "storage.googleapis.com"):
+        parts = parsed.path.split("/")
+        # /v0/b/<bucket>/o/<ruta codificada>
+        if len(parts) >= 6 and parts[1] == "v0" and parts[2] == "b" and parts[4] == "o":
+            if bucket_name and parts[3] != bucket_name:
+                return None
+            return unquote("/".join(parts[5:]))
+        # storage.googleapis.com/<bucket>/<ruta>
+        if parsed.netloc == "storage.googleapis.com" and len(parts) >= 3:
+            if bucket_name and parts[1] != bucket_name:
+                return None
+            return unquote("/".join(parts[2:]))
+    return None
+
+
+def _list_prefix(bucket, prefix: str, page_size: int) -> Dict[str, Any]:
+    blobs = {}
+    for page in bucket.list_blobs(prefix=prefix, page_size=page_size).pages:
+        for blob in page:
+            blobs[blob.name] = blob
+    return blobs
+
+
+def list_blobs_parallel(bucket, prefix: str = CONTRACTS_PREFIX, page_size: int = 1000,
+                        max_workers: int = 16) -> Dict[str, Any]:
+    """
+    Lista todos los blobs bajo `prefix` una sola vez.
+    Cada subcarpeta (una por organización) se pagina en su propio hilo; los blobs sueltos
+    directamente bajo `prefix` se incluyen también.
+    """
+    top_level = bucket.list_blobs(prefix=prefix, delimiter="/")
+    blobs = {blob.name: blob for blob in top_level}
+    prefixes = sorted(top_level.prefixes)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for partial in executor.map(lambda p: _list_prefix(bucket, p, page_size), prefixes):
+            blobs.update(partial)
+    return blobs
+
+
+def delete_blobs(bucket, names: List[str], batch_size: int = MAX_STORAGE_BATCH) -> int:
+    """Elimina blobs en lotes HTTP de hasta 100 operaciones; devuelve cuántos se eliminaron"""
+    deleted = 0
+    for start in range(0, len(names), batch_size):
+        chunk = names[start:start + batch_size]
+        if isinstance(bucket, LocalBucket):
+            for name in chunk:
+                bucket.delete_blob(name)
+        else:
+            with bucket.client.batch():
+                for name in chunk:
+                    bucket.delete_blob(name)
+        deleted += len(chunk)
+    return deleted
+
+
+class LocalBlob:
+    """Blob de un LocalBucket con la misma interfaz mínima que google.cloud.storage.Blob"""
+
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.metadata: Dict[str, str] = {}
+        self.content_type: Optional[str] = None
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.bucket.root, *self.name.split("/"))
+
+    @property
+    def size(self) -> Optional[int]:
+        return os.path.getsize(self._path) if os.path.exists(self._path) else None
+
+    @property
+    def md5_hash(self) -> Optional[str]:
+        """MD5 en base64, igual que el atributo que entrega Cloud Storage"""
+        if not os.path.exists(self._path):
+            return None
+        digest = hashlib.md5()
+        with open(self._path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return base64.b64encode(digest.digest()).decode("ascii")
+
+    @property
+    def updated(self) -> Optional[datetime.datetime]:
+        if not os.path.exists(self._path):
+            return None
+        return datetime.datetime.fromtimestamp(os.path.getmtime(self._path), tz=datetime.timezone.utc)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path)
+
+    def reload(self):
+        return None
+
+    def upload_from_filename(self, filename: str, content_type: Optional[str] = None, **kwargs):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        shutil.copyfile(filename, self._path)
+        self.content_type = content_type
+
+    def upload_from_string(self, data, content_type: Optional[str] = None, **kwargs):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(self._path, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        self.content_type = content_type
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def download_to_filename(self, filename: str, **kwargs):
+        shutil.copyfile(self._path, filename)
+
+    def delete(self):
+        os.remove(self._path)
+
+
+class _LocalBlobIterator:
+    """Iterador de listado compatible con HTTPIterator (atributos `pages` y `prefixes`)"""
+
+    def __init__(self, blobs: List[LocalBlob], prefixes: List[str], page_size: int):
+        self._blobs = blobs
+        self._page_size = page_size
+        self.prefixes = set(prefixes)
+
+    def __iter__(self) -> Iterator[LocalBlob]:
+        return iter(self._blobs)
+
+    @property
+    def pages(self) -> Iterator[List[LocalBlob]]:
+        for start in range(0, len(self._blobs), self._page_size):
+            yield self._blobs[start:start + self._page_size]
+
+
+class LocalBucket:
+    """Bucket respaldado por un directorio local, para ejecutar las herramientas sin Storage"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.name = f"local:{self.root}"
+        os.makedirs(self.root, exist_ok=True)
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[LocalBlob]:
+        blob = self.blob(name)
+        return blob if blob.exists() else None
+
+    def delete_blob(self, name: str):
+        self.blob(name).delete()
+
+    def list_blobs(self, prefix: str = "", delimiter: Optional[str] = None,
+                   page_size: int = 1000) -> _LocalBlobIterator:
+        names = []
+        for directory, _, files in os.walk(self.root):
+            for filename in files:
+                relative = os.path.relpath(os.path.join(directory, filename), self.root)
+                name = relative.replace(os.sep, "/")
+                if name.startswith(prefix):
+                    names.append(name)
+
+        blobs, prefixes = [], set()
+        for name in sorted(names):
+            rest = name[len(prefix):]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+            else:
+                blobs.append(self.blob(name))
+        return _LocalBlobIterator(blobs, sorted(prefixes), page_size)
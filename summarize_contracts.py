@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Resúmenes materializados de contratos por organización
+Recorre `contratos` una sola vez (particiones en paralelo, sólo los campos necesarios) y
+calcula por `organizacionId`:
+- cantidad y suma de `monto` por moneda, agrupadas por estado, tipo, categoría, moneda
+  y periodicidad
+- histograma de vencimientos próximos de los contratos vigentes
+
+El resultado se escribe en `resumenes_contratos/<organizacionId>` (un documento pequeño
+por organización) en lotes, de modo que un dashboard carga un solo documento en vez de
+todos los contratos. Los resúmenes de organizaciones sin contratos se eliminan.
+
+Uso:
+    python summarize_contracts.py
+    python summarize_contracts.py --dry-run --partitions 16
+"""
+
+import argparse
+import datetime
+import json
+from typing import Any, Dict, Optional
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from firestore_utils import ThroughputReporter, commit_writes, initialize_firebase, map_partitions
+
+SUMMARY_COLLECTION = "resumenes_contratos"
+
+# Campo del contrato -> clave de la agrupación en el resumen
+GROUP_FIELDS = {
+    "estado": "porEstado",
+    "tipo": "porTipo",
+    "categoria": "porCategoria",
+    "moneda": "porMoneda",
+    "periodicidad": "porPeriodicidad",
+}
+READ_FIELDS = ["organizacionId", "monto", "fechaTermino"] + list(GROUP_FIELDS)
+
+# Estados cuyo vencimiento interesa al dashboard
+CURRENT_STATES = {"activo", "aprobado", "renovado"}
+# Límite superior en días (inclusive) -> nombre del tramo del histograma
+EXPIRY_BUCKETS = [(30, "0_30"), (60, "31_60"), (90, "61_90"), (180, "91_180"), (365, "181_365")]
+# Ventana de `proximosVencer`, igual que EstadisticasContrato en la app
+DUE_SOON_DAYS = 30
+
+MISSING = "sin_valor"
+
+
+def as_datetime(value: Any) -> Optional[datetime.datetime]:
+    """Normaliza Timestamp, datetime o texto ISO a datetime con zona horaria (UTC)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime.datetime):
+        return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+    return None
+
+
+def expiry_bucket(fecha_termino: Any, today: datetime.datetime) -> str:
+    """Tramo del histograma de vencimientos para una fecha de término"""
+    end = as_datetime(fecha_termino)
+    if end is None:
+        return "sin_fecha"
+    days = (end - today).days
+    if days < 0:
+        return "vencidos"
+    for limit, name in EXPIRY_BUCKETS:
+        if days <= limit:
+            return name
+    return "mas_365"
+
+
+def new_summary() -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"total": 0, "montos": {}, "vencimientos": {}, "proximosVencer": 0}
+    for key in GROUP_FIELDS.values():
+        summary[key] = {}
+    return summary
+
+
+def add_contract(summary: Dict[str, Any], data: Dict[str, Any], today: datetime.datetime):
+    """Acumula un contrato en el resumen de su organización"""
+    moneda = str(data.get("moneda") or MISSING)
+    monto = data.get("monto")
+    monto = float(monto) if isinstance(monto, (int, float)) and not isinstance(monto, bool) else 0.0
+
+    summary["total"] += 1
+    summary["montos"][moneda] = summary["montos"].get(moneda, 0.0) + monto
+    for field, key in GROUP_FIELDS.items():
+        group = summary[key].setdefault(str(data.get(field) or MISSING), {"cantidad": 0, "montos": {}})
+        group["cantidad"] += 1
+        group["montos"][moneda] = group["montos"].get(moneda, 0.0) + monto
+
+    if data.get("estado") in CURRENT_STATES:
+        bucket = expiry_bucket(data.get("fechaTermino"), today)
+        summary["vencimientos"][bucket] = summary["vencimientos"].get(bucket, 0) + 1
+        end = as_datetime(data.get("fechaTermino"))
+        if end is not None and 0 <= (end - today).days <= DUE_SOON_DAYS:
+            summary["proximosVencer"] += 1
+
+
+def merge_into(target: Dict[str, Any], source: Dict[str, Any]):
+    """Suma recursivamente `source` en `target` (resúmenes parciales de particiones)"""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            merge_into(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def round_amounts(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {key: round_amounts(item) for key, item in value.items()}
+    return value
+
+
+def summarize_contracts(db, partitions: int = 8,
+                        today: Optional[datetime.datetime] = None) -> Dict[str, Dict[str, Any]]:
+    """Recorre los contratos una vez y devuelve organizacionId -> resumen"""
+    today = today or datetime.datetime.now(datetime.timezone.utc)
+    reporter = ThroughputReporter("contratos", every=5000)
+
+    def worker(query) -> Dict[str, Dict[str, Any]]:
+        partial: Dict[str, Dict[str, Any]] = {}
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            organizacion_id = data.get("organizacionId") or MISSING
+            add_contract(partial.setdefault(organizacion_id, new_summary()), data, today)
+            reporter.add()
+        return partial
+
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for partial in map_partitions(db, "contratos", worker, partitions, fields=READ_FIELDS):
+        for organizacion_id, summary in partial.items():
+            merge_into(summaries.setdefault(organizacion_id, new_summary()), summary)
+
+    print(f"   ⏱️ {reporter.summary()}")
+    return {organizacion_id: round_amounts(summary) for organizacion_id, summary in summaries.items()}
+
+
+def write_summaries(db, summaries: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Reemplaza los documentos de resumen y elimina los de organizaciones sin contratos"""
+    collection_ref = db.collection(SUMMARY_COLLECTION)
+    writes = []
+    for organizacion_id, summary in sorted(summaries.items()):
+        data = dict(summary, organizacionId=organizacion_id, fechaCalculo=SERVER_TIMESTAMP)
+        writes.append(("set", collection_ref.document(organizacion_id), data))
+
+    stale = [ref for ref in collection_ref.list_documents() if ref.id not in summaries]
+    writes.extend(("delete", ref, None) for ref in stale)
+
+    committed, errors = commit_writes(db, writes)
+    return {"escrituras": committed, "eliminados": len(stale), "errores": errors}
+
+
+def print_summary(summaries: Dict[str, Dict[str, Any]]):
+    """Imprime un resumen breve por organización"""
+    for organizacion_id, summary in sorted(summaries.items()):
+        montos = ", ".join(f"{moneda} {monto:,.0f}" for moneda, monto in sorted(summary["montos"].items()))
+        print(f"   🏢 {organizacion_id}: {summary['total']} contratos ({montos}), "
+              f"{summary['proximosVencer']} por vencer en {DUE_SOON_DAYS} días")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Materializa resúmenes de contratos por organización")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="Calcula sin escribir")
+    parser.add_argument("--json", help="Guarda los resúmenes en este archivo")
+    args = parser.parse_args()
+
+    print("📊 Resúmenes de contratos por organización")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    summaries = summarize_contracts(db, args.partitions)
+    print(f"\n🏢 {len(summaries)} organizaciones")
+    print_summary(summaries)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resúmenes guardados en {args.json}")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se escribieron resúmenes")
+        return
+
+    result = write_summaries(db, summaries)
+    print(f"\n✅ Escrituras confirmadas: {result['escrituras']} ({result['eliminados']} resúmenes eliminados)")
+    for error in result["errores"][:10]:
+        print(f"   ❌ {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Sincronización masiva de custom claims de Auth desde la colección usuarios
+El rol y la organización viven en `usuarios` (ID del documento = UID), pero también
+deben reflejarse en los custom claims del token de Auth, que hoy se fijan a mano
+usuario por usuario (set-claims.cjs, api/setCustomClaims.js).
+
+Se recorre Auth con list_users (páginas de 1000) y `usuarios` con proyección de los
+campos de rol, se cruzan por UID con un diccionario y se calcula para cada usuario el
+conjunto de claims deseado. Sólo se llama a set_custom_user_claims para los usuarios
+cuyos claims administrados difieren; el resto del tenant no se toca. Las llamadas van en
+paralelo, limitadas por --tasa (cuota de actualizaciones de la API de Auth).
+
+Claims administrados: rol, organizacionId y org_admin (verdadero para org_admin y
+super_admin, como lo fijaba set-claims.cjs). Otros claims del usuario se conservan.
+
+Uso:
+    python sync_custom_claims.py --dry-run
+    python sync_custom_claims.py
+    python sync_custom_claims.py --limpiar-sin-usuario --tasa 20
+"""
+
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from firebase_admin import auth
+
+from firestore_utils import RateLimiter, initialize_firebase, stream_collection
+
+MANAGED_CLAIMS = ("rol", "organizacionId", "org_admin")
+ADMIN_ROLES = {"org_admin", "super_admin"}
+# Límite de Auth para el JSON de custom claims
+MAX_CLAIMS_BYTES = 1000
+DEFAULT_RATE = 50
+LIST_PAGE_SIZE = 1000
+
+# Un cambio: (uid, claims completos a fijar)
+ClaimChange = Tuple[str, Dict[str, Any]]
+
+
+def desired_claims(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Claims administrados que corresponden a un documento de usuarios"""
+    rol = data.get("rol")
+    claims = {"rol": rol, "organizacionId": data.get("organizacionId"), "org_admin": rol in ADMIN_ROLES}
+    return {key: value for key, value in claims.items() if value is not None}
+
+
+def merged_claims(current: Optional[Dict[str, Any]], managed: Dict[str, Any]) -> Dict[str, Any]:
+    """Claims actuales con los administrados reemplazados por `managed`"""
+    claims = {key: value for key, value in (current or {}).items() if key not in MANAGED_CLAIMS}
+    claims.update(managed)
+    return claims
+
+
+def auth_users(page_size: int = LIST_PAGE_SIZE) -> Iterator[Any]:
+    """Usuarios de Auth, página por página"""
+    page = auth.list_users(max_results=page_size)
+    while page:
+        yield from page.users
+        page = page.get_next_page()
+
+
+def plan_changes(db, remove_orphans: bool = False) -> Tuple[List[ClaimChange], Dict[str, Any]]:
+    """
+    Cruza usuarios con Auth y devuelve los cambios mínimos de claims. Con `remove_orphans`,
+    a las cuentas sin documento en usuarios se les quitan los claims administrados.
+    """
+    profiles = {doc.id: desired_claims(doc.to_dict() or {})
+                for doc in stream_collection(db, "usuarios", fields=["rol", "organizacionId"])}
+    stats: Dict[str, Any] = {"usuarios": len(profiles), "cuentas": 0, "sin_usuario": 0,
+                             "sin_cuenta": 0, "demasiado_grandes": []}
+    changes: List[ClaimChange] = []
+    seen = set()
+
+    for user in auth_users():
+        stats["cuentas"] += 1
+        current = user.custom_claims or {}
+        managed = profiles.get(user.uid)
+        if managed is None:
+            stats["sin_usuario"] += 1
+            if not remove_orphans:
+                continue
+            managed = {}
+        seen.add(user.uid)
+        claims = merged_claims(current, managed)
+        if claims == current:
+            continue
+        if len(json.dumps(claims, separators=(",", ":"))) > MAX_CLAIMS_BYTES:
+            stats["demasiado_grandes"].append(user.uid)
+            continue
+        changes.append((user.uid, claims))
+
+    stats["sin_cuenta"] = len(profiles.keys() - seen)
+    return changes, stats
+
+
+def apply_changes(changes: List[ClaimChange], rate: float = DEFAULT_RATE,
+                  max_workers: int = 8) -> Tuple[int, List[str]]:
+    """Fija los claims en paralelo, a lo más `rate` llamadas por segundo"""
+    limiter = RateLimiter(rate)
+
+    def apply(change: ClaimChange) -> Optional[str]:
+        uid, claims = change
+        limiter.acquire()
+        try:
+            auth.set_custom_user_claims(uid, claims)
+            return None
+        except Exception as e:
+            return f"{uid}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(apply, changes))
+    errors = [error for error in results if error]
+    return len(changes) - len(errors), errors
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Sincroniza los custom claims de Auth con la colección usuarios")
+    parser.add_argument("--tasa", type=float, default=DEFAULT_RATE, help="Llamadas a Auth por segundo")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limpiar-sin-usuario", action="store_true",
+                        help="Quita los claims administrados a cuentas sin documento en usuarios")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    print("🔐 Sincronización de custom claims")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    changes, stats = plan_changes(db, args.limpiar_sin_usuario)
+    print(f"👥 {stats['cuentas']} cuentas de Auth, {stats['usuarios']} documentos en usuarios")
+    print(f"   ⚠️ Cuentas sin documento en usuarios: {stats['sin_usuario']}")
+    print(f"   ⚠️ Documentos sin cuenta en Auth: {stats['sin_cuenta']}")
+    for uid in stats["demasiado_grandes"]:
+        print(f"   ❌ {uid}: los claims superan {MAX_CLAIMS_BYTES} bytes")
+    print(f"🔄 Cuentas con claims distintos: {len(changes)}")
+    for uid, claims in changes[:20]:
+        print(f"   • {uid}: {', '.join(f'{key}={claims.get(key)!r}' for key in MANAGED_CLAIMS)}")
+
+    if args.dry_run:
+        print("\n⚠️ Modo simulación: no se modificó ninguna cuenta")
+        return
+
+    updated, errors = apply_changes(changes, args.tasa, args.workers)
+    for error in errors[:10]:
+        print(f"   ❌ {error}")
+    print(f"\n✅ {updated} cuentas actualizadas")
+    if updated:
+        print("ℹ️ Los usuarios verán los nuevos claims al renovar su token (o al volver a iniciar sesión)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Diferencias y sincronización de colecciones entre dos proyectos de Firebase
+Pensado para promover datos de referencia (organizaciones, configuración) de dev a prod
+sin volver a ejecutar los scripts de carga, que sobrescriben todo.
+
+Cada lado se recorre en paralelo leyendo sólo IDs (proyección vacía, que igual trae el
+update_time; cuesta una lectura por documento pero no transfiere contenido). El estado
+(--state) guarda por proyecto y documento el update_time y un hash canónico del
+contenido (JSON con claves ordenadas; las referencias se comparan por ruta, no por
+proyecto), así que sólo se leen completos los documentos cuyo update_time cambió desde
+la ejecución anterior. Los hashes se agrupan en un árbol de dos niveles: raíz y BUCKETS
+cubetas por crc32 del ID. Si las raíces coinciden no hay nada que hacer; si no, sólo se
+comparan documento a documento las cubetas cuyo hash difiere.
+
+Sólo se escriben los documentos nuevos o modificados (reutilizando los ya leídos del
+origen; el resto se lee por lotes) y, con --eliminar, se borran los que ya no existen en
+el origen. Las subcolecciones no se comparan.
+
+Uso:
+    python sync_firestore_projects.py dev-sa.json prod-sa.json                 # simulación
+    python sync_firestore_projects.py dev-sa.json prod-sa.json organizaciones --apply --eliminar
+    python sync_firestore_projects.py dev-sa.json prod-sa.json --state promocion.json.gz
+"""
+
+import argparse
+import hashlib
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from firestore_utils import (ThroughputReporter, commit_writes, get_documents, initialize_project, load_state,
+                             save_state, stream_collection)
+from snapshot_utils import decode_value, encode_value
+
+DEFAULT_COLLECTIONS = ["organizaciones", "systemConfiguration", "organizationConfiguration"]
+BUCKETS = 256
+DIGEST_SIZE = 16
+DEFAULT_STATE = ".sync_firestore_projects_state.json.gz"
+
+# ID -> [update_time ISO, hash hex] de un lado, tal como se guarda en el estado
+KnownDocuments = Dict[str, List[Optional[str]]]
+
+
+def document_hash(data: Dict[str, Any]) -> bytes:
+    """Hash canónico del contenido de un documento, independiente del proyecto"""
+    canonical = json.dumps(encode_value(data), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class HashTree:
+    """Hashes de documentos agrupados en cubetas por crc32 del ID"""
+
+    def __init__(self, buckets: int = BUCKETS):
+        self.leaves: List[Dict[str, bytes]] = [{} for _ in range(buckets)]
+
+    def bucket_of(self, doc_id: str) -> int:
+        return zlib.crc32(doc_id.encode("utf-8")) % len(self.leaves)
+
+    def add(self, doc_id: str, digest: bytes):
+        self.leaves[self.bucket_of(doc_id)][doc_id] = digest
+
+    def __len__(self) -> int:
+        return sum(len(leaf) for leaf in self.leaves)
+
+    def bucket_digests(self) -> List[bytes]:
+        digests = []
+        for leaf in self.leaves:
+            hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+            for doc_id in sorted(leaf):
+                hasher.update(doc_id.encode("utf-8") + b"\0" + leaf[doc_id])
+            digests.append(hasher.digest())
+        return digests
+
+    def root(self, bucket_digests: List[bytes]) -> bytes:
+        return hashlib.blake2b(b"".join(bucket_digests), digest_size=DIGEST_SIZE).digest()
+
+
+def _update_time(doc) -> Optional[str]:
+    return doc.update_time.isoformat() if doc.update_time else None
+
+
+def build_tree(db, collection_name: str, label: str,
+               known: KnownDocuments) -> Tuple[HashTree, Dict[str, Any], KnownDocuments]:
+    """
+    Árbol de hashes de una colección. Recorre sólo IDs y lee completos los documentos
+    cuyo update_time difiere de `known`; devuelve (árbol, documentos leídos, estado nuevo).
+    """
+    reporter = ThroughputReporter(f"{label} {collection_name}", every=10000)
+    remote: Dict[str, Optional[str]] = {}
+    for doc in stream_collection(db, collection_name, fields=[]):
+        remote[doc.id] = _update_time(doc)
+        reporter.add()
+    print(f"   ⏱️ {reporter.summary()}")
+
+    entries = {doc_id: known[doc_id] for doc_id, updated in remote.items()
+               if doc_id in known and known[doc_id][0] == updated}
+    read = get_documents(db, collection_name, [doc_id for doc_id in remote if doc_id not in entries])
+    for doc_id, doc in read.items():
+        entries[doc_id] = [_update_time(doc), document_hash(doc.to_dict() or {}).hex()]
+    print(f"   📥 {label}: {len(read)} documentos leídos de {len(remote)}")
+
+    tree = HashTree()
+    for doc_id, (_, digest) in entries.items():
+        tree.add(doc_id, bytes.fromhex(digest))
+    return tree, read, entries
+
+
+def diff_trees(source: HashTree, target: HashTree) -> Tuple[List[str], List[str], List[str], int]:
+    """(nuevos, modificados, eliminados, cubetas distintas) del destino respecto del origen"""
+    source_buckets, target_buckets = source.bucket_digests(), target.bucket_digests()
+    if source.root(source_buckets) == target.root(target_buckets):
+        return [], [], [], 0
+
+    new, changed, deleted = [], [], []
+    differing = [index for index, (a, b) in enumerate(zip(source_buckets, target_buckets)) if a != b]
+    for index in differing:
+        source_leaf, target_leaf = source.leaves[index], target.leaves[index]
+        for doc_id, digest in source_leaf.items():
+            if doc_id not in target_leaf:
+                new.append(doc_id)
+            elif target_leaf[doc_id] != digest:
+                changed.append(doc_id)
+        deleted.extend(doc_id for doc_id in target_leaf if doc_id not in source_leaf)
+    return sorted(new), sorted(changed), sorted(deleted), len(differing)
+
+
+def sync_collection(source_db, target_db, collection_name: str, apply: bool = False,
+                    delete: bool = False, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compara una colección en ambos proyectos y, con `apply`, copia sólo las diferencias.
+    `state` (por proyecto y colección) se actualiza con los update_time y hashes leídos.
+    """
+    projects = state.setdefault("proyectos", {}) if state is not None else {}
+    source_known = projects.setdefault(source_db.project, {}).setdefault(collection_name, {})
+    target_known = projects.setdefault(target_db.project, {}).setdefault(collection_name, {})
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        source_future = executor.submit(build_tree, source_db, collection_name, "origen", source_known)
+        target_future = executor.submit(build_tree, target_db, collection_name, "destino", target_known)
+        source_tree, source_read, source_entries = source_future.result()
+        target_tree, _, target_entries = target_future.result()
+    projects[source_db.project][collection_name] = source_entries
+    projects[target_db.project][collection_name] = target_entries
+
+    new, changed, deleted, buckets = diff_trees(source_tree, target_tree)
+    stats = {"origen": len(source_tree), "destino": len(target_tree), "cubetas": buckets,
+             "nuevos": new, "modificados": changed, "eliminados": deleted, "escritos": 0, "errores": []}
+    if not apply:
+        return stats
+
+    target_ref = target_db.collection(collection_name)
+    # Los documentos del origen leídos en el recorrido se reutilizan; sólo se leen los que
+    # no cambiaron en el origen pero difieren en el destino
+    to_copy = {doc_id: source_read[doc_id] for doc_id in new + changed if doc_id in source_read}
+    to_copy.update(get_documents(source_db, collection_name, [doc_id for doc_id in new + changed
+                                                              if doc_id not in source_read]))
+    writes = []
+    for doc_id, doc in sorted(to_copy.items()):
+        # Las referencias se reconstruyen con el cliente del destino
+        writes.append(("set", target_ref.document(doc_id), decode_value(encode_value(doc.to_dict() or {}),
+                                                                          target_db)))
+    if delete:
+        writes.extend(("delete", target_ref.document(doc_id), None) for doc_id in deleted)
+    stats["escritos"], stats["errores"] = commit_writes(target_db, writes)
+    return stats
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Sincroniza colecciones entre dos proyectos de Firebase")
+    parser.add_argument("origen", help="Service account del proyecto origen")
+    parser.add_argument("destino", help="Service account del proyecto destino")
+    parser.add_argument("collections", nargs="*", default=DEFAULT_COLLECTIONS)
+    parser.add_argument("--apply", action="store_true", help="Escribe los cambios (por defecto sólo simula)")
+    parser.add_argument("--eliminar", action="store_true", help="Borra del destino lo que no está en el origen")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="update_time y hashes de la ejecución anterior")
+    args = parser.parse_args()
+
+    print("🔀 Sincronización entre proyectos de Firebase")
+    print("=" * 50)
+
+    source_db = initialize_project(args.origen, "origen")
+    target_db = initialize_project(args.destino, "destino")
+    if not source_db or not target_db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    state = load_state(args.state, {"proyectos": {}})
+    for collection_name in args.collections:
+        print(f"\n📁 {collection_name}")
+        stats = sync_collection(source_db, target_db, collection_name, args.apply, args.eliminar, state)
+        # Se guarda tras cada colección para que una interrupción no pierda las anteriores
+        save_state(args.state, state)
+        print(f"   📊 origen {stats['origen']}, destino {stats['destino']}, {stats['cubetas']} cubetas distintas")
+        print(f"   ➕ {len(stats['nuevos'])} nuevos, ✏️ {len(stats['modificados'])} modificados, "
+              f"🗑️ {len(stats['eliminados'])} sólo en destino")
+        for doc_id in (stats["nuevos"] + stats["modificados"])[:10]:
+            print(f"      • {doc_id}")
+        if args.apply:
+            print(f"   ✅ {stats['escritos']} escrituras")
+            for error in stats["errores"][:10]:
+                print(f"   ❌ {error}")
+
+    if not args.apply:
+        print("\n⚠️ Modo simulación: no se escribió nada. Usa --apply para aplicar los cambios")
+    elif not args.eliminar:
+        print("\nℹ️ Los documentos que sólo están en el destino no se borraron (usa --eliminar)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Sincronización incremental del almacén local (snapshot_store.py) con Firestore
+Tras la exportación inicial, cada ejecución lee sólo los documentos con
+fechaModificacion, fechaUltimaModificacion o fechaCreacion posterior a la marca de agua
+de la colección (una consulta por campo, menos un margen por desfase de relojes) y los
+agrega al almacén. Las lecturas son proporcionales a los cambios, no al tamaño de las
+colecciones.
+
+Las consultas por marca de agua no ven eliminaciones ni ediciones que no escriben ninguno
+de esos campos (en la app, actualizarContrato y actualizarOrganizacion). Para eso, cada
+--reconciliar-cada días (o con --reconciliar) se recorre Firestore leyendo sólo IDs
+(proyección vacía, que igual trae el update_time): los IDs que ya no existen se eliminan,
+y los que faltan o cuyo update_time cambió se leen por lotes. Entre reconciliaciones,
+esas ediciones no llegan al almacén.
+
+Las colecciones sin campo de modificación (WATERMARK_FIELDS) se releen completas y sólo
+se escriben los documentos cuyo update_time cambió.
+
+La marca de agua y la fecha de la última reconciliación se guardan en store.json.
+
+Uso:
+    python sync_snapshot_store.py store/
+    python sync_snapshot_store.py store/ contratos --reconciliar
+"""
+
+import argparse
+import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from firestore_utils import (CHANGE_FIELDS, ThroughputReporter, get_documents, initialize_firebase,
+                             latest_change, stream_changed_since, stream_collection)
+from snapshot_store import SnapshotStore, load_store_manifest, save_store_manifest, update_collection
+from snapshot_utils import encode_document
+
+# Campos de cambio por colección; None: se relee la colección completa
+WATERMARK_FIELDS = {
+    "contratos": CHANGE_FIELDS,
+    "organizaciones": CHANGE_FIELDS,
+    "contrapartes": CHANGE_FIELDS,
+    "proyectos": None,
+    "usuarios": None,
+}
+DEFAULT_WATERMARK_FIELDS = CHANGE_FIELDS
+# Se relee este margen antes de la marca por escrituras con la hora del cliente
+WATERMARK_MARGIN = datetime.timedelta(minutes=5)
+DEFAULT_RECONCILE_DAYS = 7
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def local_update_times(store_dir: str, collection_name: str) -> Dict[str, Optional[str]]:
+    """update_time guardado de cada documento local"""
+    store = SnapshotStore(store_dir)
+    collection = store.collection(collection_name)
+    times = {}
+    for position in range(len(collection)):
+        record = collection.record_at(position)
+        times[record["id"]] = record.get("actualizado")
+    store.close()
+    return times
+
+
+def sync_incremental(db, store_dir: str, collection_name: str, fields: Tuple[str, ...], state: Dict[str, Any],
+                     read_time: datetime.datetime, reconcile: bool) -> Dict[str, Any]:
+    """Documentos cambiados desde la marca y, si corresponde, reconciliación de IDs y update_time"""
+    watermark = parse_time(state.get("marca")) or read_time
+    reporter = ThroughputReporter(collection_name, every=10000)
+    changed: Dict[str, Dict[str, Any]] = {}
+    newest = watermark
+    for doc in stream_changed_since(db, collection_name, watermark - WATERMARK_MARGIN, change_fields=fields):
+        changed[doc.id] = encode_document(doc)
+        modified = latest_change(doc.to_dict() or {}, fields)
+        if modified is not None and modified > newest:
+            newest = modified
+        reporter.add()
+    print(f"   ⏱️ {reporter.summary()}")
+
+    deleted: List[str] = []
+    if reconcile:
+        stored = local_update_times(store_dir, collection_name)
+        remote: Dict[str, Optional[str]] = {}
+        for doc in stream_collection(db, collection_name, fields=[]):
+            remote[doc.id] = doc.update_time.isoformat() if doc.update_time else None
+        deleted = sorted(set(stored) - set(remote))
+        missing = set(remote) - set(stored) - set(changed)
+        edited = {doc_id for doc_id, updated in remote.items()
+                  if doc_id in stored and doc_id not in changed and stored[doc_id] != updated}
+        for doc_id, doc in get_documents(db, collection_name, missing | edited).items():
+            changed[doc_id] = encode_document(doc)
+        print(f"   🔁 Reconciliación: {len(remote)} IDs remotos, {len(missing)} faltantes, "
+              f"{len(edited)} editados sin marca, {len(deleted)} eliminados")
+
+    result = update_collection(store_dir, collection_name, changed.values(), deleted)
+    state["marca"] = newest.isoformat()
+    return result
+
+
+def sync_full(db, store_dir: str, collection_name: str) -> Dict[str, Any]:
+    """Relee la colección completa y escribe sólo los documentos cuyo update_time cambió"""
+    stored = local_update_times(store_dir, collection_name)
+    changed = []
+    remote: Set[str] = set()
+    for doc in stream_collection(db, collection_name):
+        remote.add(doc.id)
+        record = encode_document(doc)
+        if stored.get(doc.id, "") != record["actualizado"]:
+            changed.append(record)
+    return update_collection(store_dir, collection_name, changed, sorted(set(stored) - remote))
+
+
+def sync_store(db, store_dir: str, collections: Optional[List[str]] = None, force_reconcile: bool = False,
+               reconcile_days: int = DEFAULT_RECONCILE_DAYS) -> Dict[str, Dict[str, Any]]:
+    """Sincroniza las colecciones del almacén y guarda las marcas en store.json"""
+    manifest = load_store_manifest(store_dir)
+    unknown = [name for name in collections or [] if name not in manifest["colecciones"]]
+    if unknown:
+        raise ValueError(f"Colecciones que no están en el almacén: {', '.join(unknown)}")
+    read_time = datetime.datetime.fromisoformat(manifest["read_time"])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    sync_state = manifest.setdefault("sincronizacion", {})
+
+    results = {}
+    for collection_name in collections or sorted(manifest["colecciones"]):
+        state = sync_state.setdefault(collection_name, {})
+        fields = WATERMARK_FIELDS.get(collection_name, DEFAULT_WATERMARK_FIELDS)
+        print(f"\n📁 {collection_name}")
+        if fields is None:
+            result = sync_full(db, store_dir, collection_name)
+            state["reconciliado"] = now.isoformat()
+        else:
+            last = parse_time(state.get("reconciliado")) or read_time
+            reconcile = force_reconcile or now - last >= datetime.timedelta(days=reconcile_days)
+            result = sync_incremental(db, store_dir, collection_name, fields, state, read_time, reconcile)
+            if reconcile:
+                state["reconciliado"] = now.isoformat()
+        state["sincronizado"] = now.isoformat()
+        manifest["colecciones"][collection_name]["documentos"] = result["documentos"]
+        # Se guarda tras cada colección para que una interrupción no pierda las anteriores
+        save_store_manifest(store_dir, manifest)
+        results[collection_name] = result
+    return results
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Sincroniza incrementalmente el almacén local con Firestore")
+    parser.add_argument("store", help="Directorio del almacén")
+    parser.add_argument("collections", nargs="*")
+    parser.add_argument("--reconciliar", action="store_true", help="Fuerza la reconciliación de IDs")
+    parser.add_argument("--reconciliar-cada", type=int, default=DEFAULT_RECONCILE_DAYS,
+                        help="Días entre reconciliaciones de IDs")
+    args = parser.parse_args()
+
+    print("🔄 Sincronización incremental del almacén local")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+
+    try:
+        results = sync_store(db, args.store, args.collections or None, args.reconciliar, args.reconciliar_cada)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
+    print("\n📊 Resumen:")
+    for collection_name, result in results.items():
+        compacted = " (compactado)" if result["compactado"] else ""
+        print(f"   ✅ {collection_name}: {result['escritos']} escritos, {result['eliminados']} eliminados, "
+              f"{result['documentos']} documentos{compacted}")
+
+
+if __name__ == "__main__":
+    main()
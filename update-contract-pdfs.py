@@ -7,6 +7,8 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1 import SERVER_TIMESTAMP
 
+from lookup_cache import LookupCache
+
 def initialize_firebase():
     try:
         firebase_admin.get_app()
@@ -20,15 +22,12 @@ def update_remaining_contracts():
     
     db = initialize_firebase()
     
-    # Obtener todas las organizaciones para mapear nombres a IDs
-    orgs_ref = db.collection('organizaciones')
-    orgs = orgs_ref.get()
-    org_mapping = {}
-    
-    for org_doc in orgs:
-        org_data = org_doc.to_dict()
-        if org_data and 'nombre' in org_data:
-            org_mapping[org_data['nombre']] = org_doc.id
+    # Mapa nombre -> ID de organizaciones leído de Firestore: este script escribe
+    # contraparteOrganizacionId y la caché de organizaciones puede tener hasta 1 hora
+    # (un renombre no cambia su huella). Se invalida y la relectura queda en la caché.
+    cache = LookupCache()
+    cache.invalidate('organizaciones')
+    org_mapping = cache.mapping(db, 'organizaciones', 'nombre')
     
     print(f"📋 Encontradas {len(org_mapping)} organizaciones:")
     for nombre, org_id in org_mapping.items():
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Pipeline de subida masiva de PDFs de contratos
+1. Calcula el SHA-256 y el MD5 de cada archivo en un pool de procesos.
+2. Omite los contratos cuyo PDF actual (pdfUrl) ya tiene el mismo contenido, aunque la
+   ruta no siga el formato de este script (se compara el MD5 del blob).
+3. Sube el resto en paralelo con subidas reanudables por fragmentos.
+4. Escribe pdfUrl, documentoNombre y documentoTamaño en los contratos por lotes.
+
+Cada contrato tiene su propio blob: contracts/<organizacionId>/<contratoId>/sha256_<hash>.pdf.
+No se comparten blobs entre contratos aunque el contenido sea idéntico, porque la app
+(contractService.eliminarContrato) borra el blob de pdfUrl al eliminar un contrato.
+
+Las subidas completadas se registran en un diario (--journal), de modo que una
+ejecución interrumpida se retoma sin repetir trabajo; antes de omitir un blob del diario
+se verifica que siga existiendo.
+
+Entrada: un directorio con archivos <contratoId>.pdf, o un manifiesto JSON con
+[{"contratoId": "...", "archivo": "ruta/al.pdf"}].
+
+Uso:
+    python upload_contract_pdfs.py --dir ./pdfs
+    python upload_contract_pdfs.py --manifest pdfs.json --workers 16 --local-dir ./storage-local
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from firestore_utils import ThroughputReporter, commit_writes, get_documents, initialize_firebase
+from storage_utils import CONTRACTS_PREFIX, blob_path_from_url, get_bucket, list_blobs_parallel
+
+DEFAULT_JOURNAL = ".upload_contract_pdfs.journal"
+# Tamaño de fragmento para subidas reanudables (múltiplo de 256 KB)
+CHUNK_SIZE = 8 * 1024 * 1024
+HASH_BLOCK = 1024 * 1024
+
+
+def hash_file(path: str) -> Tuple[str, str, str, int]:
+    """Devuelve (ruta, sha256 hex, md5 base64, tamaño en bytes) leyendo el archivo por bloques"""
+    digest = hashlib.sha256()
+    md5 = hashlib.md5()
+    size = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+            md5.update(block)
+            size += len(block)
+    return path, digest.hexdigest(), base64.b64encode(md5.digest()).decode("ascii"), size
+
+
+def _safe_segment(value: str) -> str:
+    return "".join(c if c.isalnum() or c in "_-" else "_" for c in value)
+
+
+def blob_name_for(organizacion_id: str, contrato_id: str, content_hash: str) -> str:
+    """Ruta propia del contrato, con el hash del contenido en el nombre del archivo"""
+    safe_org = _safe_segment(organizacion_id or "default_org")
+    return f"{CONTRACTS_PREFIX}{safe_org}/{_safe_segment(contrato_id)}/sha256_{content_hash}.pdf"
+
+
+def load_inputs(directory: str = None, manifest: str = None) -> List[Dict[str, str]]:
+    """Carga la lista de (contratoId, archivo) desde un directorio o un manifiesto JSON"""
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            return json.load(f)
+    items = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(".pdf"):
+            items.append({"contratoId": filename[:-4], "archivo": os.path.join(directory, filename)})
+    return items
+
+
+def load_journal(path: str) -> Dict[str, str]:
+    """Lee el diario de subidas completadas: nombre de blob -> hash"""
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    done[entry["blob"]] = entry["hash"]
+    return done
+
+
+def upload_blob(bucket, name: str, path: str, content_hash: str):
+    """Sube un archivo con subida reanudable por fragmentos"""
+    blob = bucket.blob(name)
+    blob.chunk_size = CHUNK_SIZE
+    blob.metadata = {"sha256": content_hash}
+    blob.upload_from_filename(path, content_type="application/pdf")
+
+
+def upload_contract_pdfs(db, bucket, items: List[Dict[str, str]], workers: int = 8,
+                         journal_path: str = DEFAULT_JOURNAL, dry_run: bool = False) -> Dict[str, Any]:
+    """Ejecuta el pipeline completo y devuelve contadores"""
+    stats = {"archivos": len(items), "sin_contrato": 0, "sin_cambios": 0, "reutilizados": 0, "subidos": 0,
+             "bytes_subidos": 0, "contratos_actualizados": 0, "errores": []}
+
+    # Organización y PDF actual de cada contrato (lectura por lotes con proyección)
+    contracts = get_documents(db, "contratos", [item["contratoId"] for item in items],
+                              fields=["organizacionId", "pdfUrl", "documentoTamaño"])
+
+    print(f"🔢 Calculando hashes de {len(items)} archivos...")
+    with ProcessPoolExecutor() as executor:
+        hashes = {path: (digest, md5, size) for path, digest, md5, size in
+                  executor.map(hash_file, [item["archivo"] for item in items], chunksize=16)}
+
+    listed = list_blobs_parallel(bucket, CONTRACTS_PREFIX)
+    journal = load_journal(journal_path)
+    existing = set(listed)
+
+    to_upload: Dict[str, Tuple[str, str]] = {}
+    updates = []
+    for item in items:
+        snapshot = contracts.get(item["contratoId"])
+        if snapshot is None:
+            stats["sin_contrato"] += 1
+            print(f"   ⚠️ Contrato no encontrado: {item['contratoId']}")
+            continue
+        current = snapshot.to_dict() or {}
+        digest, md5, size = hashes[item["archivo"]]
+        # El PDF actual del contrato ya tiene este contenido (con cualquier ruta)
+        current_blob = listed.get(blob_path_from_url(current.get("pdfUrl"), bucket.name) or "")
+        if current_blob is not None and current_blob.md5_hash == md5:
+            stats["sin_cambios"] += 1
+            continue
+        name = blob_name_for(current.get("organizacionId"), item["contratoId"], digest)
+        if name in existing or name in to_upload:
+            stats["reutilizados"] += 1
+        elif name in journal and bucket.blob(name).exists():
+            existing.add(name)
+            stats["reutilizados"] += 1
+        else:
+            to_upload[name] = (item["archivo"], digest)
+        updates.append((snapshot.reference, {
+            "pdfUrl": name,
+            "documentoNombre": os.path.basename(item["archivo"]),
+            "documentoTamaño": size,
+            "fechaModificacion": SERVER_TIMESTAMP,
+        }))
+
+    print(f"📤 Subiendo {len(to_upload)} blobs nuevos ({stats['sin_cambios']} contratos sin cambios, "
+          f"{stats['reutilizados']} blobs ya subidos)...")
+    if dry_run:
+        return stats
+
+    reporter = ThroughputReporter("subidas", every=100)
+    uploaded = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(journal_path, "a", encoding="utf-8") as journal_file:
+        futures = {executor.submit(upload_blob, bucket, name, path, digest): (name, path, digest)
+                   for name, (path, digest) in to_upload.items()}
+        for future, (name, path, digest) in futures.items():
+            try:
+                future.result()
+                uploaded.add(name)
+                stats["subidos"] += 1
+                stats["bytes_subidos"] += hashes[path][2]
+                journal_file.write(json.dumps({"blob": name, "hash": digest}) + "\n")
+                journal_file.flush()
+                reporter.add()
+            except Exception as e:
+                stats["errores"].append(f"{path}: {e}")
+
+    # Sólo se enlazan contratos cuyo blob existe (previo o recién subido)
+    available = existing | uploaded
+    writes = [("update", ref, data) for ref, data in updates if data["pdfUrl"] in available]
+    stats["contratos_actualizados"], errors = commit_writes(db, writes)
+    stats["errores"].extend(errors)
+    print(f"   ⏱️ {reporter.summary()}")
+    return stats
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Sube PDFs de contratos en paralelo, omitiendo los que no cambiaron")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directorio con archivos <contratoId>.pdf")
+    source.add_argument("--manifest", help="Manifiesto JSON [{contratoId, archivo}]")
+    parser.add_argument("--bucket", help="Nombre del bucket (por defecto VITE_STORAGE_BUCKET)")
+    parser.add_argument("--local-dir", help="Usa un directorio local como bucket")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    print("📚 Subida masiva de PDFs de contratos")
+    print("=" * 50)
+
+    db = initialize_firebase()
+    if not db:
+        print("❌ No se pudo inicializar Firebase")
+        return
+    bucket = get_bucket(args.bucket, args.local_dir)
+
+    items = load_inputs(args.dir, args.manifest)
+    stats = upload_contract_pdfs(db, bucket, items, args.workers, args.journal, args.dry_run)
+
+    print("\n📊 Resumen:")
+    print(f"   📄 Archivos: {stats['archivos']}")
+    print(f"   ✔️ Contratos con el mismo PDF: {stats['sin_cambios']}")
+    print(f"   ♻️ Blobs ya subidos: {stats['reutilizados']}")
+    print(f"   📤 Subidos: {stats['subidos']} ({stats['bytes_subidos'] / 1024 / 1024:.1f} MB)")
+    print(f"   🔗 Contratos actualizados: {stats['contratos_actualizados']}")
+    if stats["sin_contrato"]:
+        print(f"   ⚠️ Sin contrato: {stats['sin_contrato']}")
+    for error in stats["errores"][:10]:
+        print(f"   ❌ {error}")
+
+
+if __name__ == "__main__":
+    main()